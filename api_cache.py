@@ -0,0 +1,215 @@
+"""
+Persistent on-disk cache for YouTube Data API responses (plus a JSON fixture
+variant used to replay recorded runs offline).
+
+Entries live in a single SQLite file, keyed by endpoint plus the normalized
+request params (sorted, API key removed). Each endpoint has its own TTL:
+search pages change slowly, video statistics change quickly. When the file
+grows past max_bytes the least recently used entries are evicted, down to
+EVICT_TO of the limit so a full cache does not evict on every put. The byte
+total is read once at open and then kept up to date by put, replace and
+eviction; eviction re-reads it, since sharded workers write the same file.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from api_decoder import loads
+
+# Default time-to-live per endpoint, in seconds
+DEFAULT_TTLS = {
+    "search": 7 * 24 * 3600,  # result pages for a term barely move within a week
+    "videos": 6 * 3600,       # view/like/comment counts go stale quickly
+}
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+EVICT_TO = 0.9  # share of max_bytes left after an eviction
+
+# Params that never change what the collector reads from the response
+# (`fields` only trims the payload to the properties it reads)
+IGNORED_PARAMS = {"key", "fields"}
+
+
+# Stable cache key for an endpoint call
+def cache_key(endpoint, params):
+    items = sorted((k, str(v)) for k, v in params.items() if k not in IGNORED_PARAMS)
+    return endpoint + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+
+class ResponseCache:
+    """SQLite-backed response cache with per-endpoint TTLs and LRU size bounding."""
+
+    def __init__(self, path=".api_cache.sqlite", ttls=None, max_bytes=DEFAULT_MAX_BYTES,
+                 refresh_stale_stats=False):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        # Serve search pages regardless of age; only expired statistics are refetched
+        self.refresh_stale_stats = refresh_stale_stats
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   endpoint TEXT NOT NULL,
+                   body TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._bytes = self._sum_sizes()
+
+    def _sum_sizes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _is_fresh(self, endpoint, created, now):
+        if self.refresh_stale_stats and endpoint != "videos":
+            return True
+        ttl = self.ttls.get(endpoint)
+        return ttl is None or now - created <= ttl
+
+    # Cached response or None
+    def get(self, endpoint, params):
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, created = row
+            if not self._is_fresh(endpoint, created, now):
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(body)
+
+    def put(self, endpoint, params, response):
+        # Never cache API errors (quota exceeded, bad request, ...)
+        if "error" in response:
+            return
+        key = cache_key(endpoint, params)
+        body = json.dumps(response, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            # A replaced entry (e.g. stale statistics refetched) gives back its old size
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, len(body), now, now),
+            )
+            self._bytes += len(body) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    # Drop least recently used entries until the cache is down to EVICT_TO of max_bytes
+    def _evict(self):
+        self._bytes = self._sum_sizes()
+        if self._bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._bytes <= target:
+                break
+            doomed.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f"Cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{self.stale} stale, {self.evictions} evicted, "
+                f"{self.total_bytes() / 1024:.0f} KB on disk")
+
+
+class FixtureCache:
+    """
+    Recorded API responses for offline replay, stored as one JSON file.
+
+    Search pages are stored per request; video items are stored per ID, so a
+    replay can answer videos calls whose batches are packed differently from
+    the recording. Same get/put interface as ResponseCache.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.search = {}
+        self.videos = {}
+        self.hits = 0
+        self.misses = 0
+        if path:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.search, self.videos = data["search"], data["videos"]
+            except FileNotFoundError:
+                pass
+
+    def get(self, endpoint, params):
+        if endpoint == "videos":
+            ids = [i for i in params.get("id", "").split(",") if i]
+            if all(i in self.videos for i in ids):
+                self.hits += 1
+                # IDs recorded as missing (deleted/private) are stored as None
+                return {"items": [self.videos[i] for i in ids if self.videos[i] is not None]}
+        else:
+            res = self.search.get(cache_key(endpoint, params))
+            if res is not None:
+                self.hits += 1
+                return res
+        self.misses += 1
+        return None
+
+    def put(self, endpoint, params, response):
+        if "error" in response:
+            return
+        if endpoint == "videos":
+            for i in params.get("id", "").split(","):
+                self.videos.setdefault(i, None)
+            for item in response.get("items", []):
+                self.videos[item.get("id")] = item
+        else:
+            self.search[cache_key(endpoint, params)] = response
+
+    def save(self, path=None):
+        with open(path or self.path, "w", encoding="utf-8") as f:
+            json.dump({"search": self.search, "videos": self.videos}, f)
+
+    def close(self):
+        pass
+
+    def summary(self):
+        return (f"Fixtures: {self.hits} hits, {self.misses} misses, "
+                f"{len(self.search)} search pages, {len(self.videos)} videos")
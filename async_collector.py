@@ -0,0 +1,391 @@
+"""
+Concurrent collector engine for the YouTube Data API.
+
+Same selection logic and records as collect_short_videos / collect_long_videos
+in youtube_data.py, but search terms and detail batches are fetched
+concurrently over a pooled keep-alive session, and the fixed sleeps are
+replaced by a shared token-bucket rate limiter.
+
+Usage:
+    python async_collector.py                   # collect with the async engine
+    python async_collector.py --benchmark       # serial vs async against a local mock API
+    python async_collector.py --check           # same records and quota accounting (exit status 1 if not)
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+import youtube_data
+from api_decoder import loads
+from youtube_data import (
+    build_details_params,
+    build_search_params,
+    is_valid_long,
+    is_valid_short,
+    parse_video_item,
+    select_videos,
+)
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` requests/sec with bursts up to `burst`."""
+
+    def __init__(self, rate=10.0, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCollector:
+    """Runs collection on an event loop; HTTP goes through one pooled requests.Session."""
+
+    # term_window: terms searched at once per category; larger windows are faster
+    # but may spend quota on terms the serial loop would never have reached
+    def __init__(self, base_url=None, concurrency=8, rate=10.0, burst=None, term_window=2, cache=None):
+        self.base_url = base_url or youtube_data.API_BASE
+        self.cache = cache if cache is not None else youtube_data.CACHE
+        self.concurrency = concurrency
+        self.term_window = term_window
+        self.rate_limiter = RateLimiter(rate, burst)
+        self.request_count = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    async def _get(self, endpoint, params):
+        run = instrumentation.RUN
+        cache = self.cache
+        if cache is not None:
+            cached = cache.get(endpoint, params)
+            if cached is not None:
+                if run is not None:
+                    run.cache_hit(endpoint)
+                return cached
+
+        async with self._semaphore:
+            await self.rate_limiter.acquire()
+            self.request_count += 1
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            response = await loop.run_in_executor(
+                self._executor,
+                lambda: self.session.get(f"{self.base_url}/{endpoint}", params=params),
+            )
+            res = loads(response.content)
+            if run is not None:
+                reason = instrumentation.error_reason(res) if "error" in res else None
+                # A refused call costs nothing
+                cost = 0 if reason == "quotaExceeded" else youtube_data.QUOTA_COSTS.get(endpoint, 1)
+                run.request(endpoint, time.perf_counter() - start, len(response.content), cost, reason)
+
+        if cache is not None:
+            cache.put(endpoint, params, res)
+        return res
+
+    # Async counterpart of get_video_ids_by_search (pages are inherently sequential)
+    async def search(self, search_query, video_duration, max_videos=30):
+        video_ids = []
+        next_page = None
+
+        while len(video_ids) < max_videos:
+            params = build_search_params(search_query, video_duration,
+                                         min(50, max_videos - len(video_ids)), next_page)
+            try:
+                res = await self._get("search", params)
+
+                if "error" in res:
+                    print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
+                    break
+
+                items = res.get("items", [])
+                if not items:
+                    break
+
+                for item in items:
+                    if "videoId" in item.get("id", {}):
+                        video_ids.append(item["id"]["videoId"])
+
+                next_page = res.get("nextPageToken")
+                if not next_page or len(video_ids) >= max_videos:
+                    break
+            except Exception as e:
+                print(f"    Error fetching videos: {e}")
+                break
+
+        return list(dict.fromkeys(video_ids))[:max_videos]  # Remove duplicates (keeps order)
+
+    async def _details_batch(self, batch, target_category_id, category_name):
+        try:
+            res = await self._get("videos", build_details_params(batch))
+            if "error" in res:
+                print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
+                return []
+            records = (parse_video_item(item, target_category_id, category_name)
+                       for item in res.get("items", []))
+            return [r for r in records if r is not None]
+        except Exception as e:
+            print(f"    Error fetching details: {e}")
+            return []
+
+    # Async counterpart of get_video_details; batches go out concurrently, order is kept
+    async def details(self, video_ids, target_category_id, category_name):
+        batches = [video_ids[i:i+50] for i in range(0, len(video_ids), 50)]
+        results = await asyncio.gather(
+            *(self._details_batch(b, target_category_id, category_name) for b in batches)
+        )
+        return [record for batch in results for record in batch]
+
+    async def _term(self, search_term, video_duration, max_videos, cat_id, cat_name):
+        video_ids = await self.search(search_term, video_duration, max_videos)
+        if not video_ids:
+            return None
+        return await self.details(video_ids, cat_id, cat_name)
+
+    # Fetch a window of terms at once, then replay them in the serial order so
+    # the same early-stop decisions (and therefore the same records) are made
+    async def _collect_category(self, cat_id, cat_name, terms, video_duration, max_videos,
+                                keep, target_per_category):
+        collected = {}
+        for start in range(0, len(terms), self.term_window):
+            window = terms[start:start + self.term_window]
+            results = await asyncio.gather(
+                *(self._term(t, video_duration, max_videos, cat_id, cat_name) for t in window)
+            )
+            for video_details in results:
+                if len(collected) >= target_per_category:
+                    break
+                for v in video_details or []:
+                    if keep(v):
+                        collected[v["video_id"]] = v
+            if len(collected) >= target_per_category:
+                break
+        return list(collected.values())
+
+    async def collect_short(self, categories, target_per_category=30):
+        # The serial loop re-runs the same searches on later passes; those return
+        # the same pages, so a single pass over the terms yields the same records
+        per_category = await asyncio.gather(*(
+            self._collect_category(cat_id, info["name"], info["short_terms"], "any", 80,
+                                   lambda v: 1 <= v["duration_minutes"] < 10, target_per_category)
+            for cat_id, info in categories.items()
+        ))
+        return [v for videos in per_category
+                for v in select_videos(videos, is_valid_short, target_per_category)]
+
+    async def collect_long(self, categories, target_per_category=30):
+        per_category = await asyncio.gather(*(
+            self._collect_category(cat_id, info["name"], info["long_terms"], "long", 30,
+                                   lambda v: v["duration_minutes"] > 20, target_per_category)
+            for cat_id, info in categories.items()
+        ))
+        return [v for videos in per_category
+                for v in select_videos(videos, is_valid_long, target_per_category)]
+
+    async def collect_async(self, categories, target_per_category=30):
+        short_videos, long_videos = await asyncio.gather(
+            self.collect_short(categories, target_per_category),
+            self.collect_long(categories, target_per_category),
+        )
+        return short_videos, long_videos
+
+    # Each run gets its own event loop, so loop-bound primitives are created per run
+    def _run(self, coro):
+        async def runner():
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.rate_limiter._lock = None
+            return await coro
+        return asyncio.run(runner())
+
+    def collect(self, categories, target_per_category=30):
+        return self._run(self.collect_async(categories, target_per_category))
+
+    # Single-phase entry points with the same signature as the serial phase functions
+    def collect_short_videos(self, categories, target_per_category=30):
+        return self._run(self.collect_short(categories, target_per_category))
+
+    def collect_long_videos(self, categories, target_per_category=30):
+        return self._run(self.collect_long(categories, target_per_category))
+
+
+# Convenience wrapper: returns (short_videos, long_videos) like the serial phases
+def collect(categories=None, target_per_category=30, **options):
+    collector = AsyncCollector(**options)
+    try:
+        return collector.collect(categories or youtube_data.CATEGORIES, target_per_category)
+    finally:
+        collector.close()
+
+
+# Serial vs async against the local mock API; prints requests/sec and speedup
+def benchmark(latency=0.05, concurrency=8, rate=50.0, term_window=2, target_per_category=30):
+    import contextlib
+    import io
+
+    from mock_youtube_api import start_mock_server
+
+    server, api, base_url = start_mock_server(latency=latency)
+    original_base = youtube_data.API_BASE
+    youtube_data.API_BASE = base_url
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial = (youtube_data.collect_short_videos(youtube_data.CATEGORIES, target_per_category)
+                      + youtube_data.collect_long_videos(youtube_data.CATEGORIES, target_per_category))
+        serial_time = time.perf_counter() - start
+        serial_requests = sum(api.counts.values())
+
+        api.reset_counts()
+        start = time.perf_counter()
+        short_videos, long_videos = collect(target_per_category=target_per_category, base_url=base_url,
+                                            concurrency=concurrency, rate=rate, term_window=term_window)
+        async_time = time.perf_counter() - start
+        async_requests = sum(api.counts.values())
+    finally:
+        youtube_data.API_BASE = original_base
+        server.shutdown()
+
+    same = sorted(v["video_id"] for v in serial) == sorted(v["video_id"] for v in short_videos + long_videos)
+
+    print(f"\n{'='*60}")
+    print("COLLECTOR BENCHMARK (mock API, "
+          f"{latency*1000:.0f} ms latency, request delay {youtube_data.REQUEST_DELAY}s)")
+    print(f"{'='*60}")
+    print(f"  Serial: {serial_requests} requests in {serial_time:.2f}s "
+          f"({serial_requests / serial_time:.1f} req/s)")
+    print(f"  Async:  {async_requests} requests in {async_time:.2f}s "
+          f"({async_requests / async_time:.1f} req/s, concurrency={concurrency}, rate={rate}/s)")
+    print(f"  Wall-clock speedup: {serial_time / async_time:.1f}x")
+    print(f"  Same records: {'✓' if same else '✗'}")
+
+    return {
+        "serial_seconds": serial_time, "serial_requests": serial_requests,
+        "async_seconds": async_time, "async_requests": async_requests,
+        "speedup": serial_time / async_time, "same_records": same,
+    }
+
+
+# Records as comparable values: every field, in key order (the CSV's column order)
+def record_set(videos):
+    return sorted(tuple(v.items()) for v in videos)
+
+
+# Every record unique, in its duration range and in the category it is filed under
+def records_valid(videos, categories=None):
+    names = {cat_id: info["name"] for cat_id, info in (categories or youtube_data.CATEGORIES).items()}
+    ids = [v["video_id"] for v in videos]
+    return len(ids) == len(set(ids)) and all(
+        (is_valid_short(v) or is_valid_long(v)) and names.get(v["category"]) == v["category_name"]
+        for v in videos)
+
+
+# Serial vs async against a fresh mock API each: the quota each engine counted equals what the mock
+# charged, and both select the same records. With key_quota the one key runs out mid-run (the
+# quotaExceeded path): which terms get answered then differs, so both must instead finish, have calls
+# refused and keep only valid records.
+def check(key_quota=None, target_per_category=30, concurrency=8):
+    import contextlib
+    import io
+
+    from mock_youtube_api import start_mock_server
+
+    saved = youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE, youtube_data.KEYS
+    youtube_data.REQUEST_DELAY, youtube_data.CACHE, youtube_data.KEYS = 0.0, None, None
+    runs = {}
+    try:
+        for engine in ("serial", "async"):
+            server, api, base_url = start_mock_server(key_quota=key_quota)
+            youtube_data.API_BASE = base_url
+            quota_before = sum(youtube_data.QUOTA_USED.values())
+            collector = AsyncCollector(base_url=base_url, concurrency=concurrency, rate=0)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if engine == "serial":
+                        videos = (youtube_data.collect_short_videos(youtube_data.CATEGORIES, target_per_category)
+                                  + youtube_data.collect_long_videos(youtube_data.CATEGORIES, target_per_category))
+                    else:
+                        short_videos, long_videos = collector.collect(youtube_data.CATEGORIES, target_per_category)
+                        videos = short_videos + long_videos
+            finally:
+                collector.close()
+                server.shutdown()
+            if engine == "serial":
+                counted, charged = sum(youtube_data.QUOTA_USED.values()) - quota_before, sum(api.key_units.values())
+                accounting = (f"QUOTA_USED {counted} vs {charged} units charged", counted == charged)
+            else:
+                sent = sum(api.counts.values())
+                accounting = (f"{collector.request_count} requests vs {sent} received",
+                              collector.request_count == sent)
+            runs[engine] = {"videos": videos, "accounting": accounting, "refused": sum(api.errors.values())}
+    finally:
+        youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE, youtube_data.KEYS = saved
+
+    print(f"\n{'='*60}")
+    print(f"SERIAL vs ASYNC COLLECTOR CHECK (mock API, "
+          f"{f'one key with {key_quota} units' if key_quota else 'unlimited key'})")
+    print(f"{'='*60}")
+    ok = True
+    for engine, run in runs.items():
+        text, good = run["accounting"]
+        ok &= good
+        print(f"  {engine:6}  {len(run['videos'])} records, {run['refused']} refused calls, "
+              f"{text}: {'✓' if good else '✗'}")
+    if key_quota is None:
+        same = record_set(runs["serial"]["videos"]) == record_set(runs["async"]["videos"])
+        print(f"  Same records (every field, in column order): {'✓' if same else '✗'}")
+    else:
+        same = all(run["refused"] and records_valid(run["videos"]) for run in runs.values())
+        print(f"  Calls refused, records unique and valid: {'✓' if same else '✗'}")
+    return ok and same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async YouTube collector")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10.0, help="max requests per second (0 = unlimited)")
+    parser.add_argument("--term-window", type=int, default=2, help="search terms fetched at once per category")
+    parser.add_argument("--benchmark", action="store_true", help="compare serial vs async on a local mock API")
+    parser.add_argument("--check", action="store_true",
+                        help="serial vs async records and quota accounting on a local mock API")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock API latency for --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(latency=args.latency, concurrency=args.concurrency, rate=args.rate or 0,
+                  term_window=args.term_window)
+    elif args.check:
+        # Then one key that runs out part way through the run
+        ok = check() & check(key_quota=3000)
+        raise SystemExit(0 if ok else 1)
+    else:
+        youtube_data.main(engine="async", concurrency=args.concurrency, rate=args.rate,
+                          term_window=args.term_window)
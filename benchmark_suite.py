@@ -0,0 +1,407 @@
+"""
+Benchmark suite for the collector and the analysis, runnable without an API key.
+
+Collector: the serial and async engines collect against mock_youtube_api.py
+(configurable latency, page size, error rate and category mix). Reported per
+engine: wall time, requests/s, videos/s and quota units per collected video
+(failed requests are charged too).
+
+Analysis: synthetic datasets with the collector's schema (10^3 to 10^7 rows,
+CSV or partitioned Parquet) are written in chunks, then engagement_analysis.py
+and streaming_analysis.py run on them, each in a fresh process. Reported:
+wall time and peak RSS.
+
+Results are saved as JSON tagged with the git commit. --compare prints the
+change against an earlier results file and flags regressions.
+
+--check runs correctness checks instead of timings: the serial, async and
+sharded engines must select the same records from the mock, key rotation and
+keys running out must keep the quota counters equal to what the mock charged,
+and a rerun on the collection store must write the same CSV.
+
+Usage:
+    python benchmark_suite.py                                     # default suite
+    python benchmark_suite.py --sizes 1000 1000000 10000000 --formats parquet
+    python benchmark_suite.py --latency 0.02 --error-rate 0.05 --page-size 20
+    python benchmark_suite.py --compare benchmark_results/abc1234.json
+    python benchmark_suite.py --generate 10000000 --format parquet --path big_parquet
+    python benchmark_suite.py --check        # engines' records and quota accounting (exit status 1 if not)
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = "benchmark_results"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+CHUNK_ROWS = 1_000_000
+# A metric counts as regressed when it gets this much worse than the baseline
+REGRESSION_THRESHOLD = 0.10
+
+
+# Write n_rows synthetic rows (collector schema plus ratios) as CSV or Parquet, chunk by chunk
+def write_synthetic(n_rows, path, fmt="csv", seed=0, category_mix=None, chunk_rows=CHUNK_ROWS):
+    from engagement_metrics import add_engagement_metrics, synthetic_dataset
+
+    for i, start in enumerate(range(0, n_rows, chunk_rows)):
+        df = add_engagement_metrics(synthetic_dataset(min(chunk_rows, n_rows - start), seed=[seed, i],
+                                                      start=start, category_mix=category_mix))
+        if fmt == "csv":
+            df.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        else:
+            from columnar_dataset import write_dataset
+            write_dataset(df, path, append=True)
+    return path
+
+
+# Serial and async collection against a fresh mock server per engine
+def collector_benchmark(engines=("serial", "async"), target_per_category=30, concurrency=8,
+                        rate=0.0, request_delay=0.0, **mock_options):
+    import youtube_data
+    from async_collector import collect
+    from mock_youtube_api import start_mock_server
+
+    saved = youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE
+    results = {}
+    try:
+        for engine in engines:
+            server, api, base_url = start_mock_server(**mock_options)
+            youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE = base_url, request_delay, None
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if engine == "serial":
+                    videos = (youtube_data.collect_short_videos(youtube_data.CATEGORIES, target_per_category)
+                              + youtube_data.collect_long_videos(youtube_data.CATEGORIES, target_per_category))
+                else:
+                    short_videos, long_videos = collect(target_per_category=target_per_category,
+                                                        base_url=base_url, concurrency=concurrency, rate=rate)
+                    videos = short_videos + long_videos
+            seconds = time.perf_counter() - start
+            server.shutdown()
+
+            requests_made = sum(api.counts.values())
+            quota = sum(youtube_data.QUOTA_COSTS.get(e, 1) * n for e, n in api.counts.items())
+            results[engine] = {
+                "seconds": seconds,
+                "videos": len(videos),
+                "requests": dict(api.counts),
+                "errors": dict(api.errors),
+                "bytes": api.bytes_sent,
+                "requests_per_s": requests_made / seconds,
+                "videos_per_s": len(videos) / seconds,
+                "quota_units": quota,
+                "quota_per_video": quota / len(videos) if videos else None,
+            }
+    finally:
+        youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE = saved
+    return results
+
+
+# One collection against a fresh mock server with the serial per-term loop or the sharded engine.
+# Returns the records, the QUOTA_USED it added, the mock and the key pool (None with one plain key).
+def _collect_on_mock(engine, target_per_category=30, keys=None, key_quota=None, workers=2):
+    import youtube_data
+    from mock_youtube_api import start_mock_server
+    from sharded_collector import ShardedCollector
+
+    server, api, base_url = start_mock_server(key_quota=key_quota)
+    youtube_data.API_BASE = base_url
+    pool = youtube_data.configure_keys(keys)
+    quota_before = sum(youtube_data.QUOTA_USED.values())
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if engine == "serial":
+                videos = (youtube_data.collect_short_videos(youtube_data.CATEGORIES, target_per_category)
+                          + youtube_data.collect_long_videos(youtube_data.CATEGORIES, target_per_category))
+            else:
+                collector = ShardedCollector(workers, pool)
+                try:
+                    videos = (collector.collect_short_videos(youtube_data.CATEGORIES, target_per_category)
+                              + collector.collect_long_videos(youtube_data.CATEGORIES, target_per_category))
+                finally:
+                    collector.close()
+    finally:
+        server.shutdown()
+    return videos, sum(youtube_data.QUOTA_USED.values()) - quota_before, api, pool
+
+
+# QUOTA_USED equals the units the mock charged, and so does each key's spend in the pool
+def _accounting_ok(counted, api, pool):
+    ok = counted == sum(api.key_units.values())
+    if pool is not None:
+        ok &= all(u["used"] == api.key_units.get(key, 0) for key, u in pool.usage().items())
+    return ok
+
+
+# Two serial runs (video index and collection store, as `cli.py collect` runs them) in a scratch
+# directory: the second reuses every stored record and must write a byte-identical CSV
+def _store_rerun(target_per_category=30):
+    import youtube_data
+    from mock_youtube_api import start_mock_server
+
+    server, api, base_url = start_mock_server()
+    youtube_data.API_BASE = base_url
+    saved_keys, cwd = youtube_data.API_KEYS, os.getcwd()
+    youtube_data.API_KEYS = youtube_data.API_KEYS or ["mock-key"]
+    runs = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            for _ in range(2):
+                api.reset_counts()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    youtube_data.main(cache_path=None, store_path="collection.sqlite")
+                with open("youtube_length_engagement.csv", "rb") as f:
+                    runs.append((f.read(), dict(api.counts)))
+    finally:
+        os.chdir(cwd)
+        youtube_data.API_KEYS = saved_keys
+        server.shutdown()
+    (first, first_counts), (second, second_counts) = runs
+    return first == second and second_counts["videos"] == 0 and second_counts["search"] == first_counts["search"]
+
+
+# Collector engines against mock_youtube_api; True when every check passes:
+#   * serial vs async: async_collector.check(), with an unlimited key and one that runs out
+#   * sharded (1 and 2 workers) selects the serial loop's records, field for field
+#   * several keys with a small quota: rotation on quotaExceeded keeps the same records
+#   * keys that all run out: the run finishes with only valid records
+#   * a rerun on the collection store writes the same CSV without fetching details again
+# and on every run QUOTA_USED and each key's spend equal what the mock charged.
+def check_collectors(target_per_category=30):
+    import youtube_data
+    from async_collector import check as check_async, record_set, records_valid
+
+    ok = check_async(target_per_category=target_per_category)
+    ok &= check_async(key_quota=3000, target_per_category=target_per_category)
+
+    saved = youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE, youtube_data.KEYS
+    youtube_data.REQUEST_DELAY, youtube_data.CACHE = 0.0, None
+    keys = [f"mock-key-{i}" for i in range(4)]
+    print(f"\n{'='*60}")
+    print("COLLECTOR ENGINE CHECKS (mock API)")
+    print(f"{'='*60}")
+    try:
+        reference, counted, api, pool = _collect_on_mock("serial", target_per_category)
+        checks = [("serial, one key: quota accounted", _accounting_ok(counted, api, pool))]
+        reference = record_set(reference)
+        # The pool is not told the mock's quota: keys are retired when the API answers quotaExceeded
+        for engine, workers, key_quota in (("sharded", 1, None), ("sharded", 2, None),
+                                           ("serial", 1, 2500), ("sharded", 2, 2500)):
+            videos, counted, api, pool = _collect_on_mock(engine, target_per_category, keys, key_quota, workers)
+            retired = sum(u["exhausted"] for u in pool.usage().values())
+            name = (engine + (f" x{workers}" if engine == "sharded" else "") + ", 4 keys"
+                    + (f" x {key_quota} units ({retired} retired)" if key_quota else ""))
+            checks.append((f"{name}: same records, quota accounted",
+                           record_set(videos) == reference and _accounting_ok(counted, api, pool)
+                           and (key_quota is None or retired > 0)))
+        for engine in ("serial", "sharded"):
+            videos, counted, api, pool = _collect_on_mock(engine, target_per_category, keys[:2], 1000)
+            name = engine + (" x2" if engine == "sharded" else "")
+            checks.append((f"{name}, 2 keys x 1000 units: all retired, valid records, quota accounted",
+                           pool.exhausted() and records_valid(videos) and _accounting_ok(counted, api, pool)))
+        checks.append(("collection store rerun: same CSV, no videos calls", _store_rerun(target_per_category)))
+    finally:
+        youtube_data.API_BASE, youtube_data.REQUEST_DELAY, youtube_data.CACHE, youtube_data.KEYS = saved
+
+    for name, good in checks:
+        ok &= good
+        print(f"  {name:76} {'✓' if good else '✗'}")
+    print(f"\n  {'✅ Every collector check passed' if ok else '❌ Collector check failed'}")
+    return ok
+
+
+# Run a script in its own process; returns wall time, peak RSS (MB) and exit status.
+# The caller must stay small: Linux carries the parent's peak RSS into the child.
+def _run_script(args, cwd):
+    env = dict(os.environ, MPLBACKEND="Agg",
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + args, cwd=cwd, env=env,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+        # wait4 returns this child's own resource usage
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        stderr.seek(0)
+        error = stderr.read().decode("utf-8", "replace").strip().splitlines()[-1:]
+
+    peak_mb = usage.ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3)
+    result = {"seconds": seconds, "peak_rss_mb": peak_mb, "ok": proc.returncode == 0}
+    if proc.returncode:
+        result["error"] = error[0] if error else f"exit status {proc.returncode}"
+    return result
+
+
+# Generate each (size, format) dataset in a scratch directory and time the analysis scripts on it
+def analysis_benchmark(sizes=DEFAULT_SIZES, formats=("csv", "parquet"), seed=0, category_mix=None):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for n_rows in sizes:
+        for fmt in formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                name = "youtube_length_engagement.csv" if fmt == "csv" else "youtube_length_engagement_parquet"
+                path = os.path.join(tmp, name)
+                # Generated in a child process so this one never holds the full frame
+                start = time.perf_counter()
+                proc = ctx.Process(target=write_synthetic, args=(n_rows, path, fmt, seed, category_mix))
+                proc.start()
+                proc.join()
+                generate_seconds = time.perf_counter() - start
+
+                scripts = [["engagement_analysis.py"] + (["--parquet", name] if fmt == "parquet" else [])]
+                if fmt == "csv":
+                    scripts.append(["streaming_analysis.py", name])
+                for script in scripts:
+                    run = _run_script([os.path.join(REPO_DIR, script[0])] + script[1:], tmp)
+                    row = {"script": script[0], "format": fmt, "rows": n_rows,
+                           "generate_seconds": generate_seconds, **run}
+                    results.append(row)
+                    status = "" if run["ok"] else f"  ❌ {run['error']}"
+                    print(f"  {script[0]:24} {fmt:8} {n_rows:>11,} rows  {run['seconds']:7.2f}s  "
+                          f"peak RSS {run['peak_rss_mb']:7.0f} MB{status}")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, formats=("csv", "parquet"), collector=True, analysis=True,
+              collector_options=None, mock_options=None, seed=0, category_mix=None):
+    results = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"sizes": list(sizes), "formats": list(formats), "seed": seed,
+                   "collector": collector_options or {}, "mock": mock_options or {}},
+    }
+
+    if collector:
+        print(f"\n{'='*60}")
+        print("COLLECTOR (mock API)")
+        print(f"{'='*60}")
+        results["collector"] = collector_benchmark(**(collector_options or {}), **(mock_options or {}))
+        for engine, r in results["collector"].items():
+            quota = f"{r['quota_per_video']:.1f}" if r["quota_per_video"] is not None else "n/a"
+            print(f"  {engine:7} {r['videos']:4} videos in {r['seconds']:6.2f}s  "
+                  f"{r['requests_per_s']:6.1f} req/s  {r['videos_per_s']:6.1f} videos/s  "
+                  f"quota/video {quota}  errors {sum(r['errors'].values())}")
+
+    if analysis:
+        print(f"\n{'='*60}")
+        print("ANALYSIS (synthetic datasets)")
+        print(f"{'='*60}")
+        results["analysis"] = analysis_benchmark(sizes, formats, seed, category_mix)
+    return results
+
+
+# Lower is better for every compared metric except the throughputs
+def _metrics(results):
+    metrics = {}
+    for engine, r in results.get("collector", {}).items():
+        metrics[f"collector {engine} seconds"] = (r["seconds"], False)
+        metrics[f"collector {engine} videos/s"] = (r["videos_per_s"], True)
+        metrics[f"collector {engine} quota/video"] = (r["quota_per_video"], False)
+    for r in results.get("analysis", []):
+        key = f"{r['script']} {r['format']} {r['rows']:,}"
+        if r["ok"]:
+            metrics[f"{key} seconds"] = (r["seconds"], False)
+            metrics[f"{key} peak MB"] = (r["peak_rss_mb"], False)
+    return metrics
+
+
+# Print the change of every metric present in both runs; returns the regressed ones
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    before, after = _metrics(baseline), _metrics(current)
+    print(f"\n{'='*60}")
+    print(f"COMPARISON ({baseline.get('commit')} -> {current.get('commit')})")
+    print(f"{'='*60}")
+    regressions = []
+    for name, (new, higher_is_better) in after.items():
+        if name not in before or not before[name][0] or new is None:
+            continue
+        old = before[name][0]
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = "  ⚠️ regression"
+            regressions.append(name)
+        print(f"  {name:48} {old:10.3f} -> {new:10.3f}  ({change:+.1%}){flag}")
+    print(f"\n  {len(regressions)} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    from mock_youtube_api import parse_category_mix
+
+    parser = argparse.ArgumentParser(description="Collector and analysis benchmarks (no API key needed)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic dataset rows")
+    parser.add_argument("--formats", nargs="+", choices=["csv", "parquet"], default=["csv", "parquet"])
+    parser.add_argument("--skip-collector", action="store_true")
+    parser.add_argument("--skip-analysis", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help=f"results file (default: {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="compare with an earlier results file")
+    parser.add_argument("--check", action="store_true", help="collector correctness checks on the mock API")
+    # Collector / mock API
+    parser.add_argument("--target", type=int, default=30, help="videos per category and phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="async requests per second (0 = unlimited)")
+    parser.add_argument("--request-delay", type=float, default=0.0, help="serial pacing between requests")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--results-per-query", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--category-mix", help="category weights of the mock API and synthetic datasets, "
+                                               "e.g. 20=4,10=1,26=1,28=1")
+    # Dataset generator only
+    parser.add_argument("--generate", type=int, metavar="ROWS", help="write one synthetic dataset and exit")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--path", help="output of --generate")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_collectors(args.target) else 1)
+
+    category_mix = parse_category_mix(args.category_mix)
+    if args.generate:
+        path = args.path or ("synthetic.csv" if args.format == "csv" else "synthetic_parquet")
+        write_synthetic(args.generate, path, args.format, args.seed, category_mix)
+        print(f"✓ Wrote {args.generate:,} synthetic rows to {path}")
+        sys.exit()
+
+    mock_options = {"latency": args.latency, "latency_jitter": args.latency_jitter,
+                    "page_size": args.page_size, "results_per_query": args.results_per_query,
+                    "error_rate": args.error_rate, "category_mix": category_mix,
+                    "seed": args.seed}
+    collector_options = {"target_per_category": args.target, "concurrency": args.concurrency,
+                         "rate": args.rate, "request_delay": args.request_delay}
+    results = run_suite(args.sizes, args.formats, not args.skip_collector, not args.skip_analysis,
+                        collector_options, mock_options, args.seed, category_mix)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Saved results to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
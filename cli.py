@@ -0,0 +1,136 @@
+"""
+Command-line entry point for the study: collect, analyze, plot and track.
+
+Each subcommand imports only what it needs, so `analyze --stats-only` never
+loads matplotlib/seaborn and never touches the network code.
+
+Usage:
+    python cli.py collect                       # same as python youtube_data.py
+    python cli.py collect --engine async --concurrency 8
+    python cli.py collect --engine sharded --workers 4   # keys from YOUTUBE_API_KEYS
+    python cli.py collect --live                # running statistics while collecting
+    python cli.py analyze                       # same as python engagement_analysis.py
+    python cli.py analyze --stats-only          # report only, no figure
+    python cli.py analyze --incremental         # report from cached partition summaries
+    python cli.py analyze --parquet big_parquet # read a partitioned Parquet dataset
+    python cli.py plot --out figure.png --dpi 150
+    python cli.py plot --backend binned         # aggregated figure for large datasets
+    python cli.py track                         # re-poll statistics of the dataset's videos
+    python cli.py track --cycles 24 --interval 3600 --max-ids 500
+"""
+import argparse
+
+
+def _collect(args):
+    import youtube_data
+
+    cache_path = None if args.no_cache else args.cache_path
+    common = dict(metrics_report=args.metrics_report, prometheus_path=args.prometheus_textfile,
+                  extra_categories=args.extra_categories, key_quota=args.key_quota,
+                  live_interval=args.live_interval if args.live else None)
+    if args.engine == "async":
+        return youtube_data.main("async", cache_path, args.refresh_stats, **common,
+                                 concurrency=args.concurrency, rate=args.rate)
+    if args.engine == "sharded":
+        return youtube_data.main("sharded", cache_path, args.refresh_stats, **common, workers=args.workers)
+    return youtube_data.main(cache_path=cache_path, refresh_stats=args.refresh_stats, quota_budget=args.budget,
+                             store_path=None if args.no_store else args.store_path,
+                             max_age_hours=args.max_age_hours, **common)
+
+
+def _analyze(args):
+    if args.incremental:
+        from incremental_analysis import analyze as analyze_incremental
+        return analyze_incremental(args.data, args.parquet)
+    from engagement_analysis import analyze
+    return analyze(args.data, stats_only=args.stats_only, figure_path=args.figure, parquet=args.parquet,
+                   backend=args.backend, workers=args.workers, use_cache=not args.no_figure_cache)
+
+
+def _plot(args):
+    from engagement_analysis import load, plot
+    return plot(load(args.data, args.parquet), args.out, args.dpi, backend=args.backend, workers=args.workers,
+                use_cache=not args.no_figure_cache)
+
+
+def _track(args):
+    from engagement_tracker import track
+    return track(args.data, args.store, args.cycles, args.interval, args.max_ids)
+
+
+def _add_data_arguments(parser):
+    parser.add_argument("--data", default="youtube_length_engagement.csv")
+    parser.add_argument("--parquet", metavar="ROOT", help="read this partitioned Parquet dataset instead of "
+                        "--data (default: the collector's Parquet copy, only if it was written from --data)")
+
+
+def _add_figure_arguments(parser):
+    parser.add_argument("--backend", choices=["auto", "exact", "binned"], default="auto",
+                        help="per-point figure or binned aggregates (auto: binned above 100k rows)")
+    parser.add_argument("--workers", type=int, help="binned backend: processes drawing panels")
+    parser.add_argument("--no-figure-cache", action="store_true",
+                        help="render even if the data and options are unchanged")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="YouTube video length & engagement study")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    collect = commands.add_parser("collect", help="collect videos from the YouTube Data API")
+    collect.add_argument("--engine", choices=["serial", "async", "sharded"], default="serial")
+    collect.add_argument("--concurrency", type=int, default=8, help="async engine: parallel requests")
+    collect.add_argument("--rate", type=float, default=10.0, help="async engine: max requests per second")
+    collect.add_argument("--workers", type=int, default=4, help="sharded engine: worker processes")
+    collect.add_argument("--key-quota", type=int, help="daily quota units per API key (default 10000)")
+    collect.add_argument("--extra-categories", action="store_true",
+                         help="also collect People & Blogs and Entertainment")
+    collect.add_argument("--cache-path", default=".api_cache.sqlite", help="on-disk API response cache")
+    collect.add_argument("--no-cache", action="store_true", help="always hit the network")
+    collect.add_argument("--refresh-stats", action="store_true",
+                         help="reuse cached search pages, refetch only stale video statistics")
+    collect.add_argument("--budget", type=int, help="quota budget; schedule terms by observed yield")
+    collect.add_argument("--store-path", default=".collection.sqlite", help="resumable collection store")
+    collect.add_argument("--no-store", action="store_true", help="start from zero and keep nothing")
+    collect.add_argument("--max-age-hours", type=float, default=24,
+                         help="refetch statistics of stored records older than this")
+    collect.add_argument("--metrics-report", metavar="JSON", help="write a structured run report (latency, "
+                         "errors, quota and bytes per endpoint, per-term yield, phase timings)")
+    collect.add_argument("--prometheus-textfile", metavar="PATH", help="write the run metrics as a Prometheus textfile")
+    collect.add_argument("--live", action="store_true",
+                         help="report running statistics of the collected videos during collection")
+    collect.add_argument("--live-interval", type=float, default=30, help="seconds between live reports")
+    collect.set_defaults(func=_collect)
+
+    analyze = commands.add_parser("analyze", help="statistics report (and figure)")
+    _add_data_arguments(analyze)
+    analyze.add_argument("--stats-only", action="store_true", help="skip rendering the figure")
+    analyze.add_argument("--figure", default="youtube_engagement_analysis.png")
+    analyze.add_argument("--incremental", action="store_true", help="report from cached per-partition summaries, "
+                         "recomputing only changed partitions (no figure)")
+    _add_figure_arguments(analyze)
+    analyze.set_defaults(func=_analyze)
+
+    plot = commands.add_parser("plot", help="render the figure only")
+    _add_data_arguments(plot)
+    plot.add_argument("--out", default="youtube_engagement_analysis.png")
+    plot.add_argument("--dpi", type=int, default=300)
+    _add_figure_arguments(plot)
+    plot.set_defaults(func=_plot)
+
+    track = commands.add_parser("track", help="re-poll video statistics into an engagement time series")
+    track.add_argument("--data", default="youtube_length_engagement.csv", help="dataset whose videos to track")
+    track.add_argument("--store", default=".engagement_tracks.bin", help="delta-encoded snapshot store")
+    track.add_argument("--cycles", type=int, default=1, help="refresh cycles to run")
+    track.add_argument("--interval", type=float, default=3600, help="seconds between cycles")
+    track.add_argument("--max-ids", type=int, help="videos refreshed per cycle at most (50 per quota unit)")
+    track.set_defaults(func=_track)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Append-only local store for collection runs, so progress survives crashes and
+quota exhaustion and later runs are incremental.
+
+Everything lives in one SQLite file:
+  * videos     - one row per fetched video record (appended, never updated);
+                 the newest row per video_id is the current one
+  * term_pages - pagination state per (run, category, phase, term), saved after
+                 every search page so a run resumes exactly where it stopped
+  * runs       - a run stays open until main() finishes; starting again while
+                 one is open resumes it instead of searching from scratch
+
+On an incremental run, records fetched less than max_age ago are reused and
+only new IDs (and records older than max_age) go to the videos endpoint.
+"""
+import json
+import sqlite3
+import time
+
+DEFAULT_MAX_AGE = 24 * 3600  # refresh statistics older than a day
+
+RECORD_COLUMNS = ["video_id", "title", "category", "duration_seconds",
+                  "views", "likes", "comments", "published_at"]
+
+
+class CollectionStore:
+    """SQLite-backed record and checkpoint store for the collector."""
+
+    def __init__(self, path=".collection.sqlite", max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.records_written = 0
+        self.pages_checkpointed = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started REAL NOT NULL,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT NOT NULL,
+                title TEXT,
+                category TEXT,
+                duration_seconds INTEGER,
+                views INTEGER,
+                likes INTEGER,
+                comments INTEGER,
+                published_at TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_videos_id ON videos(video_id, fetched_at);
+            CREATE TABLE IF NOT EXISTS term_pages (
+                run_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                term TEXT NOT NULL,
+                ids TEXT NOT NULL,
+                next_page TEXT,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_id, category, phase, term)
+            );
+            """
+        )
+        self._conn.commit()
+        self.run_id, self.resumed = self._open_run()
+
+    # Resume the last unfinished run, or start a new one
+    def _open_run(self):
+        row = self._conn.execute(
+            "SELECT run_id FROM runs WHERE finished IS NULL ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        if row:
+            return row[0], True
+        cur = self._conn.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),))
+        self._conn.commit()
+        return cur.lastrowid, False
+
+    def finish_run(self):
+        self._conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), self.run_id))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    # Pagination state of one search term in this run, or None if it has not started
+    def term_state(self, cat_id, phase, term):
+        row = self._conn.execute(
+            "SELECT ids, next_page, done FROM term_pages "
+            "WHERE run_id = ? AND category = ? AND phase = ? AND term = ?",
+            (self.run_id, cat_id, phase, term),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"ids": json.loads(row[0]), "next_page": row[1], "done": bool(row[2])}
+
+    def save_term_state(self, cat_id, phase, term, ids, next_page, done=False):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO term_pages (run_id, category, phase, term, ids, next_page, done) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.run_id, cat_id, phase, term, json.dumps(ids), next_page, int(done)),
+        )
+        self._conn.commit()
+        self.pages_checkpointed += 1
+
+    # Append freshly fetched videos: rows `start` onward of an api_decoder.VideoColumns (category-agnostic)
+    def add_columns(self, columns, start=0):
+        now = time.time()
+        rows = [row + (now,) for row in columns.rows(start)]
+        if not rows:
+            return
+        self._conn.executemany(
+            f"INSERT INTO videos ({', '.join(RECORD_COLUMNS)}, fetched_at) "
+            f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 1))})",
+            rows,
+        )
+        self._conn.commit()
+        self.records_written += len(rows)
+
+    # Newest record per video, keyed like youtube_data.record_from_item; with fresh_only, records older
+    # than max_age are left out. category_names (category id -> name) fills in category_name.
+    def latest_records(self, fresh_only=True, category_names=None):
+        cutoff = time.time() - self.max_age if fresh_only and self.max_age is not None else 0
+        rows = self._conn.execute(
+            f"SELECT {', '.join(RECORD_COLUMNS)}, MAX(fetched_at) FROM videos "
+            "GROUP BY video_id HAVING MAX(fetched_at) >= ?",
+            (cutoff,),
+        ).fetchall()
+        category_names = category_names or {}
+        records = []
+        for row in rows:
+            stored = dict(zip(RECORD_COLUMNS, row))
+            records.append({
+                "video_id": stored["video_id"],
+                "title": stored["title"],
+                "category": stored["category"],
+                "category_name": category_names.get(stored["category"]),
+                "duration_seconds": stored["duration_seconds"],
+                "duration_minutes": stored["duration_seconds"] / 60,
+                "views": stored["views"],
+                "likes": stored["likes"],
+                "comments": stored["comments"],
+                "published_at": stored["published_at"],
+            })
+        return records
+
+    def summary(self):
+        total = self._conn.execute("SELECT COUNT(DISTINCT video_id) FROM videos").fetchone()[0]
+        state = "resumed" if self.resumed else "new"
+        return (f"Store: run {self.run_id} ({state}), {self.records_written} records appended, "
+                f"{self.pages_checkpointed} pages checkpointed, {total} videos stored")
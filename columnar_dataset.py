@@ -0,0 +1,245 @@
+"""
+Partitioned columnar copy of the dataset (Parquet, hive-partitioned by
+category_name and publish month).
+
+The flat CSV forces every reader to parse all text, including long titles the
+statistics never use. The Parquet dataset lets the analysis read only the
+columns it needs (memory-mapped), and filters on category or publish date are
+pushed down so non-matching partitions are never opened.
+
+Requires pyarrow; without it the collector skips writing the dataset and the
+analysis falls back to the CSV. The analysis reads the Parquet dataset instead
+of a CSV only when asked to (`--parquet ROOT`), or when the dataset's source
+marker shows it was written from that very CSV (same path, size and mtime), as
+the collector does.
+
+Usage:
+    python columnar_dataset.py                       # convert youtube_length_engagement.csv
+    python columnar_dataset.py --benchmark 1000000   # load time / peak RSS vs the CSV
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+
+from engagement_metrics import COUNT_COLUMNS, prepare
+
+DATASET_DIR = "youtube_length_engagement_parquet"
+CSV_PATH = "youtube_length_engagement.csv"
+PARTITION_COLUMNS = ["category_name", "publish_month"]
+# Columns engagement_analysis.py actually uses
+ANALYSIS_COLUMNS = ["category_name", "duration_minutes", "like_view_ratio"]
+# Written next to the partitions when the dataset is a copy of one CSV ("_" files are not read as data)
+SOURCE_MARKER = "_source.json"
+
+
+# Identity of a CSV file: resolved path, size and modification time
+def _fingerprint(path):
+    st = os.stat(path)
+    return {"path": os.path.realpath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# True if the dataset at root was written from csv_path and the CSV has not changed since
+def derived_from(root, csv_path):
+    try:
+        with open(os.path.join(root, SOURCE_MARKER), encoding="utf-8") as f:
+            return json.load(f) == _fingerprint(csv_path)
+    except (OSError, ValueError):
+        return False
+
+
+# Parquet dataset to analyze instead of csv_path: `root` when given, else the default dataset
+# if it is a copy of csv_path; None means read the CSV
+def parquet_root(csv_path=CSV_PATH, root=None):
+    if root is not None:
+        return root
+    return DATASET_DIR if derived_from(DATASET_DIR, csv_path) else None
+
+
+# True if root holds a dataset this module wrote: it carries the source marker, or holds
+# nothing but category_name=* partitions of .parquet files
+def _is_dataset(root):
+    if os.path.isfile(os.path.join(root, SOURCE_MARKER)):
+        return True
+    for name in os.listdir(root):
+        if not (name.startswith(f"{PARTITION_COLUMNS[0]}=") and os.path.isdir(os.path.join(root, name))):
+            return False
+    for _, _, files in os.walk(root):
+        if any(not f.endswith(".parquet") for f in files):
+            return False
+    return True
+
+
+# Write (replacing any previous dataset) the Parquet dataset; with append=True the
+# rows are added as new files next to the existing ones (chunked writers).
+# source: the CSV these rows were read from, recorded so analyses of that CSV may use the copy.
+# A replacement is written to a sibling directory and swapped in, and an existing root that
+# is not a dataset is refused rather than deleted.
+def write_dataset(df, root=DATASET_DIR, append=False, source=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    root = os.path.normpath(root)
+    if not append and os.path.lexists(root) and not (os.path.isdir(root) and _is_dataset(root)):
+        raise ValueError(f"{root} exists and is not a Parquet dataset; refusing to overwrite it")
+
+    # Collector schema whatever the caller loaded: duration_category is derived again on load
+    out = df.drop(columns=["duration_category"], errors="ignore")
+    for col in COUNT_COLUMNS + ["duration_seconds"]:
+        if col in out:
+            out[col] = out[col].astype("int64")
+    for col in ("video_id", "title", "category"):
+        if col in out:
+            out[col] = out[col].astype(str)
+    published = out["published_at"]
+    if pd.api.types.is_datetime64_any_dtype(published):
+        out["publish_month"] = published.dt.strftime("%Y-%m")
+    else:
+        out["publish_month"] = published.astype(str).str.slice(0, 7)
+        out["published_at"] = pd.to_datetime(published, utc=True)
+    out["category_name"] = out["category_name"].astype(str)
+
+    table = pa.Table.from_pandas(out, preserve_index=False)
+    options = {"partitioning": PARTITION_COLUMNS, "partitioning_flavor": "hive",
+               "existing_data_behavior": "overwrite_or_ignore"}
+    if append:
+        ds.write_dataset(table, root, format="parquet",
+                         basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet", **options)
+        marker = os.path.join(root, SOURCE_MARKER)
+        if os.path.exists(marker):
+            # Appended rows: no longer a copy of one CSV
+            os.remove(marker)
+        return root
+
+    # Partitions the new rows do not touch must not keep stale rows, and readers must never
+    # see a half-written dataset: build the new one next to root, then swap it in
+    parent, name = os.path.split(os.path.abspath(root))
+    staging = tempfile.mkdtemp(prefix=f".{name}-", dir=parent)
+    try:
+        ds.write_dataset(table, staging, format="parquet", **options)
+        if source is not None:
+            with open(os.path.join(staging, SOURCE_MARKER), "w", encoding="utf-8") as f:
+                json.dump(_fingerprint(source), f)
+        if os.path.lexists(root):
+            previous = staging + ".old"
+            os.replace(root, previous)
+            os.replace(staging, root)
+            shutil.rmtree(previous, ignore_errors=True)
+        else:
+            os.replace(staging, root)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return root
+
+
+# Read selected columns; categories and [start, end] publish dates are pushed down to partitions
+def load_dataset(root=DATASET_DIR, columns=None, categories=None, start=None, end=None):
+    import pyarrow.parquet as pq
+
+    filters = []
+    if categories:
+        filters.append(("category_name", "in", list(categories)))
+    if start is not None:
+        start = pd.Timestamp(start, tz="UTC")
+        filters += [("publish_month", ">=", start.strftime("%Y-%m")), ("published_at", ">=", start)]
+    if end is not None:
+        end = pd.Timestamp(end, tz="UTC")
+        filters += [("publish_month", "<=", end.strftime("%Y-%m")), ("published_at", "<=", end)]
+
+    table = pq.read_table(root, columns=columns, filters=filters or None,
+                          memory_map=True, partitioning="hive")
+    df = table.to_pandas()
+    if columns is None and "publish_month" in df:
+        df = df.drop(columns="publish_month")
+    return prepare(df)
+
+
+# Analysis input: the Parquet dataset at `root` if given, or the collector's copy of csv_path
+# (when pyarrow is installed), else the CSV itself
+def load_analysis_data(csv_path=CSV_PATH, root=None, columns=ANALYSIS_COLUMNS, **filters):
+    source = parquet_root(csv_path, root)
+    if source is not None:
+        try:
+            return load_dataset(source, columns, **filters)
+        except ImportError:
+            if root is not None:
+                raise
+    from engagement_metrics import load_dataset as load_csv
+    return load_csv(csv_path)
+
+
+def _timed_load(kind, path, queue):
+    import resource
+    start = time.perf_counter()
+    if kind == "csv (all columns)":
+        from engagement_metrics import load_dataset as load_csv
+        df = load_csv(path)
+    elif kind == "csv (usecols)":
+        df = prepare(pd.read_csv(path, usecols=ANALYSIS_COLUMNS))
+    elif kind == "parquet (analysis columns)":
+        df = load_dataset(path, ANALYSIS_COLUMNS)
+    else:  # one category, one year
+        df = load_dataset(path, ANALYSIS_COLUMNS, categories=["Gaming"],
+                          start="2024-01-01", end="2024-12-31")
+    seconds = time.perf_counter() - start
+    queue.put((seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3, len(df)))
+
+
+def _write_synthetic(n_rows, csv_path, root):
+    from engagement_metrics import add_engagement_metrics, synthetic_dataset
+
+    df = add_engagement_metrics(synthetic_dataset(n_rows))
+    df["title"] = "Overconfidence 🙃 Free Fire 999+ IQ Players Funny Game #shorts #funny"
+    df.to_csv(csv_path, index=False)
+    write_dataset(df, root)
+
+
+# Each step runs in a fresh process so peak RSS is measured in isolation (Linux keeps
+# ru_maxrss across exec, so the parent must never hold the full frame itself)
+def benchmark(n_rows=1_000_000):
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, root = os.path.join(tmp, "data.csv"), os.path.join(tmp, "parquet")
+        proc = ctx.Process(target=_write_synthetic, args=(n_rows, csv_path, root))
+        proc.start()
+        proc.join()
+
+        print(f"\n{'='*60}")
+        print(f"LOAD BENCHMARK ({n_rows:,} rows)")
+        print(f"{'='*60}")
+        results = {}
+        for kind, path in (("csv (all columns)", csv_path), ("csv (usecols)", csv_path),
+                           ("parquet (analysis columns)", root), ("parquet (Gaming, 2024)", root)):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_timed_load, args=(kind, path, queue))
+            proc.start()
+            seconds, peak_mb, rows = queue.get()
+            proc.join()
+            results[kind] = {"seconds": seconds, "peak_rss_mb": peak_mb, "rows": rows}
+            print(f"  {kind:28} {seconds:6.2f}s  peak RSS {peak_mb:7.0f} MB  ({rows:,} rows)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitioned Parquet copy of the dataset")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--out", default=DATASET_DIR)
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="compare load paths on synthetic rows")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        from engagement_metrics import load_dataset as load_csv
+        try:
+            write_dataset(load_csv(args.csv), args.out, source=args.csv)
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        print(f"✓ Wrote partitioned dataset to {args.out}/")
@@ -0,0 +1,211 @@
+"""
+Shared engagement metrics and dataset schema for the collector and the analysis.
+
+All ratio and bucket columns are derived in one vectorized pass (no row-wise
+df.apply), videos with zero views get ratios of 0 instead of dividing by zero,
+and loaded datasets use a compact schema: categorical category/bucket columns,
+downcast integer counts and parsed timestamps.
+
+Usage:
+    python engagement_metrics.py --benchmark               # 1M and 10M synthetic rows
+    python engagement_metrics.py --benchmark --rows 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Duration buckets used throughout the study
+SHORT_MAX_MINUTES = 10
+LONG_MIN_MINUTES = 20
+SHORT_LABEL = "Short (<10 min)"
+LONG_LABEL = "Long (>20 min)"
+# Long first so groupby/unstack output keeps the original (alphabetical) column order
+DURATION_LABELS = [LONG_LABEL, SHORT_LABEL]
+
+METRIC_COLUMNS = ["like_view_ratio", "comment_view_ratio", "engagement_rate"]
+
+# dtypes applied at read time; counts are downcast after loading
+CSV_DTYPES = {
+    "video_id": "string",
+    "title": "string",
+    "category": "category",
+    "category_name": "category",
+    "duration_seconds": "int32",
+    "duration_minutes": "float64",
+    "like_view_ratio": "float64",
+    "comment_view_ratio": "float64",
+    "engagement_rate": "float64",
+}
+COUNT_COLUMNS = ["views", "likes", "comments"]
+
+
+# like/comment/total engagement per view from float64 count arrays; zero views -> 0
+def engagement_ratios(views, likes, comments):
+    has_views = views > 0
+    safe_views = np.where(has_views, views, 1.0)
+    return {
+        "like_view_ratio": np.where(has_views, likes / safe_views, 0.0),
+        "comment_view_ratio": np.where(has_views, comments / safe_views, 0.0),
+        # Combined engagement: (likes + comments) / views
+        "engagement_rate": np.where(has_views, (likes + comments) / safe_views, 0.0),
+    }
+
+
+# The three ratio columns, in place
+def add_engagement_metrics(df):
+    ratios = engagement_ratios(*(df[col].to_numpy(dtype="float64") for col in COUNT_COLUMNS))
+    for col in METRIC_COLUMNS:
+        df[col] = ratios[col]
+    return df
+
+
+# Short if under 10 minutes, otherwise Long (the analysis treats everything else as long)
+def add_duration_category(df):
+    is_short = df["duration_minutes"].to_numpy() < SHORT_MAX_MINUTES
+    codes = is_short.astype("int8")  # index into DURATION_LABELS
+    df["duration_category"] = pd.Categorical.from_codes(codes, categories=DURATION_LABELS)
+    return df
+
+
+# API timestamps are always "YYYY-MM-DDTHH:MM:SSZ"; an explicit format is much faster than inference
+def parse_timestamps(series):
+    try:
+        return pd.to_datetime(series.str.slice(0, 19), format="%Y-%m-%dT%H:%M:%S").dt.tz_localize("UTC")
+    except (ValueError, TypeError, AttributeError):
+        return pd.to_datetime(series, utc=True)
+
+
+# Downcast counts, categorize labels and parse timestamps, in place
+def compact(df):
+    for col in COUNT_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], downcast="unsigned")
+    for col in ("category", "category_name"):
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    if "published_at" in df and not pd.api.types.is_datetime64_any_dtype(df["published_at"]):
+        df["published_at"] = parse_timestamps(df["published_at"])
+    return df
+
+
+# Compact schema plus every derived column (ratios are only computed if missing and
+# the counts were loaded; column-selective loads may bring just one ratio)
+def prepare(df):
+    compact(df)
+    if not set(METRIC_COLUMNS).issubset(df.columns) and set(COUNT_COLUMNS).issubset(df.columns):
+        add_engagement_metrics(df)
+    add_duration_category(df)
+    return df
+
+
+def load_dataset(path="youtube_length_engagement.csv"):
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    return prepare(df)
+
+
+# Synthetic rows with the collector's schema (for benchmarks). IDs start at `start`, so
+# chunks generated with different seeds and offsets can be concatenated; `category_mix`
+# maps category names or IDs ("Gaming" or "20") to relative weights (uniform if None).
+def synthetic_dataset(n_rows, seed=0, start=0, category_mix=None):
+    rng = np.random.default_rng(seed)
+    categories = np.array(["Gaming", "Music", "How-to & Style", "Science & Technology"])
+    category_ids = np.array(["20", "10", "26", "28"])
+    if category_mix:
+        weights = np.array([category_mix.get(c, category_mix.get(i, 0))
+                            for c, i in zip(categories, category_ids)], dtype="float64")
+        if not weights.sum() > 0:
+            raise ValueError(f"category mix {category_mix} gives no weight to {categories.tolist()}")
+        cat_idx = rng.choice(len(categories), n_rows, p=weights / weights.sum())
+    else:
+        cat_idx = rng.integers(0, len(categories), n_rows)
+    seconds = np.where(rng.random(n_rows) < 0.5,
+                       rng.integers(61, 600, n_rows), rng.integers(1201, 7200, n_rows))
+    views = rng.lognormal(11, 2, n_rows).astype("int64")
+    views[rng.random(n_rows) < 0.001] = 0
+    likes = (views * rng.beta(2, 80, n_rows)).astype("int64")
+    comments = (views * rng.beta(1, 2000, n_rows)).astype("int64")
+    published = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(
+        rng.integers(0, 600 * 86400, n_rows), unit="s")
+    return pd.DataFrame({
+        "video_id": np.char.add("v", np.arange(start, start + n_rows).astype(str)),
+        "title": "synthetic title",
+        "category": category_ids[cat_idx],
+        "category_name": categories[cat_idx],
+        "duration_seconds": seconds,
+        "duration_minutes": seconds / 60,
+        "views": views,
+        "likes": likes,
+        "comments": comments,
+        "published_at": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    })
+
+
+# The previous implementation: row-wise apply on default dtypes
+def legacy_prepare(df):
+    df["like_view_ratio"] = df.apply(
+        lambda row: row["likes"] / row["views"] if row["views"] > 0 else 0, axis=1)
+    df["comment_view_ratio"] = df.apply(
+        lambda row: row["comments"] / row["views"] if row["views"] > 0 else 0, axis=1)
+    df["engagement_rate"] = df.apply(
+        lambda row: (row["likes"] + row["comments"]) / row["views"] if row["views"] > 0 else 0, axis=1)
+    df["duration_category"] = df["duration_minutes"].apply(
+        lambda x: SHORT_LABEL if x < 10 else LONG_LABEL)
+    return df
+
+
+def benchmark(sizes=(1_000_000, 10_000_000), legacy_max_rows=200_000):
+    print(f"\n{'='*60}")
+    print("METRICS BENCHMARK (synthetic rows)")
+    print(f"{'='*60}")
+    results = []
+    for n in sizes:
+        base = synthetic_dataset(n)
+        raw_mb = base.memory_usage(deep=True).sum() / 1e6
+
+        df = base.copy()
+        start = time.perf_counter()
+        compact(df)
+        schema_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        add_engagement_metrics(df)
+        add_duration_category(df)
+        seconds = time.perf_counter() - start
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        row = {"rows": n, "vectorized_seconds": seconds, "schema_seconds": schema_seconds,
+               "compact_mb": mb, "default_dtypes_mb": raw_mb}
+
+        print(f"\n  {n:,} rows")
+        print(f"    Vectorized metrics + buckets: {seconds:.2f}s "
+              f"(compact schema conversion: {schema_seconds:.2f}s)")
+        print(f"    Memory with derived columns: {mb:,.0f} MB "
+              f"(default dtypes, before derived columns: {raw_mb:,.0f} MB)")
+        if n <= legacy_max_rows:
+            df = base.copy()
+            start = time.perf_counter()
+            legacy_prepare(df)
+            legacy_seconds = time.perf_counter() - start
+            legacy_mb = df.memory_usage(deep=True).sum() / 1e6
+            row.update(legacy_seconds=legacy_seconds, legacy_mb=legacy_mb)
+            print(f"    Row-wise apply (default dtypes): {legacy_seconds:.2f}s, {legacy_mb:,.0f} MB "
+                  f"({legacy_seconds / seconds:.0f}x slower)")
+        else:
+            print(f"    Row-wise apply: skipped above {legacy_max_rows:,} rows (use --legacy-max-rows)")
+        results.append(row)
+        del base, df
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engagement metrics helpers")
+    parser.add_argument("--benchmark", action="store_true", help="time metrics on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--legacy-max-rows", type=int, default=200_000,
+                        help="largest size to also run the old row-wise path on")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.rows, args.legacy_max_rows)
+    else:
+        parser.print_help()
@@ -0,0 +1,481 @@
+"""
+Engagement time series: statistics of known videos re-polled over time.
+
+A collection run takes one snapshot of views, likes and comments, while
+published_at ranges from days to years back, so ratios mix videos at very
+different points of their lifetime. The tracker re-polls statistics for the
+collected video IDs through the 50-ID `videos` endpoint (1 quota unit per
+batch, `part=statistics` with a `fields=` projection), and:
+  * a RefreshScheduler decides who is polled next. Each video's next refresh is
+    set so that about TARGET_CHANGE (2%) of its views are expected to arrive in
+    between, from its observed view velocity. Recent, fast-growing videos come
+    back within hours, and settled ones only every few days.
+  * snapshots go to a SnapshotStore. Each video's series is a bytearray of
+    zigzag varint deltas (seconds since the previous snapshot, then the change
+    in each count) starting from (published_at, 0, 0, 0). A snapshot takes
+    about 8 bytes instead of 32 for four int64 values.
+  * engagement_at_age() interpolates every video's counts at the same age
+    since publishing (e.g. 48 h), so ratios can be compared like for like.
+
+Usage:
+    python cli.py track                                  # one refresh cycle for the dataset's videos
+    python cli.py track --cycles 24 --interval 3600      # keep polling, one cycle per hour
+    python cli.py track --max-ids 500                    # at most 500 videos (10 quota units) per cycle
+    python engagement_tracker.py --at-age 48             # engagement 48 h after publishing
+    python engagement_tracker.py --at-age 168 --max-gap-hours 72
+    python engagement_tracker.py --benchmark             # simulated: velocity priority vs round robin
+"""
+import argparse
+import heapq
+import math
+import os
+import struct
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+TRACK_PATH = ".engagement_tracks.bin"
+BATCH_SIZE = 50  # videos endpoint limit, 1 quota unit per call
+STATS_FIELDS = "items(id,statistics(viewCount,likeCount,commentCount))"
+
+TARGET_CHANGE = 0.02      # refresh once ~2% more views are expected
+MIN_INTERVAL = 3600       # seconds
+MAX_INTERVAL = 7 * 86400
+# engagement_at_age: snapshots further apart than this around the age give NaN, not an interpolation
+# (a few refresh intervals of a video that is still growing)
+DEFAULT_MAX_GAP_HOURS = 24
+
+_MAGIC = b"ETS1"
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _put_varint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+# Every varint in buf, decoded at once (NumPy, no per-byte Python loop)
+def _decode_varints(buf):
+    data = np.frombuffer(bytes(buf), dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shift = 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1))
+    zigzag = np.add.reduceat((data & 0x7F).astype(np.int64) << shift, starts)
+    return (zigzag >> 1) ^ -(zigzag & 1)
+
+
+# ISO timestamps (or datetimes) -> epoch seconds
+def _epoch_seconds(values):
+    return pd.to_datetime(pd.Series(values), utc=True).dt.as_unit("s").astype("int64").to_numpy()
+
+
+class SnapshotStore:
+    """Statistics snapshots per video, delta-encoded in one bytearray each."""
+
+    __slots__ = ("_index", "_ids", "_published", "_data", "_counts", "_last", "_previous")
+
+    def __init__(self):
+        self._index = {}  # video_id -> row
+        self._ids = []
+        self._published = array("q")
+        self._data = []  # bytearray per video
+        self._counts = array("l")
+        self._last = array("q")  # (time, views, likes, comments) per row
+        self._previous = array("q")  # (time, views) of the snapshot before the last
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._index
+
+    @property
+    def snapshots(self):
+        return sum(self._counts)
+
+    def ids(self):
+        return list(self._ids)
+
+    # Start tracking a video (published: epoch seconds); its series starts at (published, 0, 0, 0)
+    def track(self, video_id, published):
+        if video_id in self._index:
+            return False
+        self._index[video_id] = len(self._ids)
+        self._ids.append(video_id)
+        self._published.append(int(published))
+        self._data.append(bytearray())
+        self._counts.append(0)
+        self._last.extend((int(published), 0, 0, 0))
+        self._previous.extend((int(published), 0))
+        return True
+
+    def add(self, video_id, t, views, likes, comments):
+        row = self._index[video_id]
+        last = self._last[4 * row:4 * row + 4]
+        current = (int(t), int(views), int(likes), int(comments))
+        buf = self._data[row]
+        for value, before in zip(current, last):
+            _put_varint(buf, _zigzag(value - before))
+        self._previous[2 * row:2 * row + 2] = array("q", last[:2])
+        self._last[4 * row:4 * row + 4] = array("q", current)
+        self._counts[row] += 1
+
+    def published(self, video_id):
+        return self._published[self._index[video_id]]
+
+    # (time, views, likes, comments) of the newest snapshot, or None before the first
+    def latest(self, video_id):
+        row = self._index[video_id]
+        return tuple(self._last[4 * row:4 * row + 4]) if self._counts[row] else None
+
+    # (time, views) of the snapshot before the newest ((published, 0) if there is one snapshot)
+    def previous(self, video_id):
+        row = self._index[video_id]
+        return tuple(self._previous[2 * row:2 * row + 2])
+
+    # Arrays t, views, likes, comments, starting with the (published, 0, 0, 0) origin
+    def series(self, video_id):
+        row = self._index[video_id]
+        deltas = _decode_varints(self._data[row]).reshape(-1, 4)
+        origin = np.array([[self._published[row], 0, 0, 0]], dtype=np.int64)
+        points = np.cumsum(np.vstack([origin, deltas]), axis=0)
+        return points[:, 0], points[:, 1], points[:, 2], points[:, 3]
+
+    # Bytes of encoded snapshots, and per video (id, publish time, counts, last/previous snapshot)
+    def nbytes(self):
+        data = sum(len(b) for b in self._data)
+        per_video = sum(len(v.encode("utf-8")) for v in self._ids) + len(self._ids) * (8 + 4 + 48)
+        return data, per_video
+
+    def save(self, path=TRACK_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC + struct.pack("<I", len(self._ids)))
+            for row, video_id in enumerate(self._ids):
+                key = video_id.encode("utf-8")
+                f.write(struct.pack("<B", len(key)) + key)
+                f.write(struct.pack("<qII", self._published[row], self._counts[row], len(self._data[row])))
+                f.write(self._data[row])
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=TRACK_PATH):
+        store = cls()
+        if not os.path.exists(path):
+            return store
+        with open(path, "rb") as f:
+            blob = f.read()
+        if blob[:4] != _MAGIC:
+            raise ValueError(f"{path} is not an engagement track file")
+        (n,), pos = struct.unpack_from("<I", blob, 4), 8
+        for _ in range(n):
+            size = blob[pos]
+            video_id = blob[pos + 1:pos + 1 + size].decode("utf-8")
+            pos += 1 + size
+            published, count, length = struct.unpack_from("<qII", blob, pos)
+            pos += 16
+            store.track(video_id, published)
+            row = store._index[video_id]
+            store._data[row] = bytearray(blob[pos:pos + length])
+            store._counts[row] = count
+            pos += length
+            if count:
+                t, views, likes, comments = store.series(video_id)
+                store._last[4 * row:4 * row + 4] = array("q", (t[-1], views[-1], likes[-1], comments[-1]))
+                store._previous[2 * row:2 * row + 2] = array("q", (t[-2], views[-2]))
+        return store
+
+
+class RefreshScheduler:
+    """Next refresh time per video; the most overdue videos are polled first."""
+
+    def __init__(self, target_change=TARGET_CHANGE, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.target_change = target_change
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._heap = []  # (due, video_id)
+
+    def __len__(self):
+        return len(self._heap)
+
+    # Seconds until the views are expected to grow by target_change, from the last two snapshots
+    def interval(self, views, velocity):
+        if velocity <= 0:
+            return self.max_interval
+        seconds = self.target_change * max(views, 1) / velocity
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def schedule(self, video_id, due):
+        heapq.heappush(self._heap, (due, video_id))
+
+    # Reschedule after a snapshot at t: velocity is views per second since the previous snapshot
+    def reschedule(self, store, video_id):
+        t, views, _, _ = store.latest(video_id)
+        t_before, views_before = store.previous(video_id)
+        velocity = (views - views_before) / max(t - t_before, 1)
+        self.schedule(video_id, t + self.interval(views, velocity))
+
+    # Up to `limit` videos due at `now`, most overdue first
+    def due(self, now, limit=None):
+        out = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(out) < limit):
+            out.append(heapq.heappop(self._heap)[1])
+        return out
+
+    # Put videos back (e.g. a batch that failed) without changing their order
+    def requeue(self, video_ids, now):
+        for video_id in video_ids:
+            self.schedule(video_id, now)
+
+
+# Current statistics for up to 50 IDs: {video_id: (views, likes, comments)}; None if the call failed
+def fetch_statistics(video_ids):
+    import youtube_data
+
+    res = youtube_data.api_get("videos", {"part": "statistics", "id": ",".join(video_ids),
+                                          "fields": STATS_FIELDS, "key": youtube_data.API_KEY})
+    if "error" in res:
+        print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
+        return None
+    out = {}
+    for item in res.get("items", []):
+        stats = item.get("statistics", {})
+        out[item.get("id")] = (int(stats.get("viewCount", 0)), int(stats.get("likeCount", 0)),
+                               int(stats.get("commentCount", 0)))
+    return out
+
+
+class EngagementTracker:
+    """Refresh cycles: poll the due videos in 50-ID batches and record their snapshots."""
+
+    # fetch: video IDs -> {video_id: (views, likes, comments)} (default: the videos endpoint)
+    # clock: current time in epoch seconds (a simulated clock in the benchmark)
+    def __init__(self, store=None, scheduler=None, fetch=fetch_statistics, clock=time.time):
+        self.store = store if store is not None else SnapshotStore()
+        self.scheduler = scheduler if scheduler is not None else RefreshScheduler()
+        self.fetch = fetch
+        self.clock = clock
+        self.cycles = []
+        # Videos already in the store are due again per their last two snapshots
+        for video_id in self.store.ids():
+            if self.store.latest(video_id) is None:
+                self.scheduler.schedule(video_id, 0)
+            else:
+                self.scheduler.reschedule(self.store, video_id)
+
+    # Start tracking videos (due right away); published_at: ISO timestamps
+    def add_videos(self, video_ids, published_at):
+        added = 0
+        for video_id, published in zip(video_ids, _epoch_seconds(published_at)):
+            if self.store.track(video_id, published):
+                self.scheduler.schedule(video_id, 0)
+                added += 1
+        return added
+
+    # Poll up to max_ids due videos; returns this cycle's report
+    def refresh_cycle(self, max_ids=None):
+        now = self.clock()
+        due = self.scheduler.due(now, max_ids)
+        calls = refreshed = gone = 0
+        bytes_before = self.store.nbytes()[0]
+        for i in range(0, len(due), BATCH_SIZE):
+            batch = due[i:i + BATCH_SIZE]
+            stats = self.fetch(batch)
+            calls += 1
+            if stats is None:
+                self.scheduler.requeue(due[i:], now + MIN_INTERVAL)
+                break
+            for video_id in batch:
+                if video_id not in stats:
+                    gone += 1  # deleted or private: no longer scheduled
+                    continue
+                self.store.add(video_id, now, *stats[video_id])
+                self.scheduler.reschedule(self.store, video_id)
+                refreshed += 1
+        report = {"time": now, "due": len(due), "refreshed": refreshed, "gone": gone, "calls": calls,
+                  "quota_units": calls, "bytes_added": self.store.nbytes()[0] - bytes_before}
+        self.cycles.append(report)
+        return report
+
+    def summary(self):
+        data, per_video = self.store.nbytes()
+        snapshots = self.store.snapshots
+        units = [c["quota_units"] for c in self.cycles]
+        return (f"Tracker: {len(self.store)} videos, {snapshots} snapshots, "
+                f"{data / max(snapshots, 1):.1f} bytes/snapshot (+{per_video / max(len(self.store), 1):.0f} "
+                f"bytes/video), {sum(units)} quota units over {len(units)} cycle(s) "
+                f"({sum(units) / max(len(units), 1):.1f} per cycle)")
+
+
+# Counts and engagement ratios of every video at age_hours after publishing (linear
+# interpolation between snapshots); videos not yet observed past that age are left out. Where
+# the snapshots around that age are more than max_gap_hours apart, counts and ratios are NaN
+# (max_gap_hours=None interpolates across any gap).
+# dataset: optional DataFrame with video_id plus columns to join (e.g. category, duration bucket)
+def engagement_at_age(store, age_hours, dataset=None, max_gap_hours=DEFAULT_MAX_GAP_HOURS):
+    from engagement_metrics import COUNT_COLUMNS, METRIC_COLUMNS, add_engagement_metrics
+
+    rows = []
+    for video_id in store.ids():
+        t, views, likes, comments = store.series(video_id)
+        at = t[0] + age_hours * 3600
+        if len(t) < 2 or at > t[-1]:
+            continue
+        if max_gap_hours is not None:
+            after = max(int(np.searchsorted(t, at)), 1)
+            if t[after] - t[after - 1] > max_gap_hours * 3600:
+                rows.append((video_id, np.nan, np.nan, np.nan))
+                continue
+        rows.append((video_id, np.interp(at, t, views), np.interp(at, t, likes), np.interp(at, t, comments)))
+    df = pd.DataFrame(rows, columns=["video_id"] + COUNT_COLUMNS)
+    df.insert(1, "age_hours", age_hours)
+    add_engagement_metrics(df)
+    df.loc[df["views"].isna(), METRIC_COLUMNS] = np.nan
+    if dataset is not None:
+        df = df.merge(dataset, on="video_id", how="left", suffixes=("", "_snapshot"))
+    return df
+
+
+def print_age_report(df, age_hours):
+    from engagement_metrics import METRIC_COLUMNS
+
+    print(f"\n{'='*60}")
+    print(f"ENGAGEMENT AT {age_hours:g} HOURS AFTER PUBLISHING")
+    print(f"{'='*60}")
+    observed = df["views"].notna()
+    print(f"\nVideos observed around that age: {observed.sum()} "
+          f"({(~observed).sum()} more with snapshots too far apart, left as NaN)")
+    df = df[observed]
+    if df.empty:
+        return
+    if "duration_category" in df:
+        print(f"\n{df.groupby('duration_category', observed=True)[METRIC_COLUMNS].mean().round(4)}")
+    if "category_name" in df:
+        by_category = df.groupby(["category_name", "duration_category"], observed=True)["like_view_ratio"]
+        print(f"\n{by_category.agg([('mean', 'mean'), ('count', 'count')]).round(4)}")
+
+
+# Track the dataset's videos: run `cycles` refresh cycles, `interval` seconds apart
+def track(data_path="youtube_length_engagement.csv", store_path=TRACK_PATH, cycles=1, interval=3600,
+          max_ids=None):
+    import youtube_data
+    from engagement_metrics import load_dataset
+
+    if not youtube_data.API_KEY:
+        raise ValueError("API key not found. Make sure it's in your .env file.")
+    # Statistics must come from the network, never from the response cache
+    youtube_data.configure_cache(None)
+    store = SnapshotStore.load(store_path)
+    tracker = EngagementTracker(store)
+    df = load_dataset(data_path)
+    published = df["published_at"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    print(f"Tracking {len(store)} known + {tracker.add_videos(df['video_id'], published)} new videos "
+          f"from {data_path}")
+    for cycle in range(cycles):
+        if cycle:
+            time.sleep(interval)
+        r = tracker.refresh_cycle(max_ids)
+        store.save(store_path)
+        print(f"  Cycle {cycle + 1}: {r['refreshed']}/{r['due']} due videos refreshed "
+              f"({r['gone']} gone), {r['calls']} calls = {r['quota_units']} quota units, "
+              f"{r['bytes_added']} bytes")
+    print(f"✓ {tracker.summary()}")
+    print(f"✓ Saved {store_path}")
+    return tracker
+
+
+# Simulated videos with known view curves: velocity-prioritized refresh vs round robin at
+# the same per-cycle cap, scored by the error of views interpolated at `age_hours`
+def benchmark(n_videos=2000, days=14, max_ids=300, age_hours=72, seed=0):
+    rng = np.random.default_rng(seed)
+    start = 1_700_000_000
+    published = start - rng.uniform(-days * 86400 * 0.8, 60 * 86400, n_videos)  # some appear mid-run
+    final_views = rng.lognormal(11, 1.5, n_videos)
+    tau = rng.lognormal(np.log(3 * 86400), 0.7, n_videos)  # seconds to ~63% of final views
+    like_rate = rng.beta(2, 60, n_videos)
+    ids = [f"v{i:06d}" for i in range(n_videos)]
+
+    def views_at(i, t):
+        age = np.maximum(t - published[i], 0)
+        return final_views[i] * (1 - np.exp(-age / tau[i]))
+
+    def run(scheduler, max_ids):
+        clock = {"now": float(start)}
+        store = SnapshotStore()
+        tracker = EngagementTracker(store, scheduler, clock=lambda: clock["now"])
+
+        def fetch(batch):
+            out = {}
+            for vid in batch:
+                i = int(vid[1:])
+                if published[i] <= clock["now"]:
+                    v = views_at(i, clock["now"])
+                    out[vid] = (int(v), int(v * like_rate[i]), int(v * like_rate[i] / 30))
+            return out
+
+        tracker.fetch = fetch
+        for vid, p in zip(ids, published):
+            store.track(vid, p)
+            scheduler.schedule(vid, max(p, start))  # due from its publish time on
+        for _ in range(days * 24):
+            tracker.refresh_cycle(max_ids)
+            clock["now"] += 3600
+
+        # Error of interpolated views at age_hours, for videos that reach that age during the run
+        got = engagement_at_age(store, age_hours, max_gap_hours=None).set_index("video_id")["views"]
+        got = got[[published[int(v[1:])] + age_hours * 3600 >= start for v in got.index]]
+        truth = np.array([views_at(int(v[1:]), published[int(v[1:])] + age_hours * 3600) for v in got.index])
+        error = np.abs(got.to_numpy() - truth) / np.maximum(truth, 1)
+        data, _ = store.nbytes()
+        return {"units": sum(c["quota_units"] for c in tracker.cycles),
+                "snapshots": store.snapshots, "bytes_per_snapshot": data / max(store.snapshots, 1),
+                "videos_scored": len(got), "median_error": float(np.median(error)) if len(error) else math.nan,
+                "p90_error": float(np.percentile(error, 90)) if len(error) else math.nan}
+
+    results = {"velocity": run(RefreshScheduler(), max_ids)}
+    # Round robin on the same quota: the same interval for everyone, the time to cycle through
+    # all videos at the velocity run's average number of IDs per cycle
+    per_cycle = results["velocity"]["snapshots"] / (days * 24)
+    uniform = n_videos / per_cycle * 3600
+    results["round_robin"] = run(RefreshScheduler(min_interval=uniform, max_interval=uniform), math.ceil(per_cycle))
+
+    print(f"\n{'='*60}")
+    print(f"TRACKER BENCHMARK ({n_videos:,} simulated videos, {days} days of hourly cycles, "
+          f"<= {max_ids} IDs per cycle)")
+    print(f"{'='*60}")
+    for name, r in results.items():
+        print(f"  {name:12} {r['units']:5} quota units ({r['units'] / (days * 24):.1f}/cycle), "
+              f"{r['snapshots']:6} snapshots at {r['bytes_per_snapshot']:.1f} bytes (vs 32 raw), "
+              f"views at {age_hours}h: median error {r['median_error'] * 100:.2f}%, "
+              f"p90 {r['p90_error'] * 100:.2f}% ({r['videos_scored']} videos)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engagement time series of tracked videos")
+    parser.add_argument("--store", default=TRACK_PATH)
+    parser.add_argument("--data", default="youtube_length_engagement.csv", help="dataset to join for --at-age")
+    parser.add_argument("--at-age", type=float, metavar="HOURS", help="engagement at this age after publishing")
+    parser.add_argument("--max-gap-hours", type=float, default=DEFAULT_MAX_GAP_HOURS,
+                        help="--at-age: NaN for videos whose snapshots around that age are further apart")
+    parser.add_argument("--benchmark", action="store_true", help="simulated velocity priority vs round robin")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    elif args.at_age is not None:
+        from engagement_metrics import load_dataset
+        dataset = load_dataset(args.data)[["video_id", "category_name", "duration_category"]]
+        store = SnapshotStore.load(args.store)
+        print_age_report(engagement_at_age(store, args.at_age, dataset, args.max_gap_hours), args.at_age)
+    else:
+        parser.print_help()
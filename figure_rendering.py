@@ -0,0 +1,246 @@
+"""
+Scalable rendering of the 2x2 engagement figure.
+
+The exact figure in engagement_analysis.plot() draws every video as a point,
+which is fine for a few thousand rows but slow and overplotted at millions.
+The binned backend aggregates first with NumPy and draws only the aggregates:
+  * box plots from precomputed quartiles and whiskers (a few outliers kept)
+  * histograms from one bincount over (group, bin)
+  * category means from one groupby
+  * a 2D-binned density of duration vs like-to-view ratio (log color scale)
+  instead of the per-point scatter
+Each panel is drawn on its own Agg canvas in a process pool, and the four
+bitmaps are tiled into the final PNG.
+
+Both backends skip rendering when a hash of the plotted columns and the
+options matches the last render of the same file (kept in .figure_cache.json),
+and the file on disk is still that render.
+
+Usage:
+    python figure_rendering.py --benchmark 1000000    # exact vs binned, cold vs cached
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engagement_metrics import LONG_LABEL, LONG_MIN_MINUTES, SHORT_LABEL, SHORT_MAX_MINUTES
+
+# Above this many rows, backend="auto" switches from the per-point figure to the binned one
+BINNED_MIN_ROWS = 100_000
+HIST_BINS = 30
+DENSITY_BINS = (200, 150)  # duration x like-to-view ratio
+MAX_FLIERS = 200           # outliers drawn per box (evenly spread over their range)
+PANEL_SIZE = (7, 5)        # inches; four panels tile the original 14 x 10 figure
+CACHE_PATH = ".figure_cache.json"
+# Bump when the drawing code changes so cached figures are re-rendered
+RENDER_VERSION = 1
+
+PLOT_COLUMNS = ["category_name", "duration_category", "duration_minutes", "like_view_ratio"]
+GROUP_COLORS = {SHORT_LABEL: "blue", LONG_LABEL: "red"}
+CATEGORY_COLORS = {SHORT_LABEL: "#3498db", LONG_LABEL: "#e74c3c"}
+
+
+# Hash of the plotted columns plus the render options
+def content_hash(df, **options):
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df[PLOT_COLUMNS], index=False).to_numpy().tobytes())
+    h.update(json.dumps({"version": RENDER_VERSION, **options}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# True if `path` is still the figure last rendered from this exact input
+def is_current(path, digest, cache_path=CACHE_PATH):
+    entry = _load_cache(cache_path).get(os.path.abspath(path))
+    return (entry is not None and entry["input"] == digest and os.path.exists(path)
+            and _file_hash(path) == entry["output"])
+
+
+def remember(path, digest, cache_path=CACHE_PATH):
+    cache = _load_cache(cache_path)
+    cache[os.path.abspath(path)] = {"input": digest, "output": _file_hash(path)}
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+
+
+# Box-plot statistics (matplotlib bxp format) for one group
+def _box_stats(values, label):
+    q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = np.sort(values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)])
+    if len(fliers) > MAX_FLIERS:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, MAX_FLIERS).astype(int)]
+    return {"label": label, "med": med, "q1": q1, "q3": q3, "whislo": inside.min(), "whishi": inside.max(),
+            "fliers": fliers, "mean": values.mean()}
+
+
+# Everything the binned figure draws, computed from the columns once
+def aggregate(df, hist_bins=HIST_BINS, density_bins=DENSITY_BINS):
+    ratio = df["like_view_ratio"].to_numpy(dtype="float64")
+    minutes = df["duration_minutes"].to_numpy(dtype="float64")
+    labels = list(df["duration_category"].cat.categories)  # [LONG_LABEL, SHORT_LABEL]
+    codes = df["duration_category"].cat.codes.to_numpy()
+    # Groups with no rows (e.g. a short-only dataset) get no box and no histogram
+    present = np.bincount(codes, minlength=len(labels)) > 0
+
+    # Histogram counts for both groups in one bincount over (group, bin)
+    lo, hi = ratio.min(), ratio.max()
+    edges = np.linspace(lo, hi, hist_bins + 1)
+    bins = np.clip(((ratio - lo) / ((hi - lo) or 1) * hist_bins).astype("int64"), 0, hist_bins - 1)
+    hist = np.bincount(codes * hist_bins + bins, minlength=len(labels) * hist_bins).reshape(len(labels), hist_bins)
+
+    # Density grid: duration x ratio (ratio axis capped at the 99.9th percentile)
+    nx, ny = density_bins
+    x_hi, y_hi = minutes.max() or 1, np.quantile(ratio, 0.999) or 1
+    bx = np.clip((minutes / x_hi * nx).astype("int64"), 0, nx - 1)
+    by = np.clip((ratio / y_hi * ny).astype("int64"), 0, ny - 1)
+    density = np.bincount(bx * ny + by, minlength=nx * ny).reshape(nx, ny)
+
+    return {
+        "rows": len(df),
+        "box": [_box_stats(ratio[codes == i], label) for i, label in enumerate(labels) if present[i]],
+        "hist": {"edges": edges, "counts": {label: hist[i] for i, label in enumerate(labels) if present[i]}},
+        "category_means": df.groupby(["category_name", "duration_category"], observed=True)
+                            ["like_view_ratio"].mean().unstack(),
+        "density": {"counts": density, "x_edges": np.linspace(0, x_hi, nx + 1),
+                    "y_edges": np.linspace(0, y_hi, ny + 1)},
+    }
+
+
+def _draw_box(ax, agg):
+    ax.bxp(agg["box"], showfliers=True)
+    ax.set_title("Like-to-View Ratio by Video Length", fontsize=12, fontweight="bold")
+    ax.set_xlabel("Video Length Category")
+    ax.set_ylabel("Like-to-View Ratio")
+
+
+def _draw_hist(ax, agg):
+    edges, counts = agg["hist"]["edges"], agg["hist"]["counts"]
+    for label in (SHORT_LABEL, LONG_LABEL):
+        if label not in counts:
+            continue
+        ax.stairs(counts[label], edges, fill=True, alpha=0.6, label=label,
+                  color=GROUP_COLORS[label])
+    ax.set_xlabel("Like-to-View Ratio")
+    ax.set_ylabel("Frequency")
+    ax.set_title("Distribution of Like-to-View Ratios", fontsize=12, fontweight="bold")
+    ax.legend()
+
+
+def _draw_categories(ax, agg):
+    # Long = red, Short = blue (a group with no rows has no column)
+    means = agg["category_means"]
+    means.plot(kind="bar", ax=ax, color=[CATEGORY_COLORS[c] for c in means.columns])
+    ax.set_title("Average Like-to-View Ratio by Category", fontsize=12, fontweight="bold")
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Average Like-to-View Ratio")
+    ax.legend(title="Duration")
+    ax.tick_params(axis="x", labelrotation=45)
+    for tick in ax.get_xticklabels():
+        tick.set_horizontalalignment("right")
+
+
+def _draw_density(ax, agg):
+    from matplotlib.colors import LogNorm
+
+    d = agg["density"]
+    counts = np.ma.masked_equal(d["counts"].T, 0)
+    mesh = ax.pcolormesh(d["x_edges"], d["y_edges"], counts, norm=LogNorm(), cmap="viridis")
+    ax.figure.colorbar(mesh, ax=ax, label="Videos per bin")
+    ax.axvline(x=SHORT_MAX_MINUTES, color="gray", linestyle="--", alpha=0.5, label="10 min threshold")
+    ax.axvline(x=LONG_MIN_MINUTES, color="gray", linestyle="--", alpha=0.5, label="20 min threshold")
+    ax.set_xlabel("Video Duration (minutes)")
+    ax.set_ylabel("Like-to-View Ratio")
+    ax.set_title("Duration vs Like-to-View Ratio (density)", fontsize=12, fontweight="bold")
+    ax.legend()
+
+
+PANELS = [_draw_box, _draw_hist, _draw_categories, _draw_density]
+
+
+# Draw one panel on its own canvas; returns its RGBA bitmap (runs in a worker process)
+def _render_panel(task):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    import seaborn as sns
+
+    index, agg, dpi = task
+    sns.set_style("whitegrid")
+    fig = Figure(figsize=PANEL_SIZE, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    PANELS[index](fig.add_subplot(), agg)
+    fig.tight_layout()
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+# Render the aggregated figure: panels in parallel, tiled 2x2 into one PNG
+def render_binned(agg, path, dpi=300, workers=None):
+    import matplotlib.image as mpimg
+
+    tasks = [(i, agg, dpi) for i in range(len(PANELS))]
+    workers = workers or min(len(PANELS), os.cpu_count() or 1)
+    if workers == 1:
+        panels = [_render_panel(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            panels = list(pool.map(_render_panel, tasks))
+    top, bottom = np.concatenate(panels[:2], axis=1), np.concatenate(panels[2:], axis=1)
+    mpimg.imsave(path, np.concatenate([top, bottom], axis=0), dpi=dpi)
+    return path
+
+
+def benchmark(n_rows=1_000_000, dpi=300):
+    import tempfile
+
+    from engagement_analysis import plot
+    from engagement_metrics import prepare, synthetic_dataset
+
+    df = prepare(synthetic_dataset(n_rows))
+    print(f"\n{'='*60}")
+    print(f"FIGURE BENCHMARK ({n_rows:,} rows, {dpi} dpi)")
+    print(f"{'='*60}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.json")
+        runs = [("binned (cold)", "binned"), ("binned (cached)", "binned")]
+        if n_rows <= 1_000_000:
+            runs.insert(0, ("exact per-point", "exact"))
+        for name, backend in runs:
+            path = os.path.join(tmp, f"{backend}.png")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                plot(df, path, dpi, backend=backend, cache_path=cache_path)
+            seconds = time.perf_counter() - start
+            results[name] = {"seconds": seconds, "bytes": os.path.getsize(path)}
+            print(f"  {name:18} {seconds:7.2f}s  {os.path.getsize(path) / 1e6:6.1f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalable rendering of the engagement figure")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", default=1_000_000)
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+    benchmark(args.benchmark, args.dpi)
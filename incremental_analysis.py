@@ -0,0 +1,469 @@
+"""
+Incremental re-analysis from cached per-partition summaries.
+
+engagement_analysis.py recomputes every statistic from the raw rows, even
+when a re-collection only added a few videos to one category. Here the data
+is summarized per (category, duration bucket, publish month) partition:
+count, sum, sums of squares/cubes/fourth powers and a mergeable quantile
+sketch (streaming_analysis.QuantileSketch). Summaries are cached in
+.analysis_cache.json keyed by a content hash of their source:
+  * Parquet dataset: each data file (hash of its bytes; files whose size and
+    mtime did not change keep their stored hash and are not re-read)
+  * CSV: each (category, publish month) group of rows
+The Parquet dataset is read only when passed as `root` (`--parquet` in
+cli.py), or when it is the collector's copy of the requested CSV
+(columnar_dataset.parquet_root). On re-analysis only sources with a new hash are summarized; everything else
+is merged from the cache.
+
+Every report figure is derived from the merged summaries:
+  * counts, means, std, % difference, Cohen's d, category table: exact
+  * medians: within the sketch's relative accuracy (1%)
+  * normality: D'Agostino-Pearson K² from skewness and kurtosis (Shapiro-Wilk
+    needs every value at once)
+  * Mann-Whitney U: counted from the sketch buckets (pairs within one 1%
+    bucket count as ties), p-value from the normal approximation
+
+Usage:
+    python incremental_analysis.py                 # report (same as `python cli.py analyze --incremental`)
+    python incremental_analysis.py --check         # compare with the full in-memory analysis
+    python incremental_analysis.py --benchmark 1000000   # full run vs re-analysis after adding 1%
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from collections import namedtuple
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from columnar_dataset import CSV_PATH, parquet_root
+from engagement_metrics import LONG_LABEL, SHORT_LABEL, SHORT_MAX_MINUTES
+from streaming_analysis import DEFAULT_RELATIVE_ACCURACY, QuantileSketch
+
+CACHE_PATH = ".analysis_cache.json"
+TestResult = namedtuple("TestResult", ["statistic", "pvalue"])
+# Bump when the summary format changes so old caches are ignored
+SUMMARY_VERSION = 1
+
+
+class PartitionSummary:
+    """Power sums (up to the 4th) and a quantile sketch of one partition's values; mergeable."""
+
+    __slots__ = ("n", "s1", "s2", "s3", "s4", "sketch")
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.n = 0
+        self.s1 = self.s2 = self.s3 = self.s4 = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def update(self, values):
+        x = np.asarray(values, dtype="float64")
+        x2 = x * x
+        self.n += len(x)
+        self.s1 += float(x.sum())
+        self.s2 += float(x2.sum())
+        self.s3 += float((x2 * x).sum())
+        self.s4 += float((x2 * x2).sum())
+        self.sketch.update(x)
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        self.s1 += other.s1
+        self.s2 += other.s2
+        self.s3 += other.s3
+        self.s4 += other.s4
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean(self):
+        return self.s1 / self.n if self.n else float("nan")
+
+    @property
+    def var(self):
+        return (self.s2 - self.s1 * self.s1 / self.n) / (self.n - 1) if self.n > 1 else float("nan")
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    @property
+    def median(self):
+        return self.sketch.quantile(0.5)
+
+    # Biased central moments m2, m3, m4 (as used by skewness and kurtosis)
+    def central_moments(self):
+        n, mu = self.n, self.mean
+        e1, e2, e3, e4 = self.s1 / n, self.s2 / n, self.s3 / n, self.s4 / n
+        m2 = e2 - mu * e1
+        m3 = e3 - 3 * mu * e2 + 2 * mu ** 3
+        m4 = e4 - 4 * mu * e3 + 6 * mu * mu * e2 - 3 * mu ** 4
+        return m2, m3, m4
+
+    def to_dict(self):
+        return {"n": self.n, "s": [self.s1, self.s2, self.s3, self.s4], "zero": self.sketch.zero_count,
+                "keys": list(self.sketch.bins), "counts": list(self.sketch.bins.values())}
+
+    @classmethod
+    def from_dict(cls, d, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        summary = cls(relative_accuracy)
+        summary.n = d["n"]
+        summary.s1, summary.s2, summary.s3, summary.s4 = d["s"]
+        summary.sketch.zero_count = d["zero"]
+        summary.sketch.bins = dict(zip(d["keys"], d["counts"]))
+        summary.sketch.count = d["n"]
+        return summary
+
+    # Merge many summaries at once (sketch buckets added in one bincount)
+    @classmethod
+    def combine(cls, summaries, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        total = cls(relative_accuracy)
+        keys, counts = [], []
+        for s in summaries:
+            total.n += s.n
+            total.s1 += s.s1
+            total.s2 += s.s2
+            total.s3 += s.s3
+            total.s4 += s.s4
+            total.sketch.zero_count += s.sketch.zero_count
+            keys.extend(s.sketch.bins)
+            counts.extend(s.sketch.bins.values())
+        total.sketch.count = total.n
+        if keys:
+            unique, inverse = np.unique(np.array(keys, dtype="int64"), return_inverse=True)
+            merged = np.bincount(inverse, weights=np.array(counts, dtype="float64"))
+            total.sketch.bins = dict(zip(unique.tolist(), merged.astype("int64").tolist()))
+        return total
+
+
+# Normality from moments: D'Agostino-Pearson K² (same formulas as scipy.stats.normaltest)
+def normality_test(summary):
+    n = summary.n
+    if n < 20:
+        return float("nan"), float("nan")
+    m2, m3, m4 = summary.central_moments()
+
+    # Skewness test
+    y = m3 / m2 ** 1.5 * math.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+    beta2 = 3.0 * (n * n + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + math.sqrt(2 * (beta2 - 1))
+    delta = 1 / math.sqrt(0.5 * math.log(w2))
+    alpha = math.sqrt(2.0 / (w2 - 1))
+    y = y or 1
+    z_skew = delta * math.log(y / alpha + math.sqrt((y / alpha) ** 2 + 1))
+
+    # Kurtosis test
+    b2 = m4 / (m2 * m2)
+    expected = 3.0 * (n - 1) / (n + 1)
+    var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (b2 - expected) / math.sqrt(var_b2)
+    sqrt_beta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * math.sqrt(
+        6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3)))
+    a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + math.sqrt(1 + 4.0 / sqrt_beta1 ** 2))
+    denom = 1 + x * math.sqrt(2 / (a - 4.0))
+    if denom == 0:
+        return float("nan"), float("nan")
+    term2 = math.copysign(((1 - 2.0 / a) / abs(denom)) ** (1 / 3.0), denom)
+    z_kurt = (1 - 2 / (9.0 * a) - term2) / math.sqrt(2 / (9.0 * a))
+
+    k2 = z_skew ** 2 + z_kurt ** 2
+    return k2, math.exp(-k2 / 2)  # chi-squared with 2 dof
+
+
+# Mann-Whitney U of `a` vs `b` from their sketches, with a two-sided normal-approximation p-value
+def mann_whitney_from_sketches(a, b):
+    below = b.zero_count  # values of b in lower buckets
+    u = 0.5 * a.zero_count * b.zero_count
+    for k in sorted(a.bins.keys() | b.bins.keys()):
+        na, nb = a.bins.get(k, 0), b.bins.get(k, 0)
+        u += na * below + 0.5 * na * nb
+        below += nb
+    n1, n2 = a.count, b.count
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    z = (abs(u - mu) - 0.5) / sigma
+    return u, min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+# Student's t-test from two summaries (only used when both groups look normal)
+def t_test_from_summaries(a, b):
+    from scipy import stats
+
+    dof = a.n + b.n - 2
+    pooled_var = ((a.n - 1) * a.var + (b.n - 1) * b.var) / dof
+    t = (a.mean - b.mean) / math.sqrt(pooled_var * (1 / a.n + 1 / b.n))
+    return t, 2 * stats.t.sf(abs(t), dof)
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# Short/long summaries of one source (a DataFrame or a dict of column arrays)
+def _summarize(columns, metric, relative_accuracy):
+    is_short = np.asarray(columns["duration_minutes"], dtype="float64") < SHORT_MAX_MINUTES
+    values = np.asarray(columns[metric], dtype="float64")
+    return {SHORT_LABEL: PartitionSummary(relative_accuracy).update(values[is_short]),
+            LONG_LABEL: PartitionSummary(relative_accuracy).update(values[~is_short])}
+
+
+# Parquet sources: one per data file, hashed by content (stat-unchanged files reuse their stored hash)
+def _parquet_sources(root, files_cache):
+    for dirpath, _, filenames in os.walk(root):
+        labels = dict(unquote(part).split("=", 1) for part in os.path.relpath(dirpath, root).split(os.sep)
+                      if "=" in part)
+        for name in sorted(filenames):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            known = files_cache.get(path)
+            if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+                digest = known["sha256"]
+            else:
+                digest = _file_sha256(path)
+            files_cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            yield labels["category_name"], labels["publish_month"], digest, path
+
+
+def _read_parquet_file(path, metric):
+    import pyarrow.parquet as pq
+    table = pq.read_table(path, columns=["duration_minutes", metric])
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+# CSV sources: one per (category, publish month) group, hashed by the group's rows
+def _csv_sources(path, metric):
+    df = pd.read_csv(path, usecols=["category_name", "duration_minutes", metric, "published_at"],
+                     dtype={"category_name": "string", "published_at": "string"})
+    month = df["published_at"].str.slice(0, 7)
+    for (category, month_key), group in df.groupby([df["category_name"], month], sort=True):
+        digest = hashlib.sha256(group[["duration_minutes", metric]].to_numpy().tobytes()).hexdigest()
+        yield category, month_key, digest, group
+
+
+def _load_cache(cache_path, metric, relative_accuracy):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    settings = {"version": SUMMARY_VERSION, "metric": metric, "relative_accuracy": relative_accuracy}
+    if cache.get("settings") != settings:
+        cache = {"settings": settings, "files": {}, "parts": {}}
+    return cache
+
+
+# {(category, bucket, month): PartitionSummary}, summarizing only sources not in the cache.
+# The source is the Parquet dataset at `root` if given, or the collector's Parquet copy of `path`
+# (columnar_dataset.parquet_root), else the CSV at `path`.
+# Returns (summaries, info) where info counts reused and recomputed sources.
+def partition_summaries(path=CSV_PATH, root=None, metric="like_view_ratio", cache_path=CACHE_PATH,
+                        relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    cache = _load_cache(cache_path, metric, relative_accuracy) if cache_path else {"files": {}, "parts": {}}
+    known_files = dict(cache["files"])
+    root = parquet_root(path, root)
+    use_parquet = root is not None
+    if use_parquet:
+        sources = _parquet_sources(root, cache["files"])
+    else:
+        sources = _csv_sources(path, metric)
+
+    parts, summaries = {}, {}
+    info = {"reused": 0, "recomputed": 0, "rows_read": 0}
+    for category, month, digest, source in sources:
+        key = f"{category}|{month}|{digest}"
+        entry = cache["parts"].get(key)
+        if entry is not None:
+            buckets = {b: PartitionSummary.from_dict(d, relative_accuracy) for b, d in entry.items()}
+            info["reused"] += 1
+        else:
+            df = _read_parquet_file(source, metric) if use_parquet else source
+            buckets = _summarize(df, metric, relative_accuracy)
+            info["recomputed"] += 1
+            info["rows_read"] += len(df[metric])
+        parts[key] = entry if entry is not None else {b: s.to_dict() for b, s in buckets.items()}
+        for bucket, summary in buckets.items():
+            if summary.n:
+                summaries.setdefault((category, bucket, month), []).append(summary)
+
+    summaries = {key: group[0] if len(group) == 1 else PartitionSummary.combine(group, relative_accuracy)
+                 for key, group in summaries.items()}
+
+    # Keep only what this dataset still contains; rewrite the cache only if that changed
+    if use_parquet:
+        cache["files"] = {p: f for p, f in cache["files"].items() if os.path.exists(p)}
+    if cache_path and (parts.keys() != cache["parts"].keys() or cache["files"] != known_files):
+        cache["parts"] = parts
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(cache))
+        os.replace(tmp_path, cache_path)
+    return summaries, info
+
+
+# Same results dict as engagement_analysis.compute_stats, from merged partition summaries
+def compute_stats(summaries, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    groups = {}
+    for (category, bucket, _), summary in summaries.items():
+        groups.setdefault((category, bucket), []).append(summary)
+    by_category = {key: PartitionSummary.combine(group, relative_accuracy) for key, group in groups.items()}
+    short, long = (PartitionSummary.combine([s for (_, b), s in by_category.items() if b == bucket],
+                                            relative_accuracy) for bucket in (SHORT_LABEL, LONG_LABEL))
+
+    results = {
+        "total": short.n + long.n,
+        "n_short": short.n,
+        "n_long": long.n,
+        "n_categories": len({category for category, _ in by_category}),
+        "short_mean": short.mean, "short_median": short.median, "short_std": short.std,
+        "long_mean": long.mean, "long_median": long.median, "long_std": long.std,
+    }
+    results["pct_diff"] = (results["short_mean"] - results["long_mean"]) / results["long_mean"] * 100
+
+    # 1. Normality (D'Agostino-Pearson, from the cached moments)
+    results["normality_test"] = ("D'Agostino-Pearson test, from cached moments", "K²")
+    results["short_shapiro"] = TestResult(*normality_test(short))
+    results["long_shapiro"] = TestResult(*normality_test(long))
+    results["use_parametric"] = not (results["short_shapiro"].pvalue < 0.05 or results["long_shapiro"].pvalue < 0.05)
+
+    # 2. t-test if both look normal, else Mann-Whitney U from the sketches
+    if results["use_parametric"]:
+        results["statistic"], results["p_value"] = t_test_from_summaries(short, long)
+    else:
+        results["statistic"], results["p_value"] = mann_whitney_from_sketches(short.sketch, long.sketch)
+
+    pooled_std = math.sqrt(((short.n - 1) * short.var + (long.n - 1) * long.var) / (short.n + long.n - 2))
+    results["cohens_d"] = (short.mean - long.mean) / pooled_std
+
+    results["category_stats"] = pd.DataFrame(
+        [{"category_name": c, "duration_category": b, "mean": s.mean, "count": s.n}
+         for (c, b), s in sorted(by_category.items())]
+    ).set_index(["category_name", "duration_category"]).round(4)
+    return results
+
+
+# Report from the cache, summarizing only changed partitions (no figure)
+def analyze(path=CSV_PATH, root=None, cache_path=CACHE_PATH):
+    from engagement_analysis import print_conclusion, print_report
+
+    start = time.perf_counter()
+    summaries, info = partition_summaries(path, root, cache_path=cache_path)
+
+    print("="*60)
+    print("YOUTUBE VIDEO LENGTH & ENGAGEMENT ANALYSIS (INCREMENTAL)")
+    print("="*60)
+    results = compute_stats(summaries)
+    print_report(results)
+    print_conclusion(results)
+    print(f"\n✓ Partition summaries: {info['reused']} reused from {cache_path}, {info['recomputed']} recomputed "
+          f"({info['rows_read']:,} rows read) in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+# Compare with the full in-memory analysis on the same data
+def check(path=CSV_PATH, root=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    import engagement_analysis
+    from scipy import stats
+
+    summaries, _ = partition_summaries(path, root, cache_path=None, relative_accuracy=relative_accuracy)
+    got = compute_stats(summaries, relative_accuracy)
+    df = engagement_analysis.load(path, root)
+    want = engagement_analysis.compute_stats(df)
+    short, long = engagement_analysis.split_groups(df)
+    want_u = stats.mannwhitneyu(short["like_view_ratio"], long["like_view_ratio"], alternative="two-sided")
+    want_k2 = (stats.normaltest(short["like_view_ratio"]), stats.normaltest(long["like_view_ratio"]))
+
+    checks = [(name, got[name], want[name], 1e-9) for name in
+              ("short_mean", "long_mean", "short_std", "long_std", "pct_diff", "cohens_d")]
+    checks += [(name, got[name], want[name], 2 * relative_accuracy) for name in ("short_median", "long_median")]
+    checks += [("short K²", got["short_shapiro"].statistic, want_k2[0].statistic, 1e-6),
+               ("long K²", got["long_shapiro"].statistic, want_k2[1].statistic, 1e-6)]
+    if not got["use_parametric"]:
+        checks.append(("Mann-Whitney U", got["statistic"], want_u.statistic, 0.01))
+
+    print(f"\n{'='*60}")
+    print("INCREMENTAL vs FULL ANALYSIS")
+    print(f"{'='*60}")
+    ok = got["total"] == want["total"] and got["category_stats"]["count"].tolist() == \
+        want["category_stats"]["count"].tolist()
+    print(f"  counts (total, per category/bucket): {'equal' if ok else 'DIFFERENT'}")
+    for name, a, b, tolerance in checks:
+        rel = abs(a - b) / abs(b) if b else abs(a)
+        ok &= rel <= tolerance
+        print(f"  {name:16} {a:.6g} vs {b:.6g}  (rel err {rel:.1e}, tolerance {tolerance:.0e})")
+    print(f"  p-value          {got['p_value']:.3g} vs {want_u.pvalue:.3g}")
+    print(f"\n  {'✅ Within tolerance' if ok else '❌ Outside tolerance'}")
+    return ok
+
+
+# Full analysis vs incremental re-analysis after appending 1% new rows (one new publish month)
+def benchmark(n_rows=1_000_000, new_fraction=0.01):
+    import contextlib
+    import io
+    import tempfile
+
+    import engagement_analysis
+    from columnar_dataset import ANALYSIS_COLUMNS, load_dataset, write_dataset
+    from engagement_metrics import add_engagement_metrics, synthetic_dataset
+
+    from scipy import stats  # noqa: F401  (imported up front: not part of either run's cost)
+
+    def timed(fn):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        return time.perf_counter() - start
+
+    print(f"\n{'='*60}")
+    print(f"INCREMENTAL ANALYSIS BENCHMARK ({n_rows:,} rows + {new_fraction:.0%} new)")
+    print(f"{'='*60}")
+    with tempfile.TemporaryDirectory() as tmp:
+        root, cache_path = os.path.join(tmp, "parquet"), os.path.join(tmp, "cache.json")
+        write_dataset(add_engagement_metrics(synthetic_dataset(n_rows)), root)
+        new_rows = add_engagement_metrics(synthetic_dataset(int(n_rows * new_fraction), seed=1, start=n_rows))
+        # New videos are recent: they land in the month after the existing data
+        new_rows["published_at"] = "2025-09-01T12:00:00Z"
+
+        full = lambda: engagement_analysis.compute_stats(load_dataset(root, ANALYSIS_COLUMNS))
+        incremental = lambda: compute_stats(partition_summaries(root=root, cache_path=cache_path)[0])
+        results = {
+            "full analysis": timed(full),
+            "incremental (cold cache)": timed(incremental),
+            "incremental (unchanged)": timed(incremental),
+        }
+        write_dataset(new_rows, root, append=True)
+        results[f"incremental (+{new_fraction:.0%} rows)"] = timed(incremental)
+        results[f"full analysis (+{new_fraction:.0%} rows)"] = timed(full)
+
+    base = results["full analysis"]
+    for name, seconds in results.items():
+        print(f"  {name:28} {seconds:7.3f}s  ({seconds / base:6.1%} of a full run)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental analysis from cached partition summaries")
+    parser.add_argument("--data", default=CSV_PATH)
+    parser.add_argument("--root", help="Parquet dataset to read instead of --data "
+                        "(default: the collector's Parquet copy, only if it was written from --data)")
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--check", action="store_true", help="compare with the full in-memory analysis")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="full vs incremental on synthetic rows")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.check:
+        check(args.data, args.root)
+    else:
+        analyze(args.data, args.root, args.cache)
@@ -0,0 +1,220 @@
+"""
+Structured run metrics for the collector.
+
+Records, per endpoint: network requests, a latency histogram, errors by
+reason, retries, cache hits, quota units and response bytes. Per
+(phase, category, search term): the yield funnel, i.e. IDs returned ->
+in category -> in duration range -> new unique videos. Plus timing spans for
+Phase 1, Phase 2 and the save.
+
+Disabled by default. Every hook first checks the module global RUN and
+returns at once when it is None, so an uninstrumented run pays one global
+lookup per request or term.
+
+A run writes a JSON report and/or a Prometheus textfile (the format read by
+node_exporter's textfile collector):
+
+    python youtube_data.py --metrics-report run_report.json --prometheus-textfile collector.prom
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FUNNEL_STAGES = ("returned", "in_category", "in_range", "new")
+
+# The active RunMetrics, or None when instrumentation is off
+RUN = None
+
+
+class RunMetrics:
+    """Thread-safe metric store for one collection run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.endpoints = {}
+        self.errors = {}   # (endpoint, reason) -> count
+        self.terms = {}    # (phase, category, term) -> funnel counts
+        self.spans = {}    # name -> seconds
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                "requests": 0, "errors": 0, "retries": 0, "cache_hits": 0, "quota_units": 0,
+                "bytes": 0, "latency_sum": 0.0, "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+        return stats
+
+    # One network request (failed or not)
+    def request(self, endpoint, seconds, nbytes=0, quota=0, error=None):
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["requests"] += 1
+            stats["quota_units"] += quota
+            stats["bytes"] += nbytes
+            stats["latency_sum"] += seconds
+            stats["latency_buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if error is not None:
+                stats["errors"] += 1
+                self.errors[(endpoint, error)] = self.errors.get((endpoint, error), 0) + 1
+
+    # Add request counters recorded in another process (sharded_collector.py workers)
+    def merge(self, endpoints, errors):
+        with self._lock:
+            for endpoint, s in endpoints.items():
+                stats = self._endpoint(endpoint)
+                for key, value in s.items():
+                    if key == "latency_buckets":
+                        stats[key] = [a + b for a, b in zip(stats[key], value)]
+                    else:
+                        stats[key] += value
+            for key, n in errors.items():
+                self.errors[key] = self.errors.get(key, 0) + n
+
+    def retry(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint)["retries"] += 1
+
+    def cache_hit(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint)["cache_hits"] += 1
+
+    def term(self, phase, category, term, returned, in_category, in_range, new):
+        with self._lock:
+            funnel = self.terms.setdefault((phase, category, term), dict.fromkeys(FUNNEL_STAGES, 0))
+            for stage, n in zip(FUNNEL_STAGES, (returned, in_category, in_range, new)):
+                funnel[stage] += n
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, s in self.endpoints.items():
+                endpoints[endpoint] = {
+                    **{k: v for k, v in s.items() if k not in ("latency_sum", "latency_buckets")},
+                    "latency": {
+                        "sum_seconds": s["latency_sum"],
+                        "mean_seconds": s["latency_sum"] / s["requests"] if s["requests"] else None,
+                        "buckets": {str(le): n for le, n in zip(LATENCY_BUCKETS + ("+Inf",), s["latency_buckets"])},
+                    },
+                }
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "seconds": time.time() - self.started,
+                "endpoints": endpoints,
+                "errors": [{"endpoint": e, "reason": r, "count": n} for (e, r), n in sorted(self.errors.items())],
+                "spans": dict(self.spans),
+                "terms": [{"phase": p, "category": c, "term": t, **funnel}
+                          for (p, c, t), funnel in self.terms.items()],
+            }
+
+    def prometheus(self, prefix="youtube_collector"):
+        report = self.report()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}")
+
+        eps = report["endpoints"]
+        for key, name, help_text in (
+            ("requests", "requests_total", "API requests sent over the network"),
+            ("retries", "request_retries_total", "Requests retried after a transient failure"),
+            ("cache_hits", "cache_hits_total", "Requests answered from the response cache"),
+            ("quota_units", "quota_units_total", "Quota units spent on the network"),
+            ("bytes", "response_bytes_total", "Response body bytes received"),
+        ):
+            metric(name, "counter", help_text, [("", {"endpoint": e}, s[key]) for e, s in eps.items()])
+        metric("request_errors_total", "counter", "Failed requests by reason",
+               [("", {"endpoint": r["endpoint"], "reason": r["reason"]}, r["count"]) for r in report["errors"]])
+
+        samples = []
+        for e, s in eps.items():
+            cumulative = 0
+            for le, n in s["latency"]["buckets"].items():
+                cumulative += n
+                samples.append(("_bucket", {"endpoint": e, "le": le}, cumulative))
+            samples.append(("_sum", {"endpoint": e}, s["latency"]["sum_seconds"]))
+            samples.append(("_count", {"endpoint": e}, s["requests"]))
+        metric("request_duration_seconds", "histogram", "Network request latency", samples)
+
+        metric("span_seconds", "gauge", "Wall time of run phases",
+               [("", {"span": name}, seconds) for name, seconds in report["spans"].items()])
+        metric("term_videos", "gauge", "Per-term yield funnel (videos at each stage)",
+               [("", {"phase": t["phase"], "category": t["category"], "term": t["term"], "stage": stage}, t[stage])
+                for t in report["terms"] for stage in FUNNEL_STAGES])
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, report_path=None, prometheus_path=None):
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+        if prometheus_path:
+            # Write then rename, so the textfile collector never reads a partial file
+            tmp_path = f"{prometheus_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, prometheus_path)
+
+    def summary(self):
+        with self._lock:
+            parts = []
+            for endpoint, s in self.endpoints.items():
+                mean_ms = s["latency_sum"] / s["requests"] * 1000 if s["requests"] else 0
+                parts.append(f"{endpoint}: {s['requests']} requests (mean {mean_ms:.0f} ms), "
+                             f"{s['errors']} errors, {s['retries']} retries, {s['quota_units']} units, "
+                             f"{s['bytes'] / 1e3:.0f} kB")
+            spans = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.spans.items())
+        return "Run metrics: " + "; ".join(parts) + (f" | {spans}" if spans else "")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Turn instrumentation on for this process (replacing any previous run's metrics)
+def enable():
+    global RUN
+    RUN = RunMetrics()
+    return RUN
+
+
+def disable():
+    global RUN
+    RUN = None
+
+
+# Hooks: no-ops while instrumentation is off
+def span(name):
+    return RUN.span(name) if RUN is not None else nullcontext()
+
+
+def term_yield(phase, category, term, returned, in_category, in_range, new):
+    if RUN is not None:
+        RUN.term(phase, category, term, returned, in_category, in_range, new)
+
+
+# Short reason for an API error response ("quotaExceeded", "backendError", or the HTTP code)
+def error_reason(response):
+    error = response.get("error", {})
+    errors = error.get("errors") or [{}]
+    return errors[0].get("reason") or str(error.get("code", "unknown"))
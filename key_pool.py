@@ -0,0 +1,70 @@
+"""
+Pool of YouTube Data API keys with per-key quota accounting.
+
+Each key has a daily quota (10,000 units by default). Requests use the first
+key with enough quota left for them; a key too low for a 100-unit search is
+skipped for that call but still pays for 1-unit detail calls. A key is
+retired once its tracked spend reaches its quota or when the API answers
+`quotaExceeded` for it, and requests move on to the next key.
+
+The counters live in shared memory, so the worker processes of a sharded run
+(sharded_collector.py) see each other's spend and retirements. Create the
+pool before starting the workers and hand it to them at process start.
+
+Keys come from YOUTUBE_API_KEYS (comma-separated) or YOUTUBE_API_KEY.
+"""
+import multiprocessing
+
+DAILY_QUOTA = 10_000
+
+
+class KeyPool:
+    """API keys, their quota spent and whether each is exhausted (process-shared)."""
+
+    def __init__(self, keys, daily_quota=DAILY_QUOTA):
+        if not keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self.keys = list(keys)
+        self.daily_quota = daily_quota
+        self._used = multiprocessing.Array("q", len(self.keys))  # carries its own lock
+        self._exhausted = multiprocessing.Array("b", len(self.keys), lock=False)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Reserve `cost` units on the first key that has them; None when no key can pay for this call
+    def acquire(self, cost=1):
+        with self._used.get_lock():
+            for i, key in enumerate(self.keys):
+                if self._exhausted[i] or self._used[i] + cost > self.daily_quota:
+                    continue
+                self._used[i] += cost
+                if self._used[i] >= self.daily_quota:
+                    self._exhausted[i] = 1
+                return key
+            return None
+
+    # The API said this key is out of quota: stop using it (the refused call cost nothing)
+    def retire(self, key, refund=0):
+        with self._used.get_lock():
+            i = self.keys.index(key)
+            self._exhausted[i] = 1
+            self._used[i] -= refund
+
+    # True when no key can pay for a call of `cost` units
+    def exhausted(self, cost=1):
+        with self._used.get_lock():
+            return all(self._exhausted[i] or self._used[i] + cost > self.daily_quota
+                       for i in range(len(self.keys)))
+
+    # {key: {"used": units, "exhausted": bool}}
+    def usage(self):
+        with self._used.get_lock():
+            return {key: {"used": self._used[i], "exhausted": bool(self._exhausted[i])}
+                    for i, key in enumerate(self.keys)}
+
+    def summary(self):
+        usage = self.usage()
+        retired = sum(u["exhausted"] for u in usage.values())
+        spent = ", ".join(f"{key[:5]}*****: {u['used']}" for key, u in usage.items())
+        return f"API keys: {len(usage)} ({retired} exhausted), units spent per key: {spent}"
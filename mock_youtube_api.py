@@ -0,0 +1,315 @@
+"""
+Local stand-in for the two YouTube Data API v3 endpoints the collector uses
+(/youtube/v3/search and /youtube/v3/videos).
+
+Responses are deterministic: the same query always returns the same video IDs,
+and every video ID always maps to the same category, duration and statistics.
+That lets the serial and async collectors be run against it and compared.
+
+Latency (plus random jitter), page size, the share of failed requests and the
+category mix are configurable, for benchmark_suite.py. Failures are drawn from
+a seeded generator, so a run with the same settings fails the same requests.
+With a per-key quota, each API key is charged like the real API (search 100
+units, videos 1) and answered with 403 quotaExceeded once it is spent.
+Videos come with the description, thumbnails, tags and other parts the real
+API sends, and a `fields=` partial-response filter is honoured.
+
+Usage:
+    python mock_youtube_api.py --port 8765 --latency 0.05
+    python mock_youtube_api.py --error-rate 0.02 --page-size 20 --category-mix 20=4,10=1,26=1,28=1
+    python mock_youtube_api.py --key-quota 2000    # keys run out after 2,000 units each
+    YOUTUBE_API_KEY=test YOUTUBE_API_BASE=http://127.0.0.1:8765/youtube/v3 python youtube_data.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Category IDs handed out to mock videos (matches CATEGORIES in youtube_data.py)
+MOCK_CATEGORIES = ["20", "10", "26", "28"]
+# Quota units per call, as charged by the real API
+QUOTA_COSTS = {"search": 100, "videos": 1}
+
+
+# Stable pseudo-random integer derived from a string
+def _stable_int(text):
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def _video_id(query, index):
+    return "v" + hashlib.md5(f"{query}|{index}".encode("utf-8")).hexdigest()[:10]
+
+
+# Category for a hash under the given {category_id: weight} mix (uniform if None)
+def _pick_category(h, category_mix=None):
+    if not category_mix:
+        return MOCK_CATEGORIES[h % len(MOCK_CATEGORIES)]
+    point = (h % 10_000) / 10_000 * sum(category_mix.values())
+    for category, weight in category_mix.items():
+        point -= weight
+        if point < 0:
+            return category
+    return category
+
+
+# "20=4,10=1" -> {"20": 4.0, "10": 1.0}
+def parse_category_mix(text):
+    if not text:
+        return None
+    return {k.strip(): float(v) for k, v in (part.split("=") for part in text.split(","))}
+
+
+# Deterministic metadata for one mock video
+def mock_video(video_id, category_mix=None):
+    h = _stable_int(video_id)
+    category = _pick_category(h, category_mix)
+    # Roughly half short (1-10 min), the rest spread up to ~2 hours
+    if (h >> 4) % 2 == 0:
+        seconds = 61 + (h >> 8) % 540
+    else:
+        seconds = 61 + (h >> 8) % 7200
+    views = 1000 + (h >> 12) % 5_000_000
+    likes = views * (1 + (h >> 20) % 60) // 1000
+    comments = views * (1 + (h >> 26) % 10) // 10000
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    duration = "PT" + (f"{hours}H" if hours else "") + (f"{minutes}M" if minutes else "") + f"{secs}S"
+    return {
+        "kind": "youtube#video",
+        "id": video_id,
+        "snippet": {
+            "title": f"Mock video {video_id}",
+            "categoryId": category,
+            "publishedAt": "2024-%02d-%02dT12:00:00Z" % (1 + h % 12, 1 + (h >> 3) % 28),
+        },
+        "contentDetails": {"duration": duration},
+        "statistics": {
+            "viewCount": str(views),
+            "likeCount": str(likes),
+            "commentCount": str(comments),
+        },
+    }
+
+
+# mock_video plus the parts of a real videos item the collector never reads
+def full_video(video_id, category_mix=None):
+    item = mock_video(video_id, category_mix)
+    h = _stable_int(video_id)
+    item["etag"] = f"etag-{h % 10**12:012d}"
+    item["snippet"].update({
+        "channelId": f"UC{h % 10**20:020d}",
+        "channelTitle": f"Mock channel {h % 997}",
+        "description": f"Description of mock video {video_id}. " * 8,
+        "thumbnails": {size: {"url": f"https://i.ytimg.com/vi/{video_id}/{size}.jpg",
+                              "width": width, "height": width * 9 // 16}
+                       for size, width in (("default", 120), ("medium", 320), ("high", 480))},
+        "tags": [f"tag{(h >> k) % 50}" for k in range(0, 40, 5)],
+        "liveBroadcastContent": "none",
+        "localized": {"title": item["snippet"]["title"], "description": f"Description of mock video {video_id}."},
+    })
+    item["contentDetails"].update({"dimension": "2d", "definition": "hd", "caption": "false",
+                                   "licensedContent": True, "projection": "rectangular"})
+    item["statistics"]["favoriteCount"] = "0"
+    return item
+
+
+# "items(id,snippet(title,categoryId)),nextPageToken" -> {"items": {"id": None, "snippet": {...}}, ...}
+def parse_fields(text):
+    def parse(pos):
+        spec = {}
+        while pos < len(text) and text[pos] != ")":
+            match = re.match(r"[\w/]+", text[pos:])
+            path = match.group(0).split("/")
+            pos += match.end()
+            sub = None
+            if pos < len(text) and text[pos] == "(":
+                sub, pos = parse(pos + 1)
+                pos += 1  # ")"
+            for name in reversed(path[1:]):
+                sub = {name: sub}
+            node = spec.setdefault(path[0], sub)
+            if isinstance(node, dict) and isinstance(sub, dict):
+                node.update(sub)
+            if pos < len(text) and text[pos] == ",":
+                pos += 1
+        return spec, pos
+
+    return parse(0)[0]
+
+
+# Keep only the `fields=` selection of a response (lists are filtered element-wise)
+def project_fields(obj, fields):
+    spec = parse_fields(fields) if isinstance(fields, str) else fields
+    if spec is None:
+        return obj
+    if isinstance(obj, list):
+        return [project_fields(x, spec) for x in obj]
+    if not isinstance(obj, dict):
+        return obj
+    return {k: project_fields(obj[k], sub) for k, sub in spec.items() if k in obj}
+
+
+class MockYouTubeAPI:
+    """Holds server configuration and request counters."""
+
+    def __init__(self, latency=0.0, results_per_query=120, page_size=50, error_rate=0.0,
+                 latency_jitter=0.0, category_mix=None, seed=0, key_quota=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.results_per_query = results_per_query
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.category_mix = category_mix
+        self.key_quota = key_quota
+        self.key_units = {}  # API key -> quota units charged (tracked with or without key_quota)
+        self.counts = {"search": 0, "videos": 0}
+        self.errors = {"search": 0, "videos": 0}
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {"search": 0, "videos": 0}
+            self.errors = {"search": 0, "videos": 0}
+            self.bytes_sent = 0
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.counts[endpoint] += 1
+
+    # Seconds to wait before answering, and whether to answer with an error
+    def draw(self):
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+        return delay, failed
+
+    # Charge `key` for one call; False if that would take it past its quota (refused calls cost nothing)
+    def charge(self, key, endpoint):
+        with self._lock:
+            used = self.key_units.get(key, 0) + QUOTA_COSTS[endpoint]
+            if self.key_quota is not None and used > self.key_quota:
+                return False
+            self.key_units[key] = used
+            return True
+
+    def quota_exceeded(self, endpoint):
+        with self._lock:
+            self.errors[endpoint] += 1
+        return {"error": {"code": 403, "message": "The request cannot be completed because you have "
+                          "exceeded your quota. (mock)", "errors": [{"reason": "quotaExceeded"}]}}
+
+    def error(self, endpoint):
+        with self._lock:
+            self.errors[endpoint] += 1
+        return {"error": {"code": 500, "message": "Backend Error (mock)",
+                          "errors": [{"reason": "backendError"}]}}
+
+    def search(self, params):
+        self._count("search")
+        query = params.get("q", "")
+        max_results = min(self.page_size, int(params.get("maxResults", 5)))
+        start = int(params.get("pageToken", "0") or 0)
+        end = min(start + max_results, self.results_per_query)
+        items = [
+            {"kind": "youtube#searchResult", "id": {"kind": "youtube#video", "videoId": _video_id(query, i)}}
+            for i in range(start, end)
+        ]
+        res = {"kind": "youtube#searchListResponse", "items": items}
+        if end < self.results_per_query:
+            res["nextPageToken"] = str(end)
+        return res
+
+    def videos(self, params):
+        self._count("videos")
+        ids = [i for i in params.get("id", "").split(",") if i][:50]
+        return {"kind": "youtube#videoListResponse", "etag": "mock",
+                "items": [full_video(i, self.category_mix) for i in ids],
+                "pageInfo": {"totalResults": len(ids), "resultsPerPage": len(ids)}}
+
+
+def _make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+            delay, failed = api.draw()
+            if delay:
+                time.sleep(delay)
+
+            endpoint = parsed.path.rsplit("/", 1)[-1]
+            if endpoint not in ("search", "videos"):
+                body = {"error": {"code": 404, "message": "Not found"}}
+                status = 404
+            elif failed:
+                api._count(endpoint)
+                body = api.error(endpoint)
+                status = 500
+            elif not api.charge(params.get("key"), endpoint):
+                api._count(endpoint)
+                body = api.quota_exceeded(endpoint)
+                status = 403
+            else:
+                body = api.search(params) if endpoint == "search" else api.videos(params)
+                if params.get("fields"):
+                    body = project_fields(body, params["fields"])
+                status = 200
+
+            payload = json.dumps(body).encode("utf-8")
+            with api._lock:
+                api.bytes_sent += len(payload)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# Start the mock server on a background thread; returns (server, api, base_url)
+def start_mock_server(port=0, **api_options):
+    api = MockYouTubeAPI(**api_options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(api))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/youtube/v3"
+    return server, api, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the YouTube Data API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--results-per-query", type=int, default=120)
+    parser.add_argument("--page-size", type=int, default=50, help="max results per search page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--category-mix", help="category weights, e.g. 20=4,10=1,26=1,28=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--key-quota", type=int, help="quota units per API key before quotaExceeded")
+    args = parser.parse_args()
+
+    server, api, base_url = start_mock_server(
+        args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+        results_per_query=args.results_per_query, page_size=args.page_size,
+        error_rate=args.error_rate, category_mix=parse_category_mix(args.category_mix), seed=args.seed,
+        key_quota=args.key_quota)
+    print(f"Mock YouTube API listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,261 @@
+"""
+All-pairs significance tests between category x duration-bucket groups.
+
+The report compares one pair (short vs long like_view_ratio, all categories
+pooled). This compares every pair of (category, duration bucket) groups on all
+three engagement metrics: two-sided Mann-Whitney U (normal approximation with
+tie and continuity correction, as scipy's method="asymptotic"), Cohen's d and
+the rank-biserial correlation, with Holm and Benjamini-Hochberg adjusted
+p-values over the whole table.
+
+Calling mannwhitneyu once per pair sorts the same rows again for every pair.
+Here each metric is sorted once. In sorted order, the cumulative count of group
+j's members at a row is how many j values lie below it; summed over the rows of
+group i that is U of i against j, and U of j against i is n_i * n_j minus it.
+Counts of equal values (which add half) and the tie corrections come from a
+sparse (tied value x group) count matrix, and means and variances from one
+bincount per group. That is one vectorized pass per group, O(N*G) array work,
+instead of G^2/2 sorts.
+
+Usage:
+    python pairwise_tests.py                                   # youtube_length_engagement.csv
+    python pairwise_tests.py --out pairwise_tests.csv --alpha 0.01
+    python pairwise_tests.py --check                           # compare every pair with scipy
+    python pairwise_tests.py --benchmark 2000000 --groups 120  # synthetic rows, 120 groups
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from engagement_metrics import METRIC_COLUMNS, load_dataset
+
+GROUP_COLUMNS = ["category_name", "duration_category"]
+
+
+# Group code per row and the (category, bucket) label of each code, in sorted order
+def group_codes(df, by=GROUP_COLUMNS):
+    grouped = df.groupby(by, observed=True, sort=True)
+    return grouped.ngroup().to_numpy(dtype="int64"), list(grouped.size().index)
+
+
+# U[i, j] = #(x_i > x_j) + 0.5 * #(x_i == x_j) over all (i, j) member pairs, and the
+# tie term sum(t^3 - t) of every pair's pooled sample, from one sort of `values`.
+# Every code in range(n_groups) must have at least one row.
+def pairwise_u(values, codes, n_groups):
+    from scipy import sparse
+
+    order = np.argsort(values)  # ties are handled per block, so need not be stable
+    ordered, labels = values[order], codes[order].astype("int32")
+    n = len(ordered)
+
+    # Tie blocks of equal values: the start of the block each sorted row is in
+    first = np.empty(n, dtype=bool)
+    first[0] = True
+    np.not_equal(ordered[1:], ordered[:-1], out=first[1:])
+    block = np.cumsum(first) - 1
+    starts = np.flatnonzero(first)
+    sizes = np.diff(np.append(starts, n))
+
+    # Sorted positions of each group's rows (increasing within a group), and of their block starts
+    by_group = np.argsort(labels, kind="stable")
+    needle = starts[block[by_group]]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_groups))])
+
+    # Strictly-below counts for i > j: the cumulative count of group j at each member's block start.
+    # That count is a step function rising by one after each of j's positions, built with np.repeat.
+    below = np.zeros((n_groups, n_groups))
+    steps = np.arange(n + 1, dtype="int32")
+    for j in range(n_groups - 1):
+        positions = by_group[offsets[j]:offsets[j + 1]]
+        cumulative = np.repeat(steps[:len(positions) + 1], np.diff(positions, prepend=-1, append=n))
+        lo = offsets[j + 1]
+        below[j + 1:, j] = np.add.reduceat(cumulative[needle[lo:]], offsets[j + 1:-1] - lo, dtype="int64")
+
+    # Equal values: (tied value x group) counts c; sum c_i * c_j and sum (c_i + c_j)^3 - (c_i + c_j)
+    equal = ties = np.zeros((n_groups, n_groups))
+    tied = sizes > 1
+    if tied.any():
+        tied_rows = tied[block]
+        counts = sparse.csr_matrix(
+            (np.ones(int(tied_rows.sum())), ((np.cumsum(tied) - 1)[block[tied_rows]], labels[tied_rows])),
+            shape=(int(tied.sum()), n_groups))
+        equal = (counts.T @ counts).toarray()
+        cubes = np.asarray(counts.power(3).sum(axis=0)).ravel() - np.asarray(counts.sum(axis=0)).ravel()
+        squares_by_count = (counts.power(2).T @ counts).toarray()
+        ties = cubes[:, None] + cubes[None, :] + 3 * (squares_by_count + squares_by_count.T)
+
+    # Lower triangle from the counts, upper from U[i, j] + U[j, i] = n_i * n_j
+    size = np.diff(offsets).astype("float64")
+    u = np.tril(below + 0.5 * equal, k=-1)
+    u += np.triu(np.outer(size, size) - u.T, k=1)
+    return u, ties
+
+
+# Two-sided p-values of U (normal approximation, tie + continuity corrected, as scipy)
+def mann_whitney_p(u, n_a, n_b, ties):
+    from scipy.special import ndtr
+
+    n = n_a + n_b
+    mu = n_a * n_b / 2
+    sigma = np.sqrt(n_a * n_b / 12 * ((n + 1) - ties / (n * (n - 1))))
+    u_max = np.maximum(u, n_a * n_b - u)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (u_max - mu - 0.5) / sigma
+    return np.clip(2 * ndtr(-z), 0, 1)
+
+
+def holm(p):
+    p = np.asarray(p, dtype="float64")
+    order = np.argsort(p, kind="stable")
+    m = len(p)
+    adjusted = np.maximum.accumulate(np.minimum(1, (m - np.arange(m)) * p[order]))
+    out = np.empty(m)
+    out[order] = adjusted
+    return out
+
+
+def benjamini_hochberg(p):
+    p = np.asarray(p, dtype="float64")
+    order = np.argsort(p, kind="stable")
+    m = len(p)
+    adjusted = np.minimum.accumulate((m / np.arange(1, m + 1) * p[order])[::-1])[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(1, adjusted)
+    return out
+
+
+# Tidy table: one row per (metric, group pair), with Holm and BH p-values over all rows
+def pairwise_table(df, metrics=METRIC_COLUMNS, by=GROUP_COLUMNS):
+    codes, labels = group_codes(df, by)
+    n_groups = len(labels)
+    size = np.bincount(codes, minlength=n_groups).astype("float64")
+    a, b = np.triu_indices(n_groups, k=1)
+    n_a, n_b = size[a], size[b]
+
+    tables = []
+    for metric in metrics:
+        values = df[metric].to_numpy(dtype="float64")
+        u, ties = pairwise_u(values, codes, n_groups)
+
+        total = np.bincount(codes, weights=values, minlength=n_groups)
+        squares = np.bincount(codes, weights=values * values, minlength=n_groups)
+        mean = total / size
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (squares - size * mean * mean) / (size - 1)
+            pooled_std = np.sqrt(((n_a - 1) * var[a] + (n_b - 1) * var[b]) / (n_a + n_b - 2))
+            cohens_d = (mean[a] - mean[b]) / pooled_std
+
+        tables.append(pd.DataFrame({
+            "metric": metric,
+            **{f"{col}_a": [labels[i][k] for i in a] for k, col in enumerate(by)},
+            **{f"{col}_b": [labels[j][k] for j in b] for k, col in enumerate(by)},
+            "n_a": n_a.astype("int64"), "n_b": n_b.astype("int64"),
+            "mean_a": mean[a], "mean_b": mean[b],
+            "u_statistic": u[a, b],
+            "p_value": mann_whitney_p(u[a, b], n_a, n_b, ties[a, b]),
+            "cohens_d": cohens_d,
+            # P(a > b) - P(a < b)
+            "rank_biserial": 2 * u[a, b] / (n_a * n_b) - 1,
+        }))
+    table = pd.concat(tables, ignore_index=True)
+    table["p_holm"] = holm(table["p_value"])
+    table["p_bh"] = benjamini_hochberg(table["p_value"])
+    return table
+
+
+def print_table(table, alpha=0.05, top=10):
+    print(f"\n{len(table)} tests: {(table['p_holm'] < alpha).sum()} significant after Holm, "
+          f"{(table['p_bh'] < alpha).sum()} after Benjamini-Hochberg (alpha={alpha})")
+    by = [c[:-2] for c in table.columns if c.endswith("_a") and c not in ("n_a", "mean_a")]
+    for metric, rows in table.groupby("metric", sort=False):
+        print(f"\n{metric} (smallest p-values first):")
+        for _, r in rows.nsmallest(top, "p_value").iterrows():
+            pair = " / ".join(str(r[f"{c}_a"]) for c in by), " / ".join(str(r[f"{c}_b"]) for c in by)
+            print(f"  {pair[0]:>38} vs {pair[1]:<38} U={r['u_statistic']:>10.1f}  "
+                  f"p={r['p_value']:.2e}  p_holm={r['p_holm']:.2e}  p_bh={r['p_bh']:.2e}  "
+                  f"d={r['cohens_d']:+.3f}  r={r['rank_biserial']:+.3f}")
+
+
+# Largest U and p differences against scipy.stats.mannwhitneyu, pair by pair
+def check(df, metrics=METRIC_COLUMNS, by=GROUP_COLUMNS):
+    from scipy.stats import mannwhitneyu
+
+    table = pairwise_table(df, metrics, by)
+    groups = {key: g for key, g in df.groupby(by, observed=True)}
+    u_err = p_err = 0.0
+    for _, r in table.iterrows():
+        x = groups[tuple(r[f"{c}_a"] for c in by)][r["metric"]]
+        y = groups[tuple(r[f"{c}_b"] for c in by)][r["metric"]]
+        expected = mannwhitneyu(x, y, alternative="two-sided", method="asymptotic")
+        u_err = max(u_err, abs(expected.statistic - r["u_statistic"]))
+        p_err = max(p_err, abs(expected.pvalue - r["p_value"]))
+    print(f"\n✓ {len(table)} pairs checked against scipy: max |ΔU| = {u_err:.3g}, max |Δp| = {p_err:.3g}")
+    return u_err, p_err
+
+
+# Synthetic rows spread over n_groups / 2 categories x 2 buckets, against per-pair mannwhitneyu
+def benchmark(n_rows=2_000_000, n_groups=120, scipy_pairs=200, seed=0):
+    from scipy.stats import mannwhitneyu
+
+    from engagement_metrics import add_duration_category, add_engagement_metrics, synthetic_dataset
+
+    df = add_duration_category(add_engagement_metrics(synthetic_dataset(n_rows, seed=seed)))
+    n_categories = n_groups // 2
+    rng = np.random.default_rng(seed)
+    df["category_name"] = pd.Categorical.from_codes(
+        rng.integers(0, n_categories, n_rows), [f"Category {i:03d}" for i in range(n_categories)])
+
+    print(f"\n{'='*60}")
+    print(f"ALL-PAIRS TESTS BENCHMARK ({n_rows:,} rows, {n_groups} groups, {len(METRIC_COLUMNS)} metrics)")
+    print(f"{'='*60}")
+    start = time.perf_counter()
+    table = pairwise_table(df)
+    seconds = time.perf_counter() - start
+
+    # Per-pair scipy calls on a sample of the table's pairs, extrapolated to all of them
+    groups = {key: g for key, g in df.groupby(GROUP_COLUMNS, observed=True)}
+    sample = table.sample(min(scipy_pairs, len(table)), random_state=seed)
+    start = time.perf_counter()
+    p_err = 0.0
+    for _, r in sample.iterrows():
+        x = groups[(r["category_name_a"], r["duration_category_a"])][r["metric"]].to_numpy()
+        y = groups[(r["category_name_b"], r["duration_category_b"])][r["metric"]].to_numpy()
+        p_err = max(p_err, abs(mannwhitneyu(x, y, method="asymptotic").pvalue - r["p_value"]))
+    per_pair_seconds = (time.perf_counter() - start) / len(sample) * len(table)
+
+    print(f"  one sort per metric: {seconds:7.2f}s for {len(table):,} tests")
+    print(f"  mannwhitneyu per pair: {per_pair_seconds:7.2f}s (extrapolated from {len(sample)} pairs)  "
+          f"{per_pair_seconds / seconds:.0f}x slower, max |Δp| = {p_err:.2g}")
+    return {"rows": n_rows, "groups": n_groups, "tests": len(table), "seconds": seconds,
+            "per_pair_seconds": per_pair_seconds, "max_p_difference": p_err}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mann-Whitney U for every pair of category x duration groups")
+    parser.add_argument("path", nargs="?", default="youtube_length_engagement.csv")
+    parser.add_argument("--out", help="write the full table to this CSV")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--check", action="store_true", help="compare every pair with scipy.stats.mannwhitneyu")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="time synthetic rows against per-pair scipy")
+    parser.add_argument("--groups", type=int, default=120, help="groups for --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.groups)
+    else:
+        df = load_dataset(args.path)
+        print(f"\n{'='*60}")
+        print("ALL-PAIRS SIGNIFICANCE TESTS (CATEGORY x DURATION)")
+        print(f"{'='*60}")
+        start = time.perf_counter()
+        table = pairwise_table(df)
+        elapsed = time.perf_counter() - start
+        print_table(table, args.alpha)
+        print(f"\n✓ {len(table)} tests in {elapsed:.3f}s")
+        if args.check:
+            check(df)
+        if args.out:
+            table.to_csv(args.out, index=False)
+            print(f"✓ Saved {args.out}")
@@ -0,0 +1,150 @@
+"""
+Bootstrap confidence intervals and permutation tests for short vs long videos.
+
+For every (category, metric) pair - plus all categories pooled - this computes
+percentile bootstrap CIs for the mean difference, the percentage difference and
+Cohen's d, and a two-sided permutation p-value for the mean difference.
+
+Resamples are drawn as batched NumPy index matrices (one row per resample),
+never in a Python loop per resample. Pairs are spread over a process pool;
+each pair gets its own child of one SeedSequence, so results are identical
+whatever the number of workers.
+
+Usage:
+    python resampling.py                                   # 10,000 resamples, all cores
+    python resampling.py --resamples 20000 --workers 4 --seed 7
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engagement_metrics import LONG_LABEL, METRIC_COLUMNS, SHORT_LABEL, load_dataset
+
+# Upper bound on elements in one resample matrix (~40 MB of float64)
+MAX_BATCH_ELEMENTS = 5_000_000
+
+
+def _batches(total, row_length):
+    size = max(1, MAX_BATCH_ELEMENTS // max(1, row_length))
+    for start in range(0, total, size):
+        yield min(size, total - start)
+
+
+# Means and sample variances of `resamples` bootstrap draws of x
+def _bootstrap_moments(x, resamples, rng):
+    means, variances = [], []
+    for batch in _batches(resamples, len(x)):
+        draws = x[rng.integers(0, len(x), size=(batch, len(x)))]
+        means.append(draws.mean(axis=1))
+        variances.append(draws.var(axis=1, ddof=1))
+    return np.concatenate(means), np.concatenate(variances)
+
+
+def _cohens_d(mean_a, var_a, n_a, mean_b, var_b, n_b):
+    pooled_std = np.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / (n_a + n_b - 2))
+    return (mean_a - mean_b) / pooled_std
+
+
+# Share of label shuffles with a mean difference at least as extreme as the observed one
+def _permutation_pvalue(a, b, permutations, rng):
+    pooled = np.concatenate([a, b])
+    n_a, n_b = len(a), len(b)
+    total = pooled.sum()
+    observed = abs(a.mean() - b.mean())
+    extreme = 0
+    for batch in _batches(permutations, len(pooled)):
+        shuffled = rng.permuted(np.broadcast_to(pooled, (batch, len(pooled))), axis=1)
+        sum_a = shuffled[:, :n_a].sum(axis=1)
+        diff = np.abs(sum_a / n_a - (total - sum_a) / n_b)
+        extreme += int((diff >= observed - 1e-12).sum())
+    # +1 so the observed labelling counts as one of the permutations
+    return (extreme + 1) / (permutations + 1)
+
+
+# Everything for one short-vs-long pair; runs in a worker process
+def compare_groups(a, b, resamples=10_000, seed=None, alpha=0.05):
+    a, b = np.asarray(a, dtype="float64"), np.asarray(b, dtype="float64")
+    rng = np.random.default_rng(seed)
+
+    mean_a, mean_b = a.mean(), b.mean()
+    boot_mean_a, boot_var_a = _bootstrap_moments(a, resamples, rng)
+    boot_mean_b, boot_var_b = _bootstrap_moments(b, resamples, rng)
+
+    diff = boot_mean_a - boot_mean_b
+    pct = diff / boot_mean_b * 100
+    d = _cohens_d(boot_mean_a, boot_var_a, len(a), boot_mean_b, boot_var_b, len(b))
+    q = [alpha / 2 * 100, (1 - alpha / 2) * 100]
+
+    return {
+        "n_short": len(a),
+        "n_long": len(b),
+        "mean_diff": mean_a - mean_b,
+        "mean_diff_ci": tuple(np.percentile(diff, q)),
+        "pct_diff": (mean_a - mean_b) / mean_b * 100,
+        "pct_diff_ci": tuple(np.nanpercentile(pct, q)),
+        "cohens_d": float(_cohens_d(mean_a, a.var(ddof=1), len(a), mean_b, b.var(ddof=1), len(b))),
+        "cohens_d_ci": tuple(np.nanpercentile(d, q)),
+        "permutation_p": _permutation_pvalue(a, b, resamples, rng),
+    }
+
+
+def _run_task(task):
+    category, metric, a, b, resamples, seed = task
+    return {"category": category, "metric": metric, **compare_groups(a, b, resamples, seed)}
+
+
+# One task per (category or "All", metric); seeds come from one SeedSequence in task order
+def resampling_table(df, metrics=METRIC_COLUMNS, resamples=10_000, seed=0, workers=None):
+    groups = [("All", df)] + [(c, g) for c, g in df.groupby("category_name", observed=True)]
+    tasks = []
+    for category, g in groups:
+        for metric in metrics:
+            a = g.loc[g["duration_category"] == SHORT_LABEL, metric].to_numpy()
+            b = g.loc[g["duration_category"] == LONG_LABEL, metric].to_numpy()
+            if len(a) > 1 and len(b) > 1:
+                tasks.append([category, metric, a, b, resamples])
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    tasks = [tuple(t) + (s,) for t, s in zip(tasks, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        rows = [_run_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_run_task, tasks))
+    return pd.DataFrame(rows)
+
+
+def print_table(table, alpha=0.05):
+    level = f"{(1 - alpha) * 100:.0f}%"
+    for metric, rows in table.groupby("metric", sort=False):
+        print(f"\n{metric} (short - long, {level} bootstrap CIs):")
+        for _, r in rows.iterrows():
+            print(f"  {r['category']:22} n={r['n_short']:>4}/{r['n_long']:<4} "
+                  f"diff={r['mean_diff']:+.4f} [{r['mean_diff_ci'][0]:+.4f}, {r['mean_diff_ci'][1]:+.4f}]  "
+                  f"pct={r['pct_diff']:+.1f}% [{r['pct_diff_ci'][0]:+.1f}, {r['pct_diff_ci'][1]:+.1f}]  "
+                  f"d={r['cohens_d']:+.3f} [{r['cohens_d_ci'][0]:+.3f}, {r['cohens_d_ci'][1]:+.3f}]  "
+                  f"p_perm={r['permutation_p']:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and permutation tests")
+    parser.add_argument("path", nargs="?", default="youtube_length_engagement.csv")
+    parser.add_argument("--resamples", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_dataset(args.path)
+    print(f"\n{'='*60}")
+    print("RESAMPLING (BOOTSTRAP + PERMUTATION)")
+    print(f"{'='*60}")
+    start = time.perf_counter()
+    table = resampling_table(df, resamples=args.resamples, seed=args.seed, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print_table(table)
+    print(f"\n✓ {len(table)} pairs x {args.resamples:,} resamples in {elapsed:.2f}s")
@@ -0,0 +1,322 @@
+"""
+Quota-aware search scheduling.
+
+A search page costs 100 quota units and a videos call costs 1, yet the fixed
+collection loop walks every term in a fixed order and re-runs the same
+searches on later passes. The scheduler instead:
+
+  * records each term's yield funnel per run (IDs returned -> valid -> in
+    category -> in duration range -> new) in a small JSON file, so later runs
+    know which terms pay off,
+  * orders terms by observed new videos per quota unit (unseen terms get the
+    category's average as a prior) and never repeats a search within a run,
+  * gives every (phase, category) slot a fair share of the quota budget and
+    stops a category once the target is reached or the remaining terms are
+    predicted to yield nothing.
+
+Usage:
+    python search_scheduler.py --plan --budget 10000        # dry run: print the plan, no API calls
+    python search_scheduler.py --record fixtures.json       # record every term once (live or mock API)
+    python search_scheduler.py --compare fixtures.json      # fixed loop vs scheduler on the recording
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import tempfile
+
+import instrumentation
+import youtube_data
+from video_index import VideoIndex
+from youtube_data import (
+    CATEGORIES,
+    QUOTA_COSTS,
+    get_video_details,
+    get_video_ids_by_search,
+    is_valid_long,
+    is_valid_short,
+    quota_spent,
+    search_term_ids,
+    select_videos,
+)
+
+# How each phase searches and which durations it keeps
+PHASES = {
+    "short": {"terms": "short_terms", "duration": "any", "max_videos": 80,
+              "in_range": lambda v: 1 <= v["duration_minutes"] < 10, "is_valid": is_valid_short},
+    "long": {"terms": "long_terms", "duration": "long", "max_videos": 30,
+             "in_range": lambda v: v["duration_minutes"] > 20, "is_valid": is_valid_long},
+}
+
+DEFAULT_PRIOR = 0.1      # new videos per quota unit assumed when nothing has been observed
+MIN_PREDICTED_NEW = 0.5  # below this, a term is not worth its search cost
+
+
+# Quota a single term is expected to cost: its search pages plus the detail batches
+def term_cost(phase):
+    pages = math.ceil(PHASES[phase]["max_videos"] / 50)
+    # Each page of up to 50 IDs needs at most one 50-ID detail batch
+    return pages * (QUOTA_COSTS["search"] + QUOTA_COSTS["videos"])
+
+
+class SearchScheduler:
+    """Orders search terms by observed yield and keeps spending within a quota budget."""
+
+    def __init__(self, budget=10000, stats_path=".term_yield.json"):
+        self.budget = budget
+        self.stats_path = stats_path
+        self.spent = 0
+        self.ran = set()    # (cat_id, phase, term) searched during this run
+        self.funnel = {}    # this run's yield per (cat_id, phase, term)
+        self.stats = {}     # accumulated yield across runs, keyed "cat_id|phase|term"
+        if stats_path and os.path.exists(stats_path):
+            with open(stats_path, encoding="utf-8") as f:
+                self.stats = json.load(f)
+
+    @property
+    def remaining(self):
+        return self.budget - self.spent
+
+    # Observed new videos per quota unit, or None if the term has never run
+    def observed_rate(self, cat_id, phase, term):
+        s = self.stats.get(f"{cat_id}|{phase}|{term}")
+        if not s or not s["quota"]:
+            return None
+        return s["new"] / s["quota"]
+
+    def predicted_rate(self, cat_id, phase, term, terms):
+        # A search already run this run returns the same pages: nothing new
+        if (cat_id, phase, term) in self.ran:
+            return 0.0
+        rate = self.observed_rate(cat_id, phase, term)
+        if rate is not None:
+            return rate
+        seen = [r for r in (self.observed_rate(cat_id, phase, t) for t in terms) if r is not None]
+        return sum(seen) / len(seen) if seen else DEFAULT_PRIOR
+
+    def predicted_new(self, cat_id, phase, term, terms):
+        return self.predicted_rate(cat_id, phase, term, terms) * term_cost(phase)
+
+    # Terms best-first; ties keep the configured order
+    def order(self, cat_id, phase, terms):
+        return sorted(terms, key=lambda t: -self.predicted_rate(cat_id, phase, t, terms))
+
+    # Fair share of what is left for one (phase, category) slot
+    def allowance(self, slots_left):
+        return self.remaining / max(1, slots_left)
+
+    # quota: what the term cost (cached calls included); charged: units actually spent on the network
+    def record(self, cat_id, phase, term, quota, returned, valid, in_category, in_range, new, charged=None):
+        self.ran.add((cat_id, phase, term))
+        self.spent += quota if charged is None else charged
+        funnel = {"quota": quota, "returned": returned, "valid": valid,
+                  "in_category": in_category, "in_range": in_range, "new": new}
+        self.funnel[(cat_id, phase, term)] = funnel
+
+        s = self.stats.setdefault(f"{cat_id}|{phase}|{term}", {k: 0 for k in funnel})
+        s["runs"] = s.get("runs", 0) + 1
+        for k, v in funnel.items():
+            s[k] += v
+
+    def save(self):
+        if self.stats_path:
+            with open(self.stats_path, "w", encoding="utf-8") as f:
+                json.dump(self.stats, f, indent=1, sort_keys=True)
+
+    # Dry run: which terms would run, in what order, and what they are expected to return
+    def plan(self, categories, target_per_category=30):
+        rows = []
+        budget_left = self.remaining
+        slots_left = len(PHASES) * len(categories)
+        for phase, spec in PHASES.items():
+            for cat_id, info in categories.items():
+                terms = info[spec["terms"]]
+                allowance = budget_left / max(1, slots_left)
+                slot_spent = 0
+                expected = 0.0
+                for term in self.order(cat_id, phase, terms):
+                    new = self.predicted_new(cat_id, phase, term, terms)
+                    cost = term_cost(phase)
+                    if expected >= target_per_category or new < MIN_PREDICTED_NEW or slot_spent + cost > allowance:
+                        break
+                    expected += new
+                    slot_spent += cost
+                    rows.append({"phase": phase, "category": info["name"], "term": term,
+                                 "cost": cost, "predicted_new": new,
+                                 "observed": self.observed_rate(cat_id, phase, term) is not None})
+                budget_left -= slot_spent
+                slots_left -= 1
+        return rows
+
+    def print_plan(self, categories, target_per_category=30):
+        rows = self.plan(categories, target_per_category)
+        print(f"\n{'='*60}")
+        print(f"SEARCH PLAN (budget {self.budget} units, dry run)")
+        print(f"{'='*60}")
+        total = 0
+        for r in rows:
+            total += r["cost"]
+            source = "observed" if r["observed"] else "prior"
+            print(f"  [{r['phase']:5}] {r['category']:22} '{r['term']}': "
+                  f"~{r['predicted_new']:.1f} new for {r['cost']} units ({source})")
+        print(f"\n  {len(rows)} searches, {total} units planned of {self.budget}")
+        return rows
+
+    def summary(self, videos_collected):
+        per_video = self.spent / videos_collected if videos_collected else float("inf")
+        return (f"Scheduler: {self.spent}/{self.budget} quota units over {len(self.ran)} searches, "
+                f"{per_video:.1f} units per collected video")
+
+
+# Scheduled replacement for collect_short_videos / collect_long_videos
+def collect_scheduled(categories, phase, target_per_category, scheduler, index, slots_left=None, store=None):
+    spec = PHASES[phase]
+    in_range = spec["in_range"]
+    collected_all = []
+    if slots_left is None:
+        slots_left = len(categories)
+
+    for cat_id, cat_info in categories.items():
+        cat_name = cat_info["name"]
+        terms = cat_info[spec["terms"]]
+        print(f"\n{cat_name}:")
+
+        collected = {v["video_id"]: v for v in index.by_category(cat_id, cat_name)
+                     if in_range(v) and spec["is_valid"](v)}
+        allowance = scheduler.allowance(slots_left)
+        slot_spent = 0
+        fed = 0
+
+        for term in scheduler.order(cat_id, phase, terms):
+            if len(collected) >= target_per_category:
+                break
+            if scheduler.predicted_new(cat_id, phase, term, terms) < MIN_PREDICTED_NEW:
+                print("  (Remaining terms predicted to yield nothing)")
+                break
+            if slot_spent + term_cost(phase) > allowance:
+                print(f"  (Quota share for this category used: {slot_spent}/{allowance:.0f} units)")
+                break
+
+            print(f"  '{term}'... (currently {len(collected)}/{target_per_category})", end=" ")
+            before, network_before = quota_spent(), sum(youtube_data.QUOTA_USED.values())
+            video_ids = search_term_ids(term, spec["duration"], spec["max_videos"], store, cat_id, phase)
+            index.lookup(video_ids, cat_id, cat_name)
+            index.resolve_pending(cat_id, cat_name)
+            quota = quota_spent() - before
+            charged = sum(youtube_data.QUOTA_USED.values()) - network_before
+            slot_spent += charged
+
+            # Yield funnel for this term
+            records = [index.record(vid) for vid in video_ids]
+            valid = [r for r in records if r is not None]
+            in_category = [r for r in valid if r["category"] == cat_id]
+            matching = [{**r, "category_name": cat_name} for r in in_category if in_range(r)]
+            new = 0
+            for v in matching:
+                if v["video_id"] not in collected and spec["is_valid"](v):
+                    collected[v["video_id"]] = v
+                    new += 1
+            scheduler.record(cat_id, phase, term, quota, len(video_ids), len(valid),
+                             len(in_category), len(matching), new, charged)
+            instrumentation.term_yield(phase, cat_name, term, len(video_ids), len(in_category), len(matching), new)
+            print(f"✓ {new} new ({quota} units)")
+            fed = youtube_data.feed_live(
+                lambda: select_videos(list(collected.values()), spec["is_valid"], target_per_category), fed)
+
+        unique = select_videos(list(collected.values()), spec["is_valid"], target_per_category)
+        collected_all.extend(unique)
+        youtube_data.feed_live(lambda: unique, fed)
+        slots_left -= 1
+
+        if len(unique) < target_per_category:
+            print(f"  ⚠️  Warning: Only got {len(unique)}/{target_per_category} VALID {phase} videos for {cat_name}")
+        else:
+            print(f"  ✅ Total {phase} for {cat_name}: {len(unique)}")
+
+    return collected_all
+
+
+# Both phases under one scheduler; returns (short_videos, long_videos)
+def collect(categories, target_per_category, scheduler, index):
+    short_videos = collect_scheduled(categories, "short", target_per_category, scheduler, index,
+                                     slots_left=2 * len(categories))
+    long_videos = collect_scheduled(categories, "long", target_per_category, scheduler, index,
+                                    slots_left=len(categories))
+    scheduler.save()
+    return short_videos, long_videos
+
+
+# Record every term once (search pages + all video items) into a JSON fixture file
+def record_fixtures(path, categories=CATEGORIES):
+    from api_cache import FixtureCache
+
+    youtube_data.CACHE = FixtureCache()
+    for cat_id, info in categories.items():
+        for phase, spec in PHASES.items():
+            for term in info[spec["terms"]]:
+                video_ids = get_video_ids_by_search(term, spec["duration"], max_videos=spec["max_videos"])
+                get_video_details(video_ids, cat_id, info["name"])
+    youtube_data.CACHE.save(path)
+    print(f"✓ Recorded {youtube_data.CACHE.summary()} to {path}")
+
+
+def _replay(path, run):
+    from api_cache import FixtureCache
+
+    saved = youtube_data.CACHE, youtube_data.OFFLINE
+    youtube_data.CACHE = FixtureCache(path)
+    youtube_data.OFFLINE = True
+    for k in youtube_data.API_CALLS:
+        youtube_data.API_CALLS[k] = 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            videos = run()
+    finally:
+        youtube_data.CACHE, youtube_data.OFFLINE = saved
+    return quota_spent(), len(videos)
+
+
+# Fixed loop vs scheduler (cold, then with the yield it just learned) on recorded fixtures
+def compare(path, categories=CATEGORIES, target_per_category=30, budget=100000):
+    results = {}
+    results["fixed loop (current)"] = _replay(path, lambda: (
+        youtube_data.collect_short_videos(categories, target_per_category)
+        + youtube_data.collect_long_videos(categories, target_per_category)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_path = os.path.join(tmp, "yield.json")
+        for label in ("scheduler (cold)", "scheduler (learned)"):
+            scheduler = SearchScheduler(budget, stats_path)
+            index = VideoIndex(youtube_data.api_get)
+            results[label] = _replay(path, lambda: sum(
+                collect(categories, target_per_category, scheduler, index), []))
+
+    print(f"\n{'='*60}")
+    print("QUOTA PER COLLECTED VIDEO (recorded fixtures)")
+    print(f"{'='*60}")
+    for label, (quota, videos) in results.items():
+        per_video = quota / videos if videos else float("inf")
+        print(f"  {label:22} {quota:7} units  {videos:4} videos  {per_video:7.1f} units/video")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quota-aware search scheduling")
+    parser.add_argument("--budget", type=int, default=10000, help="quota units to spend")
+    parser.add_argument("--target", type=int, default=30, help="videos per category and phase")
+    parser.add_argument("--stats-path", default=".term_yield.json", help="observed per-term yield")
+    parser.add_argument("--plan", action="store_true", help="print the search plan without calling the API")
+    parser.add_argument("--record", metavar="FIXTURES", help="record every term's responses to a JSON file")
+    parser.add_argument("--compare", metavar="FIXTURES", help="compare strategies on recorded fixtures")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+    elif args.compare:
+        compare(args.compare, target_per_category=args.target)
+    elif args.plan:
+        SearchScheduler(args.budget, args.stats_path).print_plan(CATEGORIES, args.target)
+    else:
+        youtube_data.main(quota_budget=args.budget, term_stats_path=args.stats_path)
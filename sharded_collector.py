@@ -0,0 +1,244 @@
+"""
+Sharded collection: (category, phase, search term) work units spread over
+worker processes and a pool of API keys.
+
+The serial collector walks CATEGORIES one term at a time, in one process, on
+one key, so a run is capped by one key's daily quota and one connection's
+latency. Here a coordinator hands work units to a process pool:
+  * a unit is one search term of one (category, phase) shard: its search pages
+    and their detail batches
+  * requests rotate over a KeyPool (key_pool.py) shared by every worker: spend
+    is tracked per key and a key that answers quotaExceeded is retired
+  * results are merged, in term order, into one VideoPool (video_pool.py) per
+    shard, and a shard gets no more units once its pool reaches the target
+
+Because merging follows term order, the dataset does not depend on the number
+of workers. Only `term_window` units per shard run at once, so at most that
+many searches are spent past the target. Unlike the serial engine's run-wide
+index, videos of another category found by a search are not reused.
+
+Usage:
+    YOUTUBE_API_KEYS=key1,key2,key3 python youtube_data.py --engine sharded --workers 4
+    python youtube_data.py --engine sharded --workers 8 --extra-categories
+    python sharded_collector.py --benchmark           # 1, 2, 4, 8 workers against a local mock API
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import requests
+
+import instrumentation
+import youtube_data
+from api_decoder import VideoColumns
+from search_scheduler import PHASES
+from video_pool import LONG, SHORT, VideoPool
+from youtube_data import get_video_columns, get_video_ids_by_search
+
+PHASE_BUCKETS = {"short": SHORT, "long": LONG}
+SEARCH_COST = youtube_data.QUOTA_COSTS["search"]  # units a key needs to take another work unit
+
+
+_INSTRUMENTED = False
+
+
+# Worker process setup: own HTTP session and cache connection, the shared key pool
+def _init_worker(keys, api_base, request_delay, cache_path, refresh_stats, instrumented):
+    global _INSTRUMENTED
+    _INSTRUMENTED = instrumented
+    youtube_data.KEYS = keys
+    youtube_data.API_BASE = api_base
+    youtube_data.REQUEST_DELAY = request_delay
+    youtube_data.SESSION = requests.Session()
+    youtube_data.CACHE = None
+    youtube_data.configure_cache(cache_path, refresh_stale_stats=refresh_stats)
+    instrumentation.disable()
+
+
+# One work unit, run in a worker: search one term and fetch its in-category details
+def _run_unit(unit):
+    cat_id, cat_name, phase, term = unit
+    spec = PHASES[phase]
+    calls, quota = dict(youtube_data.API_CALLS), dict(youtube_data.QUOTA_USED)
+    # Request metrics of this unit only; the coordinator adds them to the run's
+    run = instrumentation.enable() if _INSTRUMENTED else None
+    video_ids = get_video_ids_by_search(term, spec["duration"], spec["max_videos"])
+    # Columns pickle back to the coordinator far smaller than one dict per video
+    details = get_video_columns(video_ids, cat_id) if video_ids else VideoColumns()
+    return {
+        "returned": len(video_ids),
+        "details": details,
+        "calls": {e: n - calls.get(e, 0) for e, n in youtube_data.API_CALLS.items()},
+        "quota": {e: n - quota.get(e, 0) for e, n in youtube_data.QUOTA_USED.items()},
+        "metrics": (run.endpoints, run.errors) if run is not None else None,
+    }
+
+
+class ShardedCollector:
+    """Coordinator: schedules term units over a process pool and merges their records."""
+
+    # keys: a KeyPool (default: youtube_data.KEYS, else one built from youtube_data.API_KEYS)
+    # term_window: units of one shard in flight at once
+    def __init__(self, workers=4, keys=None, term_window=2, cache_path=None, refresh_stats=False):
+        self.workers = workers
+        self.term_window = term_window
+        self.keys = keys or youtube_data.KEYS or youtube_data.configure_keys(youtube_data.API_KEYS)
+        # fork: workers start without re-importing pandas; the parent holds no cache connection
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_worker,
+            initargs=(self.keys, youtube_data.API_BASE, youtube_data.REQUEST_DELAY, cache_path, refresh_stats,
+                      instrumentation.RUN is not None))
+        self.units = 0
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _merge(self, shard, result, target_per_category):
+        bucket, pool = shard["bucket"], shard["pool"]
+        for e, n in result["calls"].items():
+            youtube_data.API_CALLS[e] = youtube_data.API_CALLS.get(e, 0) + n
+        for e, n in result["quota"].items():
+            youtube_data.QUOTA_USED[e] = youtube_data.QUOTA_USED.get(e, 0) + n
+        if result["metrics"] is not None and instrumentation.RUN is not None:
+            instrumentation.RUN.merge(*result["metrics"])
+
+        details = result["details"].records(shard["cat_name"])
+        in_range = [v for v in details if PHASES[shard["phase"]]["in_range"](v)]
+        before = pool.count(bucket)
+        pool.extend(in_range)
+        term = shard["terms"][shard["merged"]]
+        instrumentation.term_yield(shard["phase"], shard["cat_name"], term, result["returned"],
+                                   len(result["details"]), len(in_range), pool.count(bucket) - before)
+        print(f"  {shard['cat_name']} '{term}'... ✓ {pool.count(bucket) - before} new "
+              f"({min(pool.count(bucket), target_per_category)}/{target_per_category})")
+
+    # One phase over every category; returns the selected records in category order
+    def collect_phase(self, categories, phase, target_per_category=30):
+        spec = PHASES[phase]
+        shards = [{"cat_id": cat_id, "cat_name": info["name"], "phase": phase, "bucket": PHASE_BUCKETS[phase],
+                   "terms": info[spec["terms"]], "next": 0, "merged": 0, "results": {}, "pool": VideoPool()}
+                  for cat_id, info in categories.items()]
+
+        def wanted(shard):
+            return (shard["pool"].count(shard["bucket"]) < target_per_category
+                    and shard["next"] < len(shard["terms"])
+                    and shard["next"] - shard["merged"] < self.term_window)
+
+        in_flight = {}
+
+        # Fill free workers, one unit per shard per sweep so shards advance evenly
+        def dispatch():
+            progress = True
+            while progress and len(in_flight) < self.workers and not self.keys.exhausted(SEARCH_COST):
+                progress = False
+                for shard in shards:
+                    if len(in_flight) >= self.workers:
+                        break
+                    if wanted(shard):
+                        unit = (shard["cat_id"], shard["cat_name"], phase, shard["terms"][shard["next"]])
+                        in_flight[self._executor.submit(_run_unit, unit)] = (shard, shard["next"])
+                        shard["next"] += 1
+                        self.units += 1
+                        progress = True
+
+        dispatch()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard, index = in_flight.pop(future)
+                shard["results"][index] = future.result()
+                # Merge in term order, so the selection is the same for any number of workers
+                while shard["merged"] in shard["results"]:
+                    self._merge(shard, shard["results"].pop(shard["merged"]), target_per_category)
+                    shard["merged"] += 1
+            dispatch()
+        if self.keys.exhausted(SEARCH_COST):
+            print("  ⚠️  No API key has quota left for a search: stopped handing out search terms")
+
+        selected = []
+        for shard in shards:
+            videos = shard["pool"].records(shard["bucket"], target_per_category)
+            selected.extend(videos)
+            if len(videos) < target_per_category:
+                print(f"  ⚠️  Warning: Only got {len(videos)}/{target_per_category} VALID {phase} videos "
+                      f"for {shard['cat_name']}")
+            else:
+                print(f"  ✅ Total {phase} for {shard['cat_name']}: {len(videos)}")
+        return selected
+
+    # Same signatures as the serial phase functions
+    def collect_short_videos(self, categories, target_per_category=30):
+        return self.collect_phase(categories, "short", target_per_category)
+
+    def collect_long_videos(self, categories, target_per_category=30):
+        return self.collect_phase(categories, "long", target_per_category)
+
+
+# Both phases at 1, 2, 4 and 8 workers against a local mock API (several keys with a small quota)
+def benchmark(worker_counts=(1, 2, 4, 8), latency=0.05, n_keys=4, key_quota=3000,
+              target_per_category=30, extra_categories=True):
+    import contextlib
+    import io
+
+    from mock_youtube_api import MOCK_CATEGORIES, start_mock_server
+
+    categories = {**youtube_data.CATEGORIES, **(youtube_data.EXTRA_CATEGORIES if extra_categories else {})}
+    category_mix = {cat_id: 1.0 for cat_id in sorted(set(MOCK_CATEGORIES) | set(categories))}
+    keys = [f"mock-key-{i}" for i in range(n_keys)]
+    original = youtube_data.API_BASE, youtube_data.REQUEST_DELAY
+    youtube_data.REQUEST_DELAY = 0.0
+
+    print(f"\n{'='*60}")
+    print(f"SHARDED COLLECTION BENCHMARK (mock API, {latency*1000:.0f} ms latency, "
+          f"{len(categories)} categories, {n_keys} keys x {key_quota} units)")
+    print(f"{'='*60}")
+    results, reference = {}, None
+    for workers in worker_counts:
+        # Fresh server per run, so every run starts with unspent keys
+        server, api, base_url = start_mock_server(latency=latency, category_mix=category_mix,
+                                                  key_quota=key_quota)
+        youtube_data.API_BASE = base_url
+        # The pool is not told the mock's quota: keys are retired when the API answers quotaExceeded
+        pool = youtube_data.configure_keys(keys)
+        collector = ShardedCollector(workers, pool)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                videos = (collector.collect_short_videos(categories, target_per_category)
+                          + collector.collect_long_videos(categories, target_per_category))
+            seconds = time.perf_counter() - start
+        finally:
+            collector.close()
+            server.shutdown()
+        ids = [v["video_id"] for v in videos]
+        reference = reference or ids
+        usage = pool.usage()
+        results[workers] = {"seconds": seconds, "requests": sum(api.counts.values()), "rows": len(videos),
+                            "unique": len(set(ids)), "units": sum(api.key_units.values()),
+                            "keys_exhausted": sum(u["exhausted"] for u in usage.values()),
+                            "same_records": ids == reference}
+        r = results[workers]
+        speedup = results[worker_counts[0]]["seconds"] / seconds
+        print(f"  {workers} worker(s): {seconds:6.2f}s  {speedup:4.1f}x  {r['requests']} requests, "
+              f"{r['rows']} rows ({r['unique']} unique), {r['units']} units, {r['keys_exhausted']}/{n_keys} keys exhausted, "
+              f"same records: {'✓' if r['same_records'] else '✗'}")
+
+    youtube_data.API_BASE, youtube_data.REQUEST_DELAY = original
+    youtube_data.configure_keys(None)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process, multi-key collector")
+    parser.add_argument("--benchmark", action="store_true", help="scale 1/2/4/8 workers on a local mock API")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05, help="mock API latency for --benchmark")
+    parser.add_argument("--keys", type=int, default=4, help="mock API keys for --benchmark")
+    parser.add_argument("--key-quota", type=int, default=3000, help="mock quota units per key for --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.workers, args.latency, args.keys, args.key_quota)
+    else:
+        youtube_data.main(engine="sharded", workers=args.workers[0])
@@ -0,0 +1,298 @@
+"""
+Out-of-core version of the descriptive part of engagement_analysis.py.
+
+The dataset is read in chunks and folded into one accumulator per
+(category, duration bucket): a count, Welford/Chan running mean and variance,
+and a mergeable log-bucketed quantile sketch for medians. Accumulators merge
+exactly, so the overall short/long figures are built from the per-category
+ones. Memory stays bounded by the chunk size and the sketch size, whatever
+the input size.
+
+Tolerance against the in-memory path (check with --check):
+  * count, mean, std, pct difference, Cohen's d: equal up to float rounding
+    (relative error < 1e-9)
+  * median: within the sketch's relative accuracy (default 1%)
+
+Shapiro-Wilk and Mann-Whitney need every value at once and are not part of
+the streaming report.
+
+Usage:
+    python streaming_analysis.py                          # youtube_length_engagement.csv
+    python streaming_analysis.py big.csv --chunksize 500000
+    python streaming_analysis.py --check                  # compare with the in-memory path
+"""
+import argparse
+import math
+import resource
+import sys
+
+import numpy as np
+import pandas as pd
+
+from engagement_metrics import LONG_LABEL, SHORT_LABEL, SHORT_MAX_MINUTES
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch-style) for non-negative values.
+
+    Any quantile is returned within `relative_accuracy` of a true value of
+    that rank; two sketches merge by adding their bucket counts.
+    """
+
+    __slots__ = ("relative_accuracy", "gamma", "log_gamma", "bins", "zero_count", "count")
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype("int64"),
+                                     return_counts=True)
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                self.bins[k] = self.bins.get(k, 0) + c
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if rank < seen:
+                # Midpoint (in relative terms) of bucket (gamma^(k-1), gamma^k]
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class RunningStats:
+    """Count, mean and variance (Welford/Chan, mergeable) plus a median sketch."""
+
+    __slots__ = ("n", "mean", "m2", "sketch")
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def _combine(self, n, mean, m2):
+        total = self.n + n
+        if not total:
+            return
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        if not len(values):
+            return
+        batch_mean = values.mean()
+        self._combine(len(values), batch_mean, float(((values - batch_mean) ** 2).sum()))
+        self.sketch.update(values)
+
+    def merge(self, other):
+        self._combine(other.n, other.mean, other.m2)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else float("nan")
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    @property
+    def median(self):
+        return self.sketch.quantile(0.5)
+
+
+# Fold values into {(category_name, duration_category): RunningStats}, given category codes
+# (-1 for missing) into `categories`; groups come in the order of a groupby on category then bucket
+def fold_values(accumulators, codes, categories, minutes, values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    keys = np.asarray(codes) * 2 + (np.asarray(minutes) < SHORT_MAX_MINUTES)
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], np.asarray(values, dtype="float64")[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    for key, group in zip(keys[starts].tolist(), np.split(values, starts[1:])):
+        if key < 0:  # missing category
+            continue
+        key = (categories[key // 2], SHORT_LABEL if key % 2 else LONG_LABEL)
+        acc = accumulators.get(key)
+        if acc is None:
+            acc = accumulators[key] = RunningStats(relative_accuracy)
+        acc.update(group)
+    return accumulators
+
+
+# Fold one DataFrame chunk
+def fold_chunk(accumulators, chunk, metric="like_view_ratio", relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    codes, categories = pd.factorize(chunk["category_name"], sort=True)
+    return fold_values(accumulators, codes, categories, chunk["duration_minutes"].to_numpy(),
+                       chunk[metric].to_numpy(), relative_accuracy)
+
+
+# Fold a CSV into {(category_name, duration_category): RunningStats}, one chunk at a time
+def stream_accumulators(path="youtube_length_engagement.csv", metric="like_view_ratio",
+                        chunksize=100_000, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    accumulators = {}
+    usecols = ["category_name", "duration_minutes", metric]
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize,
+                             dtype={"category_name": "string", "duration_minutes": "float64", metric: "float64"}):
+        fold_chunk(accumulators, chunk, metric, relative_accuracy)
+    return accumulators
+
+
+# Merge every category's accumulator for one duration bucket
+def pooled(accumulators, bucket):
+    total = RunningStats()
+    for (_, b), acc in accumulators.items():
+        if b == bucket:
+            total.merge(acc)
+    return total
+
+
+# Same figures as the in-memory analysis, from accumulators only (NaN while a bucket has < 2 videos)
+def summarize(accumulators):
+    short, long = pooled(accumulators, SHORT_LABEL), pooled(accumulators, LONG_LABEL)
+    if short.n < 2 or long.n < 2:
+        return {"short": short, "long": long, "pct_diff": float("nan"), "cohens_d": float("nan")}
+    pct_diff = (short.mean - long.mean) / long.mean * 100 if long.mean else float("nan")
+    pooled_std = math.sqrt(((short.n - 1) * short.var + (long.n - 1) * long.var) / (short.n + long.n - 2))
+    cohens_d = (short.mean - long.mean) / pooled_std if pooled_std else float("nan")
+    return {"short": short, "long": long, "pct_diff": pct_diff, "cohens_d": cohens_d}
+
+
+# Dataset summary, DESCRIPTIVE STATISTICS and ENGAGEMENT BY CATEGORY as text; returns (text, summary)
+def format_report(accumulators):
+    s = summarize(accumulators)
+    short, long = s["short"], s["long"]
+    lines = [
+        "\nDataset Summary:",
+        f"  Total videos: {short.n + long.n}",
+        f"  Short videos: {short.n}",
+        f"  Long videos: {long.n}",
+        f"\n{'='*60}",
+        "DESCRIPTIVE STATISTICS",
+        f"{'='*60}",
+    ]
+    for label, acc in (("Short Videos (<10 min)", short), ("Long Videos (>20 min)", long)):
+        if not acc.n:
+            continue
+        lines += [
+            f"\n{label}:",
+            f"  Mean like-to-view ratio: {acc.mean:.4f} ({acc.mean*100:.2f}%)",
+            f"  Median like-to-view ratio: {acc.median:.4f} (sketch, ±{acc.sketch.relative_accuracy:.0%})",
+            f"  Std deviation: {acc.std:.4f}",
+        ]
+
+    if not math.isnan(s["cohens_d"]):
+        lines.append(f"\n📊 Short videos have {s['pct_diff']:.1f}% higher like-to-view ratio than long videos")
+        lines.append(f"\nEffect Size (Cohen's d): {s['cohens_d']:.3f}")
+        if abs(s["cohens_d"]) < 0.2:
+            lines.append("   → Small effect")
+        elif abs(s["cohens_d"]) < 0.5:
+            lines.append("   → Medium effect")
+        else:
+            lines.append("   → Large effect")
+
+    lines += [f"\n{'='*60}", "ENGAGEMENT BY CATEGORY", f"{'='*60}"]
+    if accumulators:
+        category_stats = pd.DataFrame(
+            [{"category_name": c, "duration_category": b, "mean": acc.mean, "count": acc.n}
+             for (c, b), acc in sorted(accumulators.items())]
+        ).set_index(["category_name", "duration_category"]).round(4)
+        lines.append(f"\n{category_stats}")
+    return "\n".join(lines), s
+
+
+def print_report(accumulators):
+    text, s = format_report(accumulators)
+    print(text)
+    return s
+
+
+# Peak resident memory of this process so far, in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+# Compare the streaming figures with the in-memory path on the same file
+def check(path, metric="like_view_ratio", chunksize=100_000, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    from engagement_metrics import load_dataset
+
+    s = summarize(stream_accumulators(path, metric, chunksize, relative_accuracy))
+    df = load_dataset(path)
+    short = df.loc[df["duration_category"] == SHORT_LABEL, metric]
+    long = df.loc[df["duration_category"] == LONG_LABEL, metric]
+    pooled_std = np.sqrt(((len(short) - 1) * short.var() + (len(long) - 1) * long.var())
+                         / (len(short) + len(long) - 2))
+    exact = {
+        "short mean": (s["short"].mean, short.mean()), "long mean": (s["long"].mean, long.mean()),
+        "short std": (s["short"].std, short.std()), "long std": (s["long"].std, long.std()),
+        "pct diff": (s["pct_diff"], (short.mean() - long.mean()) / long.mean() * 100),
+        "cohen's d": (s["cohens_d"], (short.mean() - long.mean()) / pooled_std),
+    }
+    approx = {"short median": (s["short"].median, short.median()),
+              "long median": (s["long"].median, long.median())}
+
+    print(f"\n{'='*60}")
+    print("STREAMING vs IN-MEMORY")
+    print(f"{'='*60}")
+    ok = True
+    for name, (got, want) in exact.items():
+        rel = abs(got - want) / abs(want) if want else abs(got)
+        ok &= rel < 1e-9
+        print(f"  {name:14} {got:.6f} vs {want:.6f}  (rel err {rel:.1e}, tolerance 1e-9)")
+    for name, (got, want) in approx.items():
+        rel = abs(got - want) / abs(want) if want else abs(got)
+        # Sketch error is relative to a value of that rank; pandas averages the two middle values
+        ok &= rel <= 2 * relative_accuracy
+        print(f"  {name:14} {got:.6f} vs {want:.6f}  (rel err {rel:.1e}, tolerance {2 * relative_accuracy:.0e})")
+    print(f"\n  {'✅ Within tolerance' if ok else '❌ Outside tolerance'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked (out-of-core) engagement statistics")
+    parser.add_argument("path", nargs="?", default="youtube_length_engagement.csv")
+    parser.add_argument("--metric", default="like_view_ratio")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--relative-accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY,
+                        help="median sketch accuracy")
+    parser.add_argument("--check", action="store_true", help="compare with the in-memory path")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOUTUBE VIDEO LENGTH & ENGAGEMENT ANALYSIS (STREAMING)")
+    print("="*60)
+    if args.check:
+        check(args.path, args.metric, args.chunksize, args.relative_accuracy)
+    else:
+        print_report(stream_accumulators(args.path, args.metric, args.chunksize, args.relative_accuracy))
+    print(f"\nPeak memory: {peak_rss_mb():.0f} MB")
@@ -0,0 +1,215 @@
+"""
+Short-vs-long statistics for a whole grid of duration cutoffs.
+
+The study's buckets are fixed at short < 10 min and long > 20 min. This
+computes the group means, percentage difference and Cohen's d for every
+(short cutoff, long cutoff) pair of a grid, per category and for all
+categories together, to show how the finding depends on the cutoffs.
+
+Rows are sorted once, by category then duration. Prefix sums of the metric
+and its square over that order give any group's count, mean and variance
+from two lookups. Each cutoff is one binary search into a category's
+durations, so a grid of thousands of pairs costs about as much as the sort.
+The "All" row adds up the categories' sums, which needs no second sort. Sums
+are taken around the overall mean, so variances keep their precision over
+millions of rows.
+
+Usage:
+    python threshold_sweep.py                            # default grid, like_view_ratio
+    python threshold_sweep.py --metric engagement_rate --out sweep.csv
+    python threshold_sweep.py --short 5 10 15 --long 10 20 30 --heatmap sweep.png
+    python threshold_sweep.py --benchmark 2000000        # synthetic rows vs per-pair masks
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from engagement_metrics import LONG_MIN_MINUTES, SHORT_MAX_MINUTES, load_dataset
+
+# Default grid: short < 2..20 min in half-minute steps, long > 5..60 min (pairs with short <= long)
+DEFAULT_SHORT = np.arange(2, 20.25, 0.5)
+DEFAULT_LONG = np.arange(5, 61, 1.0)
+ALL = "All"
+
+
+# One row per (category, short cutoff, long cutoff): counts, means, % difference, Cohen's d
+def sweep(df, short_cutoffs=DEFAULT_SHORT, long_cutoffs=DEFAULT_LONG, metric="like_view_ratio",
+          by="category_name"):
+    seconds = df["duration_seconds"].to_numpy(dtype="float64")
+    values = df[metric].to_numpy(dtype="float64")
+    codes, names = pd.factorize(df[by], sort=True)
+
+    # The one sort: by category, then duration
+    order = np.lexsort((seconds, codes))
+    seconds, codes = seconds[order], codes[order]
+    shift = values.mean() if len(values) else 0.0
+    x = values[order] - shift
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+    bounds = np.searchsorted(codes, np.arange(len(names) + 1))
+
+    short_grid, long_grid = np.meshgrid(np.asarray(short_cutoffs, dtype="float64"),
+                                        np.asarray(long_cutoffs, dtype="float64"), indexing="ij")
+    keep = short_grid <= long_grid
+    short_cut, long_cut = short_grid[keep], long_grid[keep]
+
+    # Per category: short = [lo, i_short) (< cutoff), long = [i_long, hi) (> cutoff)
+    n_cats, n_pairs = len(names), len(short_cut)
+    sums = np.zeros((6, n_cats + 1, n_pairs))  # n, sum, sum of squares for short then long
+    for g in range(n_cats):
+        lo, hi = bounds[g], bounds[g + 1]
+        i_short = lo + np.searchsorted(seconds[lo:hi], short_cut * 60, side="left")
+        i_long = lo + np.searchsorted(seconds[lo:hi], long_cut * 60, side="right")
+        sums[:, g + 1] = (i_short - lo, s1[i_short] - s1[lo], s2[i_short] - s2[lo],
+                          hi - i_long, s1[hi] - s1[i_long], s2[hi] - s2[i_long])
+    sums[:, 0] = sums[:, 1:].sum(axis=1)
+    n_s, t_s, q_s, n_l, t_l, q_l = sums
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_s, mean_l = t_s / n_s, t_l / n_l
+        var_s = (q_s - t_s * mean_s) / (n_s - 1)
+        var_l = (q_l - t_l * mean_l) / (n_l - 1)
+        pooled_std = np.sqrt(((n_s - 1) * var_s + (n_l - 1) * var_l) / (n_s + n_l - 2))
+        cohens_d = (mean_s - mean_l) / pooled_std
+        mean_s, mean_l = mean_s + shift, mean_l + shift
+        pct_diff = (mean_s - mean_l) / mean_l * 100
+
+    categories = [ALL] + [str(name) for name in names]
+    return pd.DataFrame({
+        "category": np.repeat(categories, n_pairs),
+        "short_max_minutes": np.tile(short_cut, n_cats + 1),
+        "long_min_minutes": np.tile(long_cut, n_cats + 1),
+        "n_short": n_s.ravel().astype("int64"),
+        "n_long": n_l.ravel().astype("int64"),
+        "short_mean": mean_s.ravel(),
+        "long_mean": mean_l.ravel(),
+        "pct_diff": pct_diff.ravel(),
+        "cohens_d": cohens_d.ravel(),
+    })
+
+
+# Heatmap-ready grid of one value: short cutoffs as rows, long cutoffs as columns
+def heatmap(table, value="pct_diff", category=ALL):
+    rows = table[table["category"] == category]
+    return rows.pivot(index="short_max_minutes", columns="long_min_minutes", values=value)
+
+
+# One heatmap per category (matplotlib loads here only)
+def plot_heatmaps(table, path, value="pct_diff"):
+    import matplotlib.pyplot as plt
+
+    categories = list(dict.fromkeys(table["category"]))
+    fig, axes = plt.subplots(1, len(categories), figsize=(4.5 * len(categories), 4), squeeze=False)
+    for ax, category in zip(axes[0], categories):
+        grid = heatmap(table, value, category)
+        image = ax.imshow(grid.to_numpy(), origin="lower", aspect="auto", cmap="RdBu_r",
+                          extent=[grid.columns.min(), grid.columns.max(), grid.index.min(), grid.index.max()])
+        ax.plot(LONG_MIN_MINUTES, SHORT_MAX_MINUTES, "k+", markersize=10)  # the study's cutoffs
+        ax.set_title(category, fontsize=11, fontweight="bold")
+        ax.set_xlabel("Long cutoff (> min)")
+        ax.set_ylabel("Short cutoff (< min)")
+        fig.colorbar(image, ax=ax, label=value)
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+# n_videos: rows of the input dataset (the table has one row per cutoff pair and category)
+def print_summary(table, metric, n_videos):
+    n_pairs = table.groupby(["short_max_minutes", "long_min_minutes"]).ngroups
+    print(f"\n{'='*60}")
+    print(f"THRESHOLD SWEEP ({metric}, {n_videos:,} videos, {n_pairs:,} cutoff pairs)")
+    print(f"{'='*60}")
+    for category, rows in table.groupby("category", sort=False):
+        rows = rows[(rows["n_short"] > 1) & (rows["n_long"] > 1)]
+        if rows.empty:
+            continue
+        study = rows[(rows["short_max_minutes"] == SHORT_MAX_MINUTES) & (rows["long_min_minutes"] == LONG_MIN_MINUTES)]
+        at_study = (f"{study['pct_diff'].iloc[0]:+.1f}% (d={study['cohens_d'].iloc[0]:+.3f})"
+                    if len(study) else "n/a")
+        print(f"\n{category}:")
+        print(f"  At <{SHORT_MAX_MINUTES} / >{LONG_MIN_MINUTES} min: {at_study}")
+        print(f"  Over {len(rows)} cutoff pairs: pct diff {rows['pct_diff'].min():+.1f}% to "
+              f"{rows['pct_diff'].max():+.1f}% (median {rows['pct_diff'].median():+.1f}%), "
+              f"short higher in {(rows['pct_diff'] > 0).mean() * 100:.0f}% of pairs")
+    grid = heatmap(table)
+    coarse = grid.loc[grid.index % 5 == 0, grid.columns % 10 == 0]
+    print(f"\n{ALL}: pct diff by short cutoff (rows) and long cutoff (columns), minutes")
+    print(coarse.round(1).to_string())
+
+
+# Synthetic rows with continuous durations; the sweep against boolean masks per cutoff pair
+def benchmark(n_rows=2_000_000, naive_pairs=20, seed=0):
+    from engagement_metrics import add_engagement_metrics, synthetic_dataset
+
+    df = add_engagement_metrics(synthetic_dataset(n_rows, seed=seed))
+    rng = np.random.default_rng(seed)
+    df["duration_seconds"] = np.clip(rng.lognormal(np.log(600), 1.0, n_rows), 61, 6 * 3600).astype("int64")
+    n_pairs = int((DEFAULT_SHORT[:, None] <= DEFAULT_LONG[None, :]).sum())
+
+    print(f"\n{'='*60}")
+    print(f"THRESHOLD SWEEP BENCHMARK ({n_rows:,} rows, {n_pairs:,} cutoff pairs x 5 category rows)")
+    print(f"{'='*60}")
+    codes = pd.factorize(df["category_name"], sort=True)[0]
+    start = time.perf_counter()
+    np.lexsort((df["duration_seconds"].to_numpy(dtype="float64"), codes))
+    sort_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = sweep(df)
+    sweep_seconds = time.perf_counter() - start
+
+    # Per pair: two masks and the group statistics, per category and overall
+    seconds = df["duration_seconds"].to_numpy()
+    values = df["like_view_ratio"].to_numpy()
+    masks = [np.ones(n_rows, bool)] + [codes == g for g in range(codes.max() + 1)]
+    sample = table[table["category"] == ALL].sample(naive_pairs, random_state=seed)
+    start = time.perf_counter()
+    worst = 0.0
+    for _, r in sample.iterrows():
+        for g, in_group in enumerate(masks):
+            a = values[in_group & (seconds < r["short_max_minutes"] * 60)]
+            b = values[in_group & (seconds > r["long_min_minutes"] * 60)]
+            pooled = np.sqrt(((len(a) - 1) * a.var(ddof=1) + (len(b) - 1) * b.var(ddof=1)) / (len(a) + len(b) - 2))
+            if g == 0:
+                worst = max(worst, abs((a.mean() - b.mean()) / pooled - r["cohens_d"]))
+    naive_seconds = (time.perf_counter() - start) / naive_pairs * n_pairs
+
+    print(f"  One sort alone:               {sort_seconds:7.2f}s")
+    print(f"  Sweep (sort + prefix sums):   {sweep_seconds:7.2f}s")
+    print(f"  Masks per cutoff pair:        {naive_seconds:7.2f}s (extrapolated from {naive_pairs} pairs), "
+          f"{naive_seconds / sweep_seconds:.0f}x slower, max |Δd| = {worst:.1e}")
+    return {"rows": n_rows, "pairs": n_pairs, "sort_seconds": sort_seconds, "sweep_seconds": sweep_seconds,
+            "naive_seconds": naive_seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Short-vs-long statistics over a grid of duration cutoffs")
+    parser.add_argument("path", nargs="?", default="youtube_length_engagement.csv")
+    parser.add_argument("--metric", default="like_view_ratio",
+                        choices=["like_view_ratio", "comment_view_ratio", "engagement_rate"])
+    parser.add_argument("--short", type=float, nargs="+", help="short cutoffs in minutes (default 2-20, step 0.5)")
+    parser.add_argument("--long", type=float, nargs="+", help="long cutoffs in minutes (default 5-60, step 1)")
+    parser.add_argument("--out", help="write the full table to this CSV")
+    parser.add_argument("--heatmap", metavar="PNG", help="render one pct-diff heatmap per category")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="time the sweep on synthetic rows")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        df = load_dataset(args.path)
+        start = time.perf_counter()
+        table = sweep(df, DEFAULT_SHORT if args.short is None else args.short,
+                      DEFAULT_LONG if args.long is None else args.long, args.metric)
+        elapsed = time.perf_counter() - start
+        print_summary(table, args.metric, len(df))
+        print(f"\n✓ Swept {len(df):,} videos into {len(table):,} result rows in {elapsed:.3f}s")
+        if args.out:
+            table.to_csv(args.out, index=False)
+            print(f"✓ Saved {args.out}")
+        if args.heatmap:
+            plot_heatmaps(table, args.heatmap)
+            print(f"✓ Saved {args.heatmap}")
@@ -0,0 +1,153 @@
+"""
+Run-wide index of every video ID seen during a collection run.
+
+Overlapping search terms ("gaming clip" / "gaming clips short") return many of
+the same videos, and each term used to send its own, often half-empty, batch
+to the 50-ID videos endpoint. The index keeps one record per video ID for the
+whole run, so:
+
+  * an ID already resolved is never sent to the videos endpoint again,
+  * IDs waiting for details are packed into full 50-ID batches across terms
+    and categories (a partial batch is only sent when its results are needed),
+  * records are stored regardless of category, so a video found while
+    searching Gaming terms is available to the Music pass.
+
+Fetched pages are decoded straight into one api_decoder.VideoColumns; a
+record dict is only built when a lookup hands a video to the caller.
+"""
+import math
+
+from api_decoder import VideoColumns
+from youtube_data import build_details_params
+
+BATCH_SIZE = 50  # videos endpoint limit
+VIDEOS_QUOTA_COST = 1  # quota units per videos call
+
+
+class VideoIndex:
+    """Maps video_id -> row of its record in `columns` (or None if the video is unavailable/unusable)."""
+
+    # api_get: youtube_data.api_get (passed in so the caller's cache and pacing are used)
+    # on_resolve: called with `columns` and the first newly fetched row (e.g. CollectionStore.add_columns)
+    def __init__(self, api_get, batch_size=BATCH_SIZE, on_resolve=None):
+        self.api_get = api_get
+        self.batch_size = batch_size
+        self.on_resolve = on_resolve
+        self.columns = VideoColumns()
+        self.rows = {}
+        self.stored = {}  # records from an earlier run, used once a search of this run returns their ID
+        self.pending = {}  # insertion-ordered set of IDs waiting for details
+
+        # Accounting: what we sent vs what the per-term path would have sent
+        self.detail_calls = 0
+        self.ids_fetched = 0
+        self.naive_calls = 0
+        self.naive_ids = 0
+
+    def __contains__(self, video_id):
+        return video_id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Record of a resolved video (category-agnostic), or None if unusable or not resolved yet
+    def record(self, video_id):
+        row = self.rows.get(video_id)
+        return None if row is None else self.columns.record(row)
+
+    # Seed with records known from an earlier run. They are not fetched again, but only join the
+    # index when a search of this run returns their ID, so selection still follows search order.
+    def preload(self, records):
+        for record in records:
+            self.stored[record["video_id"]] = record
+
+    # Queue IDs that are neither resolved nor already pending (stored IDs resolve without a fetch)
+    def add(self, video_ids):
+        self.naive_calls += math.ceil(len(video_ids) / self.batch_size)
+        self.naive_ids += len(video_ids)
+        for vid in video_ids:
+            if vid in self.rows:
+                continue
+            if vid in self.stored:
+                self.rows[vid] = len(self.columns)
+                self.columns.append_record(self.stored.pop(vid))
+            else:
+                self.pending[vid] = None
+
+    # Send pending IDs to the videos endpoint; with full_only, a partial last batch stays queued
+    def flush(self, full_only=False):
+        ids = list(self.pending)
+        cutoff = len(ids) - len(ids) % self.batch_size if full_only else len(ids)
+        for i in range(0, cutoff, self.batch_size):
+            self._fetch(ids[i:i + self.batch_size])
+
+    def _fetch(self, batch):
+        try:
+            res = self.api_get("videos", build_details_params(batch))
+        except Exception as e:
+            print(f"    Error fetching details: {e}")
+            return
+        self.detail_calls += 1
+
+        if "error" in res:
+            print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
+            return
+
+        self.ids_fetched += len(batch)
+        start = len(self.columns)
+        self.columns.append_page(res)
+        for row in range(start, len(self.columns)):
+            self.rows[self.columns.ids[row]] = row
+        if self.on_resolve:
+            self.on_resolve(self.columns, start)
+        for vid in batch:
+            # IDs the API did not return (deleted/private) or without a usable duration are unusable
+            self.rows.setdefault(vid, None)
+            self.pending.pop(vid, None)
+
+    def _for_category(self, video_ids, category_id, category_name):
+        out = []
+        for vid in video_ids:
+            row = self.rows.get(vid)
+            if row is not None and self.columns.categories[row] == category_id:
+                out.append(self.columns.record(row, category_name))
+        return out
+
+    # Drop-in for get_video_details: in-category records for video_ids.
+    # Only full batches are sent, so some IDs may still be pending afterwards;
+    # call resolve_pending() when their results are needed.
+    def lookup(self, video_ids, category_id, category_name):
+        self.add(video_ids)
+        self.flush(full_only=True)
+        return self._for_category(video_ids, category_id, category_name)
+
+    # Flush the partial batch and return the in-category records it resolved
+    def resolve_pending(self, category_id, category_name):
+        ids = list(self.pending)
+        if not ids:
+            return []
+        self.flush()
+        return self._for_category(ids, category_id, category_name)
+
+    # Every resolved record in a category (e.g. found while searching another category)
+    def by_category(self, category_id, category_name):
+        return self._for_category(self.rows, category_id, category_name)
+
+    def report(self):
+        saved_calls = self.naive_calls - self.detail_calls
+        return {
+            "unique_ids": len(self.rows) + len(self.pending),
+            "ids_requested_by_terms": self.naive_ids,
+            "ids_fetched": self.ids_fetched,
+            "detail_calls": self.detail_calls,
+            "detail_calls_per_term_path": self.naive_calls,
+            "detail_calls_saved": saved_calls,
+            "quota_units_saved": saved_calls * VIDEOS_QUOTA_COST,
+            "avg_batch_fill": self.ids_fetched / self.detail_calls if self.detail_calls else 0.0,
+        }
+
+    def summary(self):
+        r = self.report()
+        return (f"Video index: {r['unique_ids']} unique IDs, {r['detail_calls']} detail calls "
+                f"(vs {r['detail_calls_per_term_path']} per-term, {r['detail_calls_saved']} saved = "
+                f"{r['quota_units_saved']} quota units), avg batch fill {r['avg_batch_fill']:.1f}/{self.batch_size}")
@@ -0,0 +1,194 @@
+"""
+De-duplicating pool of collected videos for the serial collection loops.
+
+The phase loops used to keep every fetched record in a list (duplicates
+included) and rebuild `{v["video_id"]: v for v in ...}` several times per
+search term just to count unique videos, so the work grew quadratically with
+the collected volume. A VideoPool:
+  * inserts a record only if its video_id is new (one dict lookup)
+  * rejects videos of 60 s or less (YouTube Shorts) at insert time
+  * keeps a counter per duration bucket (1-10 min, >20 min), so target checks
+    are constant-time
+
+Records are stored column-wise: numeric fields in typed arrays, text in
+lists, plus a video_id -> row dict. That is a fraction of the memory of one
+dict per video.
+
+Usage:
+    python video_pool.py --benchmark 100000   # memory and loop time vs the list of dicts
+"""
+import argparse
+import time
+import tracemalloc
+from array import array
+
+from engagement_metrics import LONG_MIN_MINUTES, SHORT_MAX_MINUTES
+
+MIN_SECONDS = 60  # videos this short or shorter are never kept
+SHORT, LONG = "short", "long"
+_BUCKET_CODES = {None: 0, SHORT: 1, LONG: 2}
+
+
+# Duration bucket a video counts toward: SHORT (1-10 min), LONG (>20 min) or None
+def duration_bucket(seconds):
+    if MIN_SECONDS <= seconds < SHORT_MAX_MINUTES * 60:
+        return SHORT
+    if seconds > LONG_MIN_MINUTES * 60:
+        return LONG
+    return None
+
+
+class VideoPool:
+    """Insertion-ordered, de-duplicated, column-stored video records."""
+
+    __slots__ = ("_rows", "_ids", "_titles", "_categories", "_category_names", "_published",
+                 "_seconds", "_views", "_likes", "_comments", "_buckets", "_counts", "rejected")
+
+    def __init__(self, records=()):
+        self._rows = {}  # video_id -> row
+        self._ids = []
+        self._titles = []
+        self._categories = []
+        self._category_names = []
+        self._published = []
+        self._seconds = array("l")
+        self._views = array("q")
+        self._likes = array("q")
+        self._comments = array("q")
+        self._buckets = bytearray()
+        self._counts = [0, 0, 0]  # indexed by _BUCKET_CODES
+        self.rejected = 0  # too short to keep
+        self.extend(records)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._rows
+
+    # Insert if the video is new and long enough; True if it was inserted
+    def add(self, record):
+        video_id = record["video_id"]
+        if video_id in self._rows:
+            return False
+        seconds = int(record["duration_seconds"])
+        if seconds <= MIN_SECONDS:
+            self.rejected += 1
+            return False
+
+        self._rows[video_id] = len(self._ids)
+        self._ids.append(video_id)
+        self._titles.append(record["title"])
+        self._categories.append(record["category"])
+        self._category_names.append(record["category_name"])
+        self._published.append(record["published_at"])
+        self._seconds.append(seconds)
+        self._views.append(record["views"])
+        self._likes.append(record["likes"])
+        self._comments.append(record["comments"])
+        code = _BUCKET_CODES[duration_bucket(seconds)]
+        self._buckets.append(code)
+        self._counts[code] += 1
+        return True
+
+    # Insert many; returns how many were new
+    def extend(self, records):
+        return sum(self.add(r) for r in records)
+
+    # How many of `records` add() would insert (costs the batch, not the pool)
+    def count_new(self, records):
+        return len({r["video_id"] for r in records
+                    if r["video_id"] not in self._rows and r["duration_seconds"] > MIN_SECONDS})
+
+    # Unique videos kept, overall or in one bucket
+    def count(self, bucket=None):
+        return len(self._ids) if bucket is None else self._counts[_BUCKET_CODES[bucket]]
+
+    def _record(self, row):
+        seconds = self._seconds[row]
+        # Same keys, in the same order, as youtube_data.record_from_item
+        return {
+            "video_id": self._ids[row],
+            "title": self._titles[row],
+            "category": self._categories[row],
+            "category_name": self._category_names[row],
+            "duration_seconds": seconds,
+            "duration_minutes": seconds / 60,
+            "views": self._views[row],
+            "likes": self._likes[row],
+            "comments": self._comments[row],
+            "published_at": self._published[row],
+        }
+
+    # Records in insertion order, optionally only one bucket and at most `limit` of them
+    def records(self, bucket=None, limit=None):
+        code = None if bucket is None else _BUCKET_CODES[bucket]
+        out = []
+        for row in range(len(self._ids)):
+            if limit is not None and len(out) >= limit:
+                break
+            if code is None or self._buckets[row] == code:
+                out.append(self._record(row))
+        return out
+
+
+# Records as record_from_item builds them; every `duplicate_every`-th one repeats an earlier video
+def _synthetic_records(n, duplicate_every=3):
+    records = []
+    for i in range(n):
+        vid = i // 2 if i % duplicate_every == 0 else i
+        seconds = 61 + (vid * 7919) % 539
+        records.append({
+            "video_id": f"v{vid:010d}", "title": f"Synthetic video {vid}", "category": "20",
+            "category_name": "Gaming", "duration_seconds": seconds, "duration_minutes": seconds / 60,
+            "views": 1000 + vid, "likes": 10 + vid % 500, "comments": vid % 50,
+            "published_at": "2025-01-01T00:00:00Z",
+        })
+    return records
+
+
+def benchmark(n=100_000, batch=50):
+    print(f"\n{'='*60}")
+    print(f"VIDEO POOL BENCHMARK ({n:,} inserts, {batch} per term)")
+    print(f"{'='*60}")
+    records = _synthetic_records(n)
+
+    # Memory held by the collected videos (the records themselves are shared input)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [dict(r) for r in records]
+    list_mb = (tracemalloc.get_traced_memory()[0] - before) / 1e6
+    del kept
+    before = tracemalloc.get_traced_memory()[0]
+    pool = VideoPool(records)
+    pool_mb = (tracemalloc.get_traced_memory()[0] - before) / 1e6
+    tracemalloc.stop()
+
+    # Loop cost: one unique count before and one after each term, as in the Phase 1 loop
+    start = time.perf_counter()
+    collected = []
+    for i in range(0, n, batch):
+        len({v["video_id"]: v for v in collected})
+        collected.extend(records[i:i + batch])
+        len({v["video_id"]: v for v in collected})
+    list_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pool = VideoPool()
+    for i in range(0, n, batch):
+        pool.count(SHORT)
+        pool.extend(records[i:i + batch])
+        pool.count(SHORT)
+    pool_seconds = time.perf_counter() - start
+
+    print(f"  List of dicts + rebuilds: {list_seconds:7.2f}s  {list_mb:6.1f} MB")
+    print(f"  VideoPool:                {pool_seconds:7.2f}s  {pool_mb:6.1f} MB "
+          f"({len(pool):,} unique videos kept)")
+    return {"list_seconds": list_seconds, "list_mb": list_mb, "pool_seconds": pool_seconds, "pool_mb": pool_mb}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="De-duplicating video pool")
+    parser.add_argument("--benchmark", type=int, metavar="N", default=100_000)
+    args = parser.parse_args()
+    benchmark(args.benchmark)
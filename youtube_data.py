@@ -3,13 +3,44 @@ import pandas as pd
 import time
 import os
 from dotenv import load_dotenv
-import isodate
 
-# Load API key from .env
+import instrumentation
+from api_decoder import DETAILS_FIELDS, VideoColumns, duration_seconds, loads
+from engagement_metrics import add_engagement_metrics
+from video_pool import LONG, SHORT, VideoPool
+
+# Load API key from .env (checked when main() runs, so the module imports without one)
 load_dotenv()
 API_KEY = os.getenv("YOUTUBE_API_KEY")
-if not API_KEY:
-    raise ValueError("API key not found. Make sure it's in your .env file.")
+# Several keys (comma-separated) to spread collection over more than one key's daily quota
+API_KEYS = [k.strip() for k in os.getenv("YOUTUBE_API_KEYS", "").split(",") if k.strip()] or (
+    [API_KEY] if API_KEY else [])
+
+# Endpoint root and pacing can be overridden (e.g. to point at a local stub server)
+API_BASE = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3")
+REQUEST_DELAY = float(os.getenv("YOUTUBE_REQUEST_DELAY", "0.3"))
+# Retries of requests that fail server-side (HTTP 5xx, dropped connections), with exponential backoff
+MAX_RETRIES = int(os.getenv("YOUTUBE_MAX_RETRIES", "2"))
+RETRY_BACKOFF = 0.5
+
+# Shared session so connections are kept alive between calls
+SESSION = requests.Session()
+
+# Optional persistent response cache (see api_cache.py); set up by configure_cache()
+CACHE = None
+# Optional KeyPool (key_pool.py): requests rotate over several API keys; set up by configure_keys()
+KEYS = None
+# Offline: serve only from the cache (e.g. replaying recorded fixtures), never the network
+OFFLINE = False
+# Optional LiveAggregator (live_aggregation.py) fed the selected records during collection; set up by main()
+LIVE = None
+_last_request = 0.0
+
+# Quota units per call (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {"search": 100, "videos": 1}
+# Calls made by the collection logic (cached or not) and quota actually spent on the network
+API_CALLS = {"search": 0, "videos": 0}
+QUOTA_USED = {"search": 0, "videos": 0}
 
 # Categories with duration-specific search terms - OPTIMIZED FOR SHORT VIDEO DOMINANCE
 CATEGORIES = {
@@ -28,16 +59,6 @@ CATEGORIES = {
         "short_terms": ["makeup tips","hair tips","outfit ideas","style hacks","beauty hacks","quick makeup","quick hair","easy outfit","fashion hack","simple makeup","nail ideas","easy hairstyle","skincare tips","quick beauty","simple outfit","hair hack","makeup idea","style idea","closet tips","basic makeup"],
         "long_terms": ["full makeup tutorial", "hair transformation", "get ready with me", "fashion lookbook", "full beauty routine", "styling guide", "makeup collection", "wardrobe tour"]
     },
-    # "22": {
-    #     "name": "People & Blogs",
-    #     "short_terms": ["vlog clip", "daily vlog", "story time", "update", "quick vlog", "life update", "behind the scenes"],
-    #     "long_terms": ["full vlog", "day in my life", "life story", "long vlog", "weekly vlog", "detailed story"]
-    # },
-    # "24": {
-    #     "name": "Entertainment",
-    #     "short_terms": ["comedy sketch", "funny video", "comedy clip", "funny moments", "meme", "reaction", "prank"],
-    #     "long_terms": ["movie review", "podcast", "talk show", "comedy special", "full episode", "interview"]
-    # },
     "28": {
         "name": "Science & Technology",
         "short_terms": ["tech news", "gadget review", "tech tips", "new technology", "tech update", "device review", "tech explained"],
@@ -45,45 +66,170 @@ CATEGORIES = {
     }
 }
 
-print("Loaded API key:", API_KEY[:5] + "*****")
+# Left out of the default run, which has to fit in one key's daily quota; the sharded
+# engine adds them with --extra-categories (see sharded_collector.py)
+EXTRA_CATEGORIES = {
+    "22": {
+        "name": "People & Blogs",
+        "short_terms": ["vlog clip", "daily vlog", "story time", "update", "quick vlog", "life update", "behind the scenes"],
+        "long_terms": ["full vlog", "day in my life", "life story", "long vlog", "weekly vlog", "detailed story"]
+    },
+    "24": {
+        "name": "Entertainment",
+        "short_terms": ["comedy sketch", "funny video", "comedy clip", "funny moments", "meme", "reaction", "prank"],
+        "long_terms": ["movie review", "podcast", "talk show", "comedy special", "full episode", "interview"]
+    }
+}
 
-# Parse ISO 8601 duration to seconds
+# Parse ISO 8601 duration to seconds (None if unparsable; memoized fast path, see api_decoder.py)
 def iso_to_seconds(duration):
-    try:
-        return int(isodate.parse_duration(duration).total_seconds())
-    except:
-        return None
+    return duration_seconds(duration)
+
+# Open (or disable, with path=None) the on-disk response cache
+def configure_cache(path=".api_cache.sqlite", **cache_options):
+    global CACHE
+    if CACHE is not None:
+        CACHE.close()
+    if path is None:
+        CACHE = None
+    else:
+        from api_cache import ResponseCache
+        CACHE = ResponseCache(path, **cache_options)
+    return CACHE
+
+# Rotate requests over a KeyPool of these keys (None turns rotation off); returns the pool
+def configure_keys(keys, daily_quota=None):
+    global KEYS
+    if keys is None:
+        KEYS = None
+    else:
+        from key_pool import DAILY_QUOTA, KeyPool
+        KEYS = KeyPool(keys, daily_quota or DAILY_QUOTA)
+    return KEYS
+
+# Hand records selected beyond the first `fed` to the live aggregator; returns how many are fed.
+# `selected` is called only when live aggregation is on.
+def feed_live(selected, fed):
+    if LIVE is None:
+        return fed
+    records = selected()
+    LIVE.put(records[fed:])
+    return max(fed, len(records))
+
+# GET one endpoint, served from the cache when possible; network calls are paced by REQUEST_DELAY
+def api_get(endpoint, params):
+    global _last_request
+    run = instrumentation.RUN
+    API_CALLS[endpoint] = API_CALLS.get(endpoint, 0) + 1
+    if CACHE is not None:
+        cached = CACHE.get(endpoint, params)
+        if cached is not None:
+            if run is not None:
+                run.cache_hit(endpoint)
+            return cached
+    if OFFLINE:
+        return {"error": {"message": f"{endpoint} request not in cache (offline)"}}
+
+    cost = QUOTA_COSTS.get(endpoint, 1)
+    attempt = 0
+    while True:
+        if KEYS is not None:
+            key = KEYS.acquire(cost)
+            if key is None:
+                return {"error": {"code": 403, "message": "Every API key is out of quota",
+                                  "errors": [{"reason": "quotaExceeded"}]}}
+            params = {**params, "key": key}
+        QUOTA_USED[endpoint] = QUOTA_USED.get(endpoint, 0) + cost
+        wait = REQUEST_DELAY - (time.monotonic() - _last_request)
+        if wait > 0:
+            time.sleep(wait)
+        start = time.perf_counter()
+        try:
+            response = SESSION.get(f"{API_BASE}/{endpoint}", params=params)
+        except requests.ConnectionError as e:
+            _last_request = time.monotonic()
+            if run is not None:
+                # Never answered: no quota to report
+                run.request(endpoint, time.perf_counter() - start, 0, 0, type(e).__name__)
+            if attempt == MAX_RETRIES:
+                raise
+        else:
+            _last_request = time.monotonic()
+            res = loads(response.content)
+            reason = instrumentation.error_reason(res) if "error" in res else None
+            if run is not None:
+                run.request(endpoint, time.perf_counter() - start, len(response.content),
+                            0 if reason == "quotaExceeded" else cost, reason)
+            if reason == "quotaExceeded":
+                # The refused call cost nothing
+                QUOTA_USED[endpoint] -= cost
+                if KEYS is not None:
+                    # This key is spent: send the same request with the next one
+                    KEYS.retire(key, refund=cost)
+                    continue
+            # Only server-side failures are worth retrying (not quota or bad requests)
+            if response.status_code < 500 or attempt == MAX_RETRIES:
+                break
+        if run is not None:
+            run.retry(endpoint)
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        attempt += 1
+
+    if CACHE is not None:
+        CACHE.put(endpoint, params, res)
+    return res
+
+# Logical quota cost of the calls made so far (what they cost live, cached or not)
+def quota_spent():
+    return sum(QUOTA_COSTS.get(e, 1) * n for e, n in API_CALLS.items())
+
+# Build query params for one search page
+def build_search_params(search_query, video_duration, max_results, page_token=None):
+    params = {
+        "part": "id",
+        "type": "video",
+        "q": search_query,
+        "maxResults": max_results,
+        "order": "viewCount",
+        "publishedAfter": "2024-01-01T00:00:00Z",
+        "key": API_KEY
+    }
+
+    # Only add videoDuration if not 'any'
+    if video_duration != 'any':
+        params["videoDuration"] = video_duration
+
+    if page_token:
+        params["pageToken"] = page_token
+
+    return params
+
+# Build query params for one batch (max 50 IDs) of video details
+def build_details_params(batch):
+    return {
+        "part": "snippet,statistics,contentDetails",
+        "id": ",".join(batch),
+        "fields": DETAILS_FIELDS,  # partial response: only what record_from_item reads
+        "key": API_KEY
+    }
 
 # Fetch video IDs using search with duration filter
-def get_video_ids_by_search(search_query, video_duration, max_videos=30):
+def get_video_ids_by_search(search_query, video_duration, max_videos=30, resume=None, on_page=None):
     """
     Fetch videos using search query with duration filter
     video_duration: 'short' (<4min), 'medium' (4-20min), 'long' (>20min), 'any' (all)
+    resume: saved {"ids", "next_page"} state to continue a search that was interrupted
+    on_page: called as on_page(ids_so_far, next_page, done) after every successful page
     """
-    video_ids = []
-    next_page = None
+    video_ids = list(resume["ids"]) if resume else []
+    next_page = resume["next_page"] if resume else None
 
     while len(video_ids) < max_videos:
-        url = "https://www.googleapis.com/youtube/v3/search"
-        params = {
-            "part": "id",
-            "type": "video",
-            "q": search_query,
-            "maxResults": min(50, max_videos - len(video_ids)),
-            "order": "viewCount",
-            "publishedAfter": "2024-01-01T00:00:00Z",
-            "key": API_KEY
-        }
-        
-        # Only add videoDuration if not 'any'
-        if video_duration != 'any':
-            params["videoDuration"] = video_duration
-        
-        if next_page:
-            params["pageToken"] = next_page
+        params = build_search_params(search_query, video_duration,
+                                     min(50, max_videos - len(video_ids)), next_page)
 
         try:
-            res = requests.get(url, params=params).json()
+            res = api_get("search", params)
             
             if "error" in res:
                 print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
@@ -91,6 +237,8 @@ def get_video_ids_by_search(search_query, video_duration, max_videos=30):
                 
             items = res.get("items", [])
             if not items:
+                if on_page:
+                    on_page(video_ids, None, True)
                 break
 
             for item in items:
@@ -98,197 +246,343 @@ def get_video_ids_by_search(search_query, video_duration, max_videos=30):
                     video_ids.append(item["id"]["videoId"])
 
             next_page = res.get("nextPageToken")
-            if not next_page or len(video_ids) >= max_videos:
+            done = not next_page or len(video_ids) >= max_videos
+            if on_page:
+                on_page(video_ids, next_page, done)
+            if done:
                 break
-
-            time.sleep(0.3)
         except Exception as e:
             print(f"    Error fetching videos: {e}")
             break
 
-    return list(set(video_ids))[:max_videos]  # Remove duplicates
+    return list(dict.fromkeys(video_ids))[:max_videos]  # Remove duplicates (keeps order, so cache keys are stable)
+
+# Search with checkpointing: with a CollectionStore (collection_store.py), finished terms are
+# answered from the store and interrupted ones continue from their last saved page
+def search_term_ids(search_term, video_duration, max_videos, store=None, cat_id=None, phase=None):
+    if store is None:
+        return get_video_ids_by_search(search_term, video_duration, max_videos)
+
+    state = store.term_state(cat_id, phase, search_term)
+    if state and state["done"]:
+        return list(dict.fromkeys(state["ids"]))[:max_videos]
+    checkpoint = lambda ids, next_page, done: store.save_term_state(cat_id, phase, search_term, ids, next_page, done)
+    return get_video_ids_by_search(search_term, video_duration, max_videos, resume=state, on_page=checkpoint)
+
+# Turn one item of a videos response into a record, whatever its category (None if unusable)
+def record_from_item(item, category_name=None):
+    snippet = item.get("snippet", {})
+    stats = item.get("statistics", {})
+    content = item.get("contentDetails", {})
+
+    duration_sec = iso_to_seconds(content.get("duration", "PT0S"))
+    if duration_sec is None or duration_sec == 0:
+        return None
+
+    return {
+        "video_id": item.get("id"),
+        "title": snippet.get("title"),
+        "category": snippet.get("categoryId"),
+        "category_name": category_name,
+        "duration_seconds": duration_sec,
+        "duration_minutes": duration_sec / 60,
+        "views": int(stats.get("viewCount", 0)),
+        "likes": int(stats.get("likeCount", 0)),
+        "comments": int(stats.get("commentCount", 0)),
+        "published_at": snippet.get("publishedAt")
+    }
+
+# Turn one item of a videos response into a record (None if it should be skipped)
+def parse_video_item(item, target_category_id, category_name):
+    # Only include if it matches our target category
+    if item.get("snippet", {}).get("categoryId") != target_category_id:
+        return None
+
+    return record_from_item(item, category_name)
 
 # Fetch full video details
 def get_video_details(video_ids, target_category_id, category_name):
-    details = []
+    return get_video_columns(video_ids, target_category_id).records(category_name)
+
+# Fetch video details into column buffers (VideoColumns), page by page, only target_category_id
+def get_video_columns(video_ids, target_category_id, columns=None):
+    columns = VideoColumns() if columns is None else columns
 
     for i in range(0, len(video_ids), 50):
         batch = video_ids[i:i+50]
-        url = "https://www.googleapis.com/youtube/v3/videos"
-        params = {
-            "part": "snippet,statistics,contentDetails",
-            "id": ",".join(batch),
-            "key": API_KEY
-        }
+        params = build_details_params(batch)
 
         try:
-            res = requests.get(url, params=params).json()
+            res = api_get("videos", params)
             
             if "error" in res:
                 print(f"    API Error: {res['error'].get('message', 'Unknown error')}")
                 continue
                 
-            for item in res.get("items", []):
-                snippet = item.get("snippet", {})
-                cat_id = snippet.get("categoryId")
-                
-                # Only include if it matches our target category
-                if cat_id != target_category_id:
-                    continue
-                
-                vid = item.get("id")
-                stats = item.get("statistics", {})
-                content = item.get("contentDetails", {})
-
-                duration_sec = iso_to_seconds(content.get("duration", "PT0S"))
-                if duration_sec is None or duration_sec == 0:
-                    continue
-
-                details.append({
-                    "video_id": vid,
-                    "title": snippet.get("title"),
-                    "category": cat_id,
-                    "category_name": category_name,
-                    "duration_seconds": duration_sec,
-                    "duration_minutes": duration_sec / 60,
-                    "views": int(stats.get("viewCount", 0)),
-                    "likes": int(stats.get("likeCount", 0)),
-                    "comments": int(stats.get("commentCount", 0)),
-                    "published_at": snippet.get("publishedAt")
-                })
-
-            time.sleep(0.3)
+            columns.append_page(res, target_category_id)
         except Exception as e:
             print(f"    Error fetching details: {e}")
             continue
 
-    return details
+    return columns
 
-# Main execution
-def main():
+# Final per-category selection: dedupe, keep valid durations, cap at target
+def is_valid_short(v):
+    # CRITICAL: Filter to correct duration range (1-10 min) AND remove shorts (<60s)
+    return 1 <= v["duration_minutes"] < 10 and v["duration_seconds"] > 60
+
+def is_valid_long(v):
+    # CRITICAL: Filter to correct duration range (>20 min) AND remove shorts (<60s)
+    return v["duration_minutes"] > 20 and v["duration_seconds"] > 60
+
+def select_videos(videos, is_valid, target_per_category):
+    # Remove duplicates and filter by duration BEFORE limiting
+    unique_videos = {v["video_id"]: v for v in videos}.values()
+    valid = [v for v in unique_videos if is_valid(v)]
+
+    # Take only the target number
+    return list(valid)[:target_per_category]
+
+# PHASE 1: Collect SHORT videos for every category
+# index: optional run-wide VideoIndex (video_index.py) so details are never fetched twice
+# store: optional CollectionStore so search progress is checkpointed and resumable
+def collect_short_videos(categories, target_per_category=30, max_attempts=10, index=None, store=None):
     all_short_videos = []
-    all_long_videos = []
 
-    # PHASE 1: Collect SHORT videos - exactly 30 per category (buffer for filtering)
-    print(f"\n{'='*60}")
-    print("PHASE 1: COLLECTING SHORT VIDEOS (<10 min)")
-    print(f"Target: Exactly 30 short videos per category")
-    print(f"{'='*60}")
-    
-    target_per_category = 30
-    
-    for cat_id, cat_info in CATEGORIES.items():
+    for cat_id, cat_info in categories.items():
         cat_name = cat_info["name"]
         short_terms = cat_info["short_terms"]
         
         print(f"\n{cat_name}:")
-        category_short = []
+        pool = VideoPool()
+        if index is not None:
+            # Start from videos of this category already found by other searches
+            pool.extend(index.by_category(cat_id, cat_name))
         
-        # Keep looping through search terms until we get exactly 25
+        # Keep looping through search terms until we reach the target
         attempts = 0
-        max_attempts = 10  # Prevent infinite loops
+        fed = 0
         
-        while len({v["video_id"]: v for v in category_short}.values()) < target_per_category and attempts < max_attempts:
+        while pool.count(SHORT) < target_per_category and attempts < max_attempts:
             for search_term in short_terms:
-                current_count = len({v["video_id"]: v for v in category_short}.values())
+                current_count = pool.count(SHORT)
                 if current_count >= target_per_category:
                     break
                     
                 print(f"  '{search_term}'... (currently {current_count}/{target_per_category})", end=" ")
                 # Increase fetch amount to get more videos
-                video_ids = get_video_ids_by_search(search_term, "any", max_videos=80)
+                video_ids = search_term_ids(search_term, "any", 80, store, cat_id, "short")
                 
                 if video_ids:
-                    video_details = get_video_details(video_ids, cat_id, cat_name)
+                    if index is not None:
+                        video_details = index.lookup(video_ids, cat_id, cat_name)
+                    else:
+                        video_details = get_video_details(video_ids, cat_id, cat_name)
                     # Filter to short videos (1-10 min)
                     short_videos = [v for v in video_details if 1 <= v["duration_minutes"] < 10]
-                    category_short.extend(short_videos)
-                    new_count = len({v["video_id"]: v for v in category_short}.values())
+                    if index is not None and current_count + pool.count_new(short_videos) < target_per_category:
+                        # Still short of target: send the partial batch rather than another search
+                        pending = index.resolve_pending(cat_id, cat_name)
+                        video_details = video_details + pending
+                        short_videos += [v for v in pending if 1 <= v["duration_minutes"] < 10]
+                    pool.extend(short_videos)
+                    new_count = pool.count(SHORT)
+                    instrumentation.term_yield("short", cat_name, search_term, len(video_ids), len(video_details),
+                                               len(short_videos), new_count - current_count)
                     print(f"✓ {new_count - current_count} new")
+                    fed = feed_live(lambda: pool.records(SHORT, target_per_category), fed)
                 else:
+                    instrumentation.term_yield("short", cat_name, search_term, 0, 0, 0, 0)
                     print("✗ None")
                     
-                if len({v["video_id"]: v for v in category_short}.values()) >= target_per_category:
+                if pool.count(SHORT) >= target_per_category:
                     break
             
             attempts += 1
         
-        # Remove duplicates and filter by duration BEFORE limiting
-        unique_videos = {v["video_id"]: v for v in category_short}.values()
-        # CRITICAL: Filter to correct duration range (1-10 min) AND remove shorts (<60s)
-        valid_short = [v for v in unique_videos if 1 <= v["duration_minutes"] < 10 and v["duration_seconds"] > 60]
-        
-        # Take only the target number
-        unique_short = list(valid_short)[:target_per_category]
+        unique_short = pool.records(SHORT, target_per_category)
         all_short_videos.extend(unique_short)
+        feed_live(lambda: unique_short, fed)
         
         if len(unique_short) < target_per_category:
             print(f"  ⚠️  Warning: Only got {len(unique_short)}/{target_per_category} VALID short videos for {cat_name}")
         else:
             print(f"  ✅ Total short for {cat_name}: {len(unique_short)}")
-    
-    print(f"\n{'='*60}")
-    print(f"PHASE 1 COMPLETE: {len(all_short_videos)} SHORT VIDEOS COLLECTED")
-    print(f"{'='*60}")
-    
-    # PHASE 2: Now collect LONG videos evenly across categories
-    print(f"\n{'='*60}")
-    print("PHASE 2: COLLECTING LONG VIDEOS (>20 min)")
-    print(f"Target: 30 long videos per category")
-    print(f"{'='*60}")
-    
-    target_per_category = 30
-    
-    for cat_id, cat_info in CATEGORIES.items():
+
+    return all_short_videos
+
+# PHASE 2: Collect LONG videos evenly across categories
+def collect_long_videos(categories, target_per_category=30, index=None, store=None):
+    all_long_videos = []
+
+    for cat_id, cat_info in categories.items():
         cat_name = cat_info["name"]
         long_terms = cat_info["long_terms"]
         
         print(f"\n{cat_name}:")
-        category_long = []
+        pool = VideoPool()
+        if index is not None:
+            # Start from videos of this category already found by other searches
+            pool.extend(index.by_category(cat_id, cat_name))
+        fed = 0
         
         for search_term in long_terms:
             # Check if we have enough for this category
-            current_count = len({v["video_id"]: v for v in category_long}.values())
+            current_count = pool.count(LONG)
             if current_count >= target_per_category:
                 print(f"  (Already have {target_per_category} for this category)")
                 break
                 
             print(f"  '{search_term}'...", end=" ")
             
-            video_ids = get_video_ids_by_search(search_term, "long", max_videos=30)
+            video_ids = search_term_ids(search_term, "long", 30, store, cat_id, "long")
             
             if video_ids:
-                video_details = get_video_details(video_ids, cat_id, cat_name)
+                if index is not None:
+                    video_details = index.lookup(video_ids, cat_id, cat_name)
+                else:
+                    video_details = get_video_details(video_ids, cat_id, cat_name)
                 # Filter to long videos
                 long_videos = [v for v in video_details if v["duration_minutes"] > 20]
-                category_long.extend(long_videos)
+                if index is not None and current_count + pool.count_new(long_videos) < target_per_category:
+                    # Still short of target: send the partial batch rather than another search
+                    pending = index.resolve_pending(cat_id, cat_name)
+                    video_details = video_details + pending
+                    long_videos += [v for v in pending if v["duration_minutes"] > 20]
+                pool.extend(long_videos)
+                instrumentation.term_yield("long", cat_name, search_term, len(video_ids), len(video_details),
+                                           len(long_videos), pool.count(LONG) - current_count)
                 print(f"✓ {len(long_videos)} long")
+                fed = feed_live(lambda: pool.records(LONG, target_per_category), fed)
             else:
+                instrumentation.term_yield("long", cat_name, search_term, 0, 0, 0, 0)
                 print("✗ None")
         
-        # Remove duplicates and filter by duration BEFORE limiting
-        unique_videos = {v["video_id"]: v for v in category_long}.values()
-        # CRITICAL: Filter to correct duration range (>20 min) AND remove shorts (<60s)
-        valid_long = [v for v in unique_videos if v["duration_minutes"] > 20 and v["duration_seconds"] > 60]
-        
-        # Take only the target number
-        unique_long = list(valid_long)[:target_per_category]
+        unique_long = pool.records(LONG, target_per_category)
         all_long_videos.extend(unique_long)
+        feed_live(lambda: unique_long, fed)
         
         if len(unique_long) < target_per_category:
             print(f"  ⚠️  Warning: Only got {len(unique_long)}/{target_per_category} VALID long videos for {cat_name}")
         else:
             print(f"  ✅ Total long for {cat_name}: {len(unique_long)}")
+
+    return all_long_videos
+
+# Main execution
+# engine: "serial" (default), "async" (see async_collector.py) or "sharded" (worker processes and
+# several API keys, see sharded_collector.py); extra options go to the async/sharded engine
+# cache_path: on-disk response cache (None disables it); refresh_stats: refetch only stale statistics
+# quota_budget: order terms by observed yield and stay within this many units (search_scheduler.py)
+# store_path: resumable collection store (None disables it); records older than max_age_hours are refetched
+# metrics_report / prometheus_path: turn on instrumentation.py and write a JSON report / Prometheus textfile
+# extra_categories: also collect EXTRA_CATEGORIES; key_quota: daily units per key (with several keys)
+# live_interval: report running statistics of the selected videos every this many seconds (live_aggregation.py)
+def main(engine="serial", cache_path=".api_cache.sqlite", refresh_stats=False,
+         quota_budget=None, term_stats_path=".term_yield.json",
+         store_path=".collection.sqlite", max_age_hours=24,
+         metrics_report=None, prometheus_path=None, extra_categories=False, key_quota=None,
+         live_interval=None, **engine_options):
+    global LIVE
+    if not API_KEYS:
+        raise ValueError("API key not found. Make sure it's in your .env file.")
+    if len(API_KEYS) == 1:
+        print("Loaded API key:", API_KEYS[0][:5] + "*****")
+    else:
+        print(f"Loaded {len(API_KEYS)} API keys:", ", ".join(k[:5] + "*****" for k in API_KEYS))
+    run = instrumentation.enable() if metrics_report or prometheus_path else None
+    # Sharded workers open their own cache connections (an SQLite handle must not cross a fork)
+    configure_cache(cache_path if engine != "sharded" else None, refresh_stale_stats=refresh_stats)
+    rotate_keys = engine != "async" and (len(API_KEYS) > 1 or engine == "sharded")
+    configure_keys(API_KEYS if rotate_keys else None, key_quota)
+    categories = {**CATEGORIES, **EXTRA_CATEGORIES} if extra_categories else CATEGORIES
+
+    store = None
+    if store_path is not None and engine == "serial":
+        from collection_store import CollectionStore
+        store = CollectionStore(store_path, max_age=max_age_hours * 3600)
+        if store.resumed:
+            print(f"Resuming unfinished run {store.run_id} from {store_path}")
+
+    if engine == "async":
+        from async_collector import AsyncCollector
+        collector = AsyncCollector(base_url=API_BASE, cache=CACHE, **engine_options)
+        collect_short, collect_long = collector.collect_short_videos, collector.collect_long_videos
+    elif engine == "sharded":
+        from sharded_collector import ShardedCollector
+        collector = ShardedCollector(keys=KEYS, cache_path=cache_path, refresh_stats=refresh_stats,
+                                     **engine_options)
+        collect_short, collect_long = collector.collect_short_videos, collector.collect_long_videos
+    else:
+        from video_index import VideoIndex
+        index = VideoIndex(api_get, on_resolve=store.add_columns if store else None)
+        if store is not None:
+            # Reuse records fetched recently; only new or stale IDs go to the videos endpoint
+            index.preload(store.latest_records(category_names={cid: c["name"] for cid, c in categories.items()}))
+        collect_short = lambda categories, target: collect_short_videos(categories, target, index=index, store=store)
+        collect_long = lambda categories, target: collect_long_videos(categories, target, index=index, store=store)
+
+    if live_interval is not None:
+        from live_aggregation import LiveAggregator
+        LIVE = LiveAggregator(interval=live_interval)
+
+    scheduler = None
+    if quota_budget is not None and engine == "serial":
+        from search_scheduler import SearchScheduler, collect_scheduled
+        scheduler = SearchScheduler(quota_budget, term_stats_path)
+        collect_short = lambda categories, target: collect_scheduled(
+            categories, "short", target, scheduler, index, slots_left=2 * len(categories), store=store)
+        collect_long = lambda categories, target: collect_scheduled(
+            categories, "long", target, scheduler, index, slots_left=len(categories), store=store)
+
+    # PHASE 1: Collect SHORT videos - exactly 30 per category (buffer for filtering)
+    print(f"\n{'='*60}")
+    print("PHASE 1: COLLECTING SHORT VIDEOS (<10 min)")
+    print(f"Target: Exactly 30 short videos per category")
+    print(f"{'='*60}")
+    
+    target_per_category = 30
+    
+    with instrumentation.span("phase1_short"):
+        all_short_videos = collect_short(categories, target_per_category)
+    if engine != "serial":
+        # The async and sharded engines return a whole phase at once
+        feed_live(lambda: all_short_videos, 0)
+    
+    print(f"\n{'='*60}")
+    print(f"PHASE 1 COMPLETE: {len(all_short_videos)} SHORT VIDEOS COLLECTED")
+    print(f"{'='*60}")
+    
+    # PHASE 2: Now collect LONG videos evenly across categories
+    print(f"\n{'='*60}")
+    print("PHASE 2: COLLECTING LONG VIDEOS (>20 min)")
+    print(f"Target: 30 long videos per category")
+    print(f"{'='*60}")
+    
+    target_per_category = 30
+    
+    with instrumentation.span("phase2_long"):
+        all_long_videos = collect_long(categories, target_per_category)
+    if engine == "sharded":
+        collector.close()
+    if engine != "serial":
+        feed_live(lambda: all_long_videos, 0)
     
     print(f"\n{'='*60}")
     print(f"PHASE 2 COMPLETE: {len(all_long_videos)} LONG VIDEOS COLLECTED")
     print(f"{'='*60}")
     
+    if LIVE is not None:
+        LIVE.close()
+        LIVE = None
+
     # Combine all data
     all_data = list(all_short_videos) + list(all_long_videos)
 
     if not all_data:
         print("\n❌ No data collected. Exiting.")
+        if run is not None:
+            _save_run_metrics(run, metrics_report, prometheus_path)
         return
 
     # Create DataFrame
@@ -304,20 +598,8 @@ def main():
     print(f"\nCategory distribution:")
     print(df["category_name"].value_counts().to_string())
     
-    # Calculate engagement metrics
-    df["like_view_ratio"] = df.apply(
-        lambda row: row["likes"] / row["views"] if row["views"] > 0 else 0,
-        axis=1
-    )
-    df["comment_view_ratio"] = df.apply(
-        lambda row: row["comments"] / row["views"] if row["views"] > 0 else 0,
-        axis=1
-    )
-    # Combined engagement: (likes + comments) / views
-    df["engagement_rate"] = df.apply(
-        lambda row: (row["likes"] + row["comments"]) / row["views"] if row["views"] > 0 else 0,
-        axis=1
-    )
+    # Calculate engagement metrics (like, comment and combined rate per view)
+    add_engagement_metrics(df)
     
     # THEN split by duration
     short_df = df[df["duration_minutes"] < 10]
@@ -338,10 +620,47 @@ def main():
     print(f"    Comment rate: {long_df['comment_view_ratio'].mean():.4f}")
     print(f"    Total engagement: {long_df['engagement_rate'].mean():.4f}")
 
-    # Save CSV
-    df.to_csv("youtube_length_engagement.csv", index=False)
-    print(f"\n✓ Saved dataset as youtube_length_engagement.csv")
-    print(f"✓ Total rows in dataset: {df.shape[0]}")
+    with instrumentation.span("save"):
+        # Save CSV
+        df.to_csv("youtube_length_engagement.csv", index=False)
+        print(f"\n✓ Saved dataset as youtube_length_engagement.csv")
+        print(f"✓ Total rows in dataset: {df.shape[0]}")
+
+        # Partitioned Parquet copy for fast, column-selective analysis loads
+        try:
+            from columnar_dataset import DATASET_DIR, write_dataset
+            write_dataset(df, DATASET_DIR, source="youtube_length_engagement.csv")
+            print(f"✓ Saved partitioned dataset to {DATASET_DIR}/")
+        except ImportError:
+            print("  (pyarrow not installed: skipped the partitioned Parquet dataset)")
+    if CACHE is not None:
+        print(f"✓ {CACHE.summary()}")
+    if engine == "serial":
+        print(f"✓ {index.summary()}")
+    if KEYS is not None:
+        print(f"✓ {KEYS.summary()}")
+    if scheduler is not None:
+        scheduler.save()
+        print(f"✓ {scheduler.summary(len(df))}")
+    if store is not None:
+        store.finish_run()
+        print(f"✓ {store.summary()}")
+    if run is not None:
+        _save_run_metrics(run, metrics_report, prometheus_path)
+
+    return df
+
+def _save_run_metrics(run, metrics_report, prometheus_path):
+    run.save(metrics_report, prometheus_path)
+    print(f"✓ {run.summary()}")
+    for path in (metrics_report, prometheus_path):
+        if path:
+            print(f"✓ Saved run metrics to {path}")
+    instrumentation.disable()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Same flags as `python cli.py collect`; runs through the importable module so
+    # helper modules share its state (cache, quota counters)
+    import sys
+    from cli import main as cli_main
+    cli_main(["collect"] + sys.argv[1:])